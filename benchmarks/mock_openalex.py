@@ -0,0 +1,305 @@
+"""
+Local stand-in for the OpenAlex API, used by the benchmarks.
+
+Serves synthetic, deterministic records with the same response format as the API ({"meta": {...}, "results": [...]}),
+and supports the parts of the API the harvesters use:
+    - entity endpoints: /works, /authors, /sources, /institutions, /publishers, /funders, /topics, ...
+    - filters: 'key:value1|value2' clauses separated by commas, e.g. doi, openalex_id, orcid, ror, issn, pmid, institutions.ror
+    - search: name searches, returning a fixed number of matches
+    - pagination: basic paging (page) and cursor paging (cursor=*), with per-page up to 200
+    - select: field projection
+    - group_by: counts per value of a (dotted) field of the matching records, in a single page
+Filters on a single identifier (DOI, ID, ORCID, ...) match one record per value; 'list' filters (e.g. works by ROR, ISSN or ORCID)
+match a configurable number of works per value, so deep harvests can be benchmarked. Works matched by a 'cites' filter reference the cited work.
+
+The from_updated_date filter matches a fixed fraction of the records (changed_rate), to benchmark incremental refreshes.
+Latency, error rates (500) and rate limiting (429 with a Retry-After header) can be injected.
+Request counts are available at /__stats, and can be reset with /__reset.
+
+Run standalone with: python -m benchmarks.mock_openalex --port 8765 --latency 0.05
+Then point pyalex at it with pyalex.config.openalex_url = "http://127.0.0.1:8765".
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+ENTITY_PREFIXES = {
+    "works": "W",
+    "authors": "A",
+    "sources": "S",
+    "institutions": "I",
+    "publishers": "P",
+    "funders": "F",
+    "topics": "T",
+    "subfields": "T",
+    "fields": "T",
+    "domains": "T",
+    "concepts": "C",
+}
+
+# filter keys that identify a single record per value
+SINGLE_FILTERS = {"openalex_id", "ids.openalex", "id", "doi", "pmid", "ror", "issn", "orcid"}
+# filter keys that match many works per value, e.g. all works of an institution
+LIST_FILTERS = {"cites", "institutions.ror", "authorships.institutions.ror", "locations.source.issn", "primary_location.source.issn", "author.orcid", "authorships.author.orcid"}
+
+# separates filter clauses: a comma followed by the next 'key:'. DOIs can contain commas, so a plain split is not enough
+FILTER_CLAUSE_SEPARATOR = re.compile(r",(?=[a-z_.]+:)")
+OPENALEX_ID = re.compile(r"[WASIPFTC]\d+")
+
+def _number(*parts: str) -> int:
+    """Deterministic number for a combination of strings, used to derive IDs and field values"""
+    return zlib.crc32("|".join(parts).encode())
+
+class MockOpenAlex:
+    """
+    The state and behaviour of the mock API: synthetic record generation, failure injection and request statistics.
+    works_per_value is the number of works matched per value of a list filter (e.g. per ROR).
+    changed_rate is the fraction of records matched by the from_updated_date filter, i.e. that 'changed' since any date.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 0.0,
+        works_per_value: int = 1000,
+        search_results: int = 25,
+        changed_rate: float = 0.05,
+        seed: int = 42,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.works_per_value = works_per_value
+        self.search_results = search_results
+        self.changed_rate = changed_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stats = {"requests": 0, "records": 0, "bytes": 0, "status": {}, "endpoints": {}}
+
+    def _count(self, endpoint: str, status: int, records: int, size: int) -> None:
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["records"] += records
+            self.stats["bytes"] += size
+            self.stats["status"][str(status)] = self.stats["status"].get(str(status), 0) + 1
+            self.stats["endpoints"][endpoint] = self.stats["endpoints"].get(endpoint, 0) + 1
+
+    def _draw(self) -> float:
+        with self._lock:
+            return self._random.random()
+
+    def _record(self, entity: str, key: str) -> dict:
+        """Synthetic record for an entity, derived from key"""
+        number = _number(entity, key) % 10**9
+        # records requested by OpenAlex ID keep that ID
+        short_id = key if OPENALEX_ID.fullmatch(key) else f"{ENTITY_PREFIXES.get(entity, 'W')}{number}"
+        record_id = f"https://openalex.org/{short_id}"
+        if entity == "works":
+            year = 1990 + number % 35
+            return {
+                "id": record_id,
+                "doi": f"https://doi.org/{key}" if key.startswith("10.") else f"https://doi.org/10.5555/{number}",
+                "title": f"Synthetic work {number}",
+                "display_name": f"Synthetic work {number}",
+                "publication_year": year,
+                "publication_date": f"{year}-01-01",
+                "type": "article",
+                "language": "en",
+                "ids": {"openalex": record_id, "pmid": f"https://pubmed.ncbi.nlm.nih.gov/{number % 10**8}"},
+                "open_access": {"is_oa": number % 2 == 0, "oa_status": ["gold", "green", "hybrid", "bronze", "closed"][number % 5]},
+                "primary_location": {
+                    "is_oa": number % 2 == 0,
+                    "source": {
+                        "id": f"https://openalex.org/S{number % 5000}",
+                        "display_name": f"Journal {number % 5000}",
+                        "issn_l": "0317-8471",
+                        "issn": ["0317-8471"],
+                        "host_organization_name": ["Elsevier BV", "Springer Nature", "MDPI AG", "Wiley"][number % 4],
+                    },
+                },
+                "authorships": [
+                    {
+                        "author_position": "first" if position == 0 else "middle",
+                        "author": {"id": f"https://openalex.org/A{(number + position) % 10**7}", "display_name": f"Author {position}", "orcid": None},
+                        "institutions": [{"id": f"https://openalex.org/I{(number + position) % 1000}", "display_name": f"Institution {(number + position) % 1000}", "ror": None}],
+                    }
+                    for position in range(1 + number % 6)
+                ],
+                # works matched by a 'cites' filter reference the cited work
+                "referenced_works": [
+                    *([f"https://openalex.org/{key.split(':')[1]}"] if key.startswith("cites:") else []),
+                    *(f"https://openalex.org/W{(number * (i + 7)) % 10**9}" for i in range(number % 30)),
+                ],
+                "cited_by_count": number % 500,
+                "biblio": {"volume": str(number % 100), "issue": str(number % 12), "first_page": "1", "last_page": "10"},
+                "abstract_inverted_index": {word: [i] for i, word in enumerate(f"synthetic abstract text for work number {number}".split())},
+            }
+        record = {"id": record_id, "display_name": f"Synthetic {entity[:-1]} {number}", "works_count": number % 10000, "cited_by_count": number % 100000}
+        if entity == "authors":
+            record["orcid"] = f"https://orcid.org/{key}" if "-" in key else None
+            record["affiliations"] = [{"institution": {"id": f"https://openalex.org/I{number % 1000}", "ror": None}, "years": [2020]}]
+        elif entity in ("institutions", "publishers", "funders"):
+            record["ror"] = f"https://ror.org/{key}" if not key.startswith(("I", "P", "F")) else None
+        elif entity == "sources":
+            record["issn_l"] = key if "-" in key else None
+            record["issn"] = [key] if "-" in key else []
+            record["host_organization_name"] = "Elsevier BV"
+        return record
+
+    def _match(self, entity: str, filters: dict[str, list[str]], search: str | None) -> list[tuple[str, int]]:
+        """Return the (key, index) pairs of the matching records, in a stable order"""
+        matches: list[tuple[str, int]] = []
+        for key, values in filters.items():
+            if key in LIST_FILTERS or (key == "orcid" and entity == "works"):
+                matches.extend((f"{key}:{value}:{index}", index) for value in values for index in range(self.works_per_value))
+            elif key in SINGLE_FILTERS or key.endswith("openalex_id"):
+                matches.extend((value, 0) for value in values)
+            # other filters (e.g. publication_year) narrow the results in the real API, they are ignored here
+        if search:
+            matches.extend((f"search:{search}:{index}", index) for index in range(self.search_results))
+        if "from_updated_date" in filters:
+            matches = [(key, index) for key, index in matches if _number("updated", key) % 10000 < self.changed_rate * 10000]
+        return matches
+
+    def _group(self, entity: str, matches: list[tuple[str, int]], group_by: str) -> tuple[int, dict[str, str], bytes, int]:
+        """Respond to a group_by request: count the matching records per value of the group_by field"""
+        counts: dict[str, int] = {}
+        for key, _ in matches:
+            value = _field_value(self._record(entity, key), group_by)
+            for item in value if isinstance(value, list) else [value]:
+                item = "unknown" if item is None else str(item).lower() if isinstance(item, bool) else str(item)
+                counts[item] = counts.get(item, 0) + 1
+        groups = [{"key": key, "key_display_name": key, "count": count} for key, count in sorted(counts.items(), key=lambda item: -item[1])]
+        meta = {"count": len(matches), "db_response_time_ms": 1, "page": None, "per_page": 200, "next_cursor": None, "groups_count": len(groups)}
+        body = json.dumps({"meta": meta, "results": [], "group_by": groups}).encode()
+        return 200, {"Content-Type": "application/json"}, body, len(groups)
+
+    def respond(self, path: str, query: str) -> tuple[int, dict[str, str], bytes, int]:
+        """Handle a request. Returns (status, headers, body, number of records)"""
+        entity = path.strip("/").split("/")[0]
+        if self.latency or self.jitter:
+            time.sleep(self.latency + self.jitter * self._draw())
+        if self.rate_limit_rate and self._draw() < self.rate_limit_rate:
+            return 429, {"Retry-After": str(self.retry_after)}, b'{"error": "Too Many Requests"}', 0
+        if self.error_rate and self._draw() < self.error_rate:
+            return 500, {}, b'{"error": "Internal Server Error"}', 0
+        if entity not in ENTITY_PREFIXES:
+            return 404, {}, b'{"error": "Not Found"}', 0
+
+        params = {key: values[-1] for key, values in parse_qs(query).items()}
+        filters: dict[str, list[str]] = {}
+        for clause in FILTER_CLAUSE_SEPARATOR.split(params.get("filter", "")):
+            if ":" in clause:
+                key, _, value = clause.partition(":")
+                filters[key] = [part for part in value.split("|") if part]
+        matches = self._match(entity, filters, params.get("search"))
+        group_by = params.get("group-by") or params.get("group_by")
+        if group_by:
+            return self._group(entity, matches, group_by)
+        per_page = min(int(params.get("per-page", params.get("per_page", 25))), 200)
+        if "cursor" in params:
+            start = 0 if params["cursor"] == "*" else int(params["cursor"])
+        else:
+            start = (int(params.get("page", 1)) - 1) * per_page
+        page = matches[start:start + per_page]
+        next_start = start + len(page)
+        results = [self._record(entity, key) for key, _ in page]
+        if "select" in params:
+            fields = params["select"].split(",")
+            results = [{field: record.get(field) for field in fields} for record in results]
+        meta = {
+            "count": len(matches),
+            "db_response_time_ms": 1,
+            "page": None if "cursor" in params else int(params.get("page", 1)),
+            "per_page": per_page,
+            "next_cursor": str(next_start) if "cursor" in params and next_start < len(matches) else None,
+            "groups_count": None,
+        }
+        body = json.dumps({"meta": meta, "results": results, "group_by": []}).encode()
+        return 200, {"Content-Type": "application/json"}, body, len(results)
+
+def _field_value(record: dict, path: str):
+    for key in path.split("."):
+        if not isinstance(record, dict):
+            return None
+        record = record.get(key)
+    return record
+
+def make_handler(api: MockOpenAlex) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == "/__stats":
+                status, headers, body, records = 200, {"Content-Type": "application/json"}, json.dumps(api.stats).encode(), 0
+            elif url.path == "/__reset":
+                api.reset()
+                status, headers, body, records = 200, {}, b"{}", 0
+            else:
+                status, headers, body, records = api.respond(url.path, url.query)
+                api._count(url.path.strip("/").split("/")[0], status, records, len(body))
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def serve(api: MockOpenAlex, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the mock API in a background thread. Returns the server; its address is server.server_address"""
+    server = ThreadingHTTPServer((host, port), make_handler(api))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the OpenAlex API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="maximum random seconds added on top of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 500 error")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered with a 429 error")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="value of the Retry-After header of 429 responses")
+    parser.add_argument("--works-per-value", type=int, default=1000, help="number of works per value of a list filter, e.g. per ROR")
+    parser.add_argument("--changed-rate", type=float, default=0.05, help="fraction of records matched by the from_updated_date filter")
+    args = parser.parse_args()
+    api = MockOpenAlex(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        works_per_value=args.works_per_value,
+        changed_rate=args.changed_rate,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(api))
+    print(f"Mock OpenAlex API running on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
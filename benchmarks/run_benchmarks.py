@@ -0,0 +1,249 @@
+"""
+Benchmarks for the OpenAlex harvester, run against a local stand-in for the API (see benchmarks/mock_openalex.py).
+
+Measures the end-to-end harvest time, throughput (records per second), peak memory and number of requests for these workloads:
+    dois_10k:        10.000 works by DOI
+    ror_deep:        deep harvest of all works of an institution by ROR (--ror-works works)
+    mixed_entities:  works by DOI, authors by ID and ORCID, institutions by ID, sources by ISSN and works by name search
+    ror_incremental: incremental refresh of all works of an institution by ROR in a new harvester, after a full harvest (only the requests of the refresh are counted)
+
+Run from the root of the repo:
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --workloads dois_10k --latency 0.05 --rate-limit-rate 0.01 --output results.json
+
+Results are written as JSON (default: benchmarks/results/benchmark-<timestamp>.json), so runs can be compared to detect regressions.
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+from collections.abc import Callable
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+import pyalex
+from harvesters.cache import HOUR, ResponseCache
+from harvesters.concurrency import TokenBucket
+from harvesters.generics import SearchValue
+from harvesters.identifiers import ROR_ALPHABET, issn_checksum, orcid_checksum, ror_checksum
+from harvesters.openalex import OpenAlexHarvester
+from settings import Source
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _ror(number: int) -> str:
+    """A valid ROR ID (with checksum) derived from number"""
+    chars = "0"
+    for _ in range(6):
+        number, remainder = divmod(number, 32)
+        chars += ROR_ALPHABET[remainder]
+    return chars + ror_checksum(chars)
+
+def _orcid(number: int) -> str:
+    """A valid ORCID (with checksum) derived from number"""
+    digits = f"{number:015d}"
+    orcid = digits + orcid_checksum(digits)
+    return "-".join(orcid[i:i + 4] for i in range(0, 16, 4))
+
+def _issn(number: int) -> str:
+    """A valid ISSN (with checksum) derived from number"""
+    digits = f"{number:07d}"
+    return f"{digits[:4]}-{digits[4:]}{issn_checksum(digits)}"
+
+class MockServer:
+    """Runs benchmarks/mock_openalex.py in a separate process, so it does not compete with the harvester for the GIL"""
+
+    def __init__(self, options: list[str]):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.mock_openalex", "--port", str(self.port), *options],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            stdout=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                self.stats()
+                break
+            except OSError:
+                if time.monotonic() > deadline or self.process.poll() is not None:
+                    self.stop()
+                    raise RuntimeError("Mock OpenAlex server did not start")
+                time.sleep(0.05)
+
+    def _get(self, path: str) -> dict:
+        with urllib.request.urlopen(self.url + path) as response:
+            return json.load(response)
+
+    def stats(self) -> dict:
+        return self._get("/__stats")
+
+    def reset(self) -> None:
+        self._get("/__reset")
+
+    def stop(self) -> None:
+        self.process.terminate()
+        self.process.wait()
+
+def _harvester(args: argparse.Namespace) -> OpenAlexHarvester:
+    """An OpenAlex harvester without cache, with the concurrency settings of the benchmark"""
+    harvester = OpenAlexHarvester(Source("openalex", True))
+    harvester.cache = None
+    harvester.max_workers = args.max_workers
+    harvester.rate_limiter = TokenBucket(rate=args.requests_per_second)
+    return harvester
+
+def _count_records(results: dict[str, dict]) -> int:
+    return sum(len(records) for records in results.values())
+
+def workload_dois_10k(args: argparse.Namespace) -> tuple[OpenAlexHarvester, int]:
+    harvester = _harvester(args)
+    harvester.search_values = [SearchValue(f"10.5555/bench.{i}", "doi", "work") for i in range(args.dois)]
+    return harvester, _count_records(harvester.get_results())
+
+def workload_ror_deep(args: argparse.Namespace) -> tuple[OpenAlexHarvester, int]:
+    harvester = _harvester(args)
+    harvester.search_values = [SearchValue(_ror(12345), "ror", "work")]
+    with tempfile.TemporaryDirectory() as checkpoint_dir:
+        return harvester, _count_records(harvester.deep_harvest(checkpoint_dir=checkpoint_dir))
+
+def workload_mixed_entities(args: argparse.Namespace) -> tuple[OpenAlexHarvester, int]:
+    harvester = _harvester(args)
+    harvester.search_values = [
+        *(SearchValue(f"10.5555/mixed.{i}", "doi", "work") for i in range(2000)),
+        *(SearchValue(f"A{5000000 + i}", "id", "author") for i in range(500)),
+        *(SearchValue(_orcid(i), "orcid", "author") for i in range(300)),
+        *(SearchValue(f"I{4000000 + i}", "id", "institution") for i in range(200)),
+        *(SearchValue(_issn(i), "issn", "source") for i in range(200)),
+        *(SearchValue(f"synthetic topic {i}", "name", "work") for i in range(5)),
+    ]
+    return harvester, _count_records(harvester.get_results())
+
+def workload_ror_incremental(args: argparse.Namespace) -> tuple[OpenAlexHarvester, int]:
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ResponseCache(os.path.join(cache_dir, "cache.sqlite"), max_bytes=2**34, default_ttl=HOUR)
+        search_values = [SearchValue(_ror(54321), "ror", "work")]
+        harvester = _harvester(args)
+        harvester.cache = cache
+        harvester.search_values = search_values
+        harvester.max_results_per_query = None
+        harvester.get_results()
+        # only measure the refresh, by a new harvester like in a new run: the requests of the full harvest are not counted
+        args.server.reset()
+        harvester = _harvester(args)
+        harvester.cache = cache
+        harvester.search_values = search_values
+        harvester.max_results_per_query = None
+        return harvester, _count_records(harvester.incremental_refresh())
+
+WORKLOADS: dict[str, Callable[[argparse.Namespace], tuple[OpenAlexHarvester, int]]] = {
+    "dois_10k": workload_dois_10k,
+    "ror_deep": workload_ror_deep,
+    "mixed_entities": workload_mixed_entities,
+    "ror_incremental": workload_ror_incremental,
+}
+
+def run_workload(name: str, args: argparse.Namespace, server: MockServer) -> dict:
+    """Run a single workload, and return its measurements"""
+    server.reset()
+    if args.trace_memory:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    result: dict = {"name": name}
+    try:
+        harvester, records = WORKLOADS[name](args)
+        result["records"] = records
+        result["harvester_metrics"] = harvester.metrics.as_dict()
+    except Exception as e:
+        result["records"] = 0
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    result["records_per_second"] = round(result["records"] / result["seconds"], 1) if result["seconds"] else None
+    if args.trace_memory:
+        result["peak_memory_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        tracemalloc.stop()
+    stats = server.stats()
+    result["requests"] = stats["requests"]
+    result["requests_by_status"] = stats["status"]
+    result["response_bytes"] = stats["bytes"]
+    return result
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the OpenAlex harvester against a local mock API")
+    parser.add_argument("--workloads", nargs="+", choices=list(WORKLOADS), default=list(WORKLOADS))
+    parser.add_argument("--output", help="path of the JSON results file (default: benchmarks/results/benchmark-<timestamp>.json)")
+    parser.add_argument("--dois", type=int, default=10000, help="number of DOIs in the dois_10k workload")
+    parser.add_argument("--ror-works", type=int, default=10000, help="number of works of the institution in the ror_deep workload")
+    parser.add_argument("--max-workers", type=int, default=4, help="number of parallel queries of the harvester")
+    parser.add_argument("--requests-per-second", type=float, default=0, help="rate limit of the harvester (0: no limit)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response of the mock API")
+    parser.add_argument("--jitter", type=float, default=0.0, help="maximum random seconds added on top of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 500 error")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered with a 429 error")
+    parser.add_argument("--changed-rate", type=float, default=0.05, help="fraction of records changed since the last harvest, in the ror_incremental workload")
+    parser.add_argument("--no-trace-memory", dest="trace_memory", action="store_false", help="don't measure peak memory (tracemalloc slows down the harvest)")
+    args = parser.parse_args()
+
+    server = MockServer([
+        "--latency", str(args.latency),
+        "--jitter", str(args.jitter),
+        "--error-rate", str(args.error_rate),
+        "--rate-limit-rate", str(args.rate_limit_rate),
+        "--works-per-value", str(args.ror_works),
+        "--changed-rate", str(args.changed_rate),
+    ])
+    args.server = server
+    pyalex.config.openalex_url = server.url
+    try:
+        results = []
+        for name in args.workloads:
+            print(f"Running {name}...")
+            result = run_workload(name, args, server)
+            results.append(result)
+            print(
+                f"  {result['records']} records in {result['seconds']}s ({result['records_per_second']} records/s), "
+                f"{result['requests']} requests{', error: ' + result['error'] if 'error' in result else ''}"
+            )
+    finally:
+        server.stop()
+
+    timestamp = datetime.now(timezone.utc)
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    report = {
+        "timestamp": timestamp.isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "server")},
+        # peak resident memory of the whole benchmark process, including all workloads
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2) if resource else None,
+        "workloads": results,
+    }
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", f"benchmark-{timestamp:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Measures the cold start time of the app: the time to import the harvester manager and to create a HarvesterManager,
+each in a fresh Python process, so nothing is cached in sys.modules.
+
+Run from the root of the repo:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 20 --importtime
+
+With --importtime, the modules with the largest cumulative import time are listed (from python -X importtime),
+which shows what to defer if startup gets slower.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# each stage is timed in its own process; the code prints the elapsed seconds
+STAGES = {
+    "import_manager": "from harvester_manager import HarvesterManager",
+    "create_manager": "from harvester_manager import HarvesterManager\nHarvesterManager()",
+}
+
+TIMER = """
+import time
+start = time.perf_counter()
+{code}
+print(time.perf_counter() - start)
+"""
+
+def measure(code: str, repeat: int) -> list[float]:
+    """Run code in repeat fresh processes, and return the measured seconds of each run"""
+    return [
+        float(subprocess.run(
+            [sys.executable, "-c", TIMER.format(code=code)], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1])
+        for _ in range(repeat)
+    ]
+
+def slowest_imports(code: str, top: int = 15) -> list[tuple[str, float]]:
+    """Return the modules with the largest cumulative import time (in ms) when running code"""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        imports.append((module.strip(), int(cumulative) / 1000))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:top]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure the cold start time of the app")
+    parser.add_argument("--repeat", type=int, default=10, help="number of fresh processes per stage")
+    parser.add_argument("--importtime", action="store_true", help="list the slowest imports of creating a HarvesterManager")
+    parser.add_argument("--output", help="path of a JSON file to write the results to")
+    args = parser.parse_args()
+
+    results = {}
+    for stage, code in STAGES.items():
+        seconds = measure(code, args.repeat)
+        results[stage] = {"median_ms": round(statistics.median(seconds) * 1000, 1), "min_ms": round(min(seconds) * 1000, 1)}
+        print(f"{stage}: median {results[stage]['median_ms']} ms, min {results[stage]['min_ms']} ms ({args.repeat} runs)")
+    if args.importtime:
+        print("Slowest imports (cumulative ms):")
+        for module, ms in slowest_imports(STAGES["create_manager"]):
+            print(f"  {ms:8.1f}  {module}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
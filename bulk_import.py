@@ -0,0 +1,256 @@
+"""
+Streaming import of identifiers from large CSV or Excel files, such as exports from CRIS systems.
+
+Files are read row by row, so memory use doesn't depend on the size of the file. Each cell is classified as a DOI, ORCID, ROR ID,
+OpenAlex ID, ISSN or PMID with a single compiled regex (see IDENTIFIER_PATTERN), canonicalized, and deduplicated on the fly.
+Bare numbers are only read as PMIDs in the columns that are named in the import: when all cells are classified, they are more likely
+row numbers, years or volumes, so PMIDs need their 'pmid:' prefix or PubMed URL there.
+The resulting SearchValues are passed on in batches, e.g. to HarvesterManager.add_search_values:
+
+    stats = manager.import_search_values("export.csv", columns=["DOI", "ORCID"])
+
+or, to process the batches yourself:
+
+    importer = BulkImporter(entity_types={QueryValueType.ROR: SearchEntityType.WORK})
+    for batch in importer.iter_batches("export.xlsx", sheet="Publications"):
+        ...
+
+Excel files are read with openpyxl, which is an optional dependency: install it with `uv sync --extra excel` or `pip install openpyxl`.
+"""
+import csv
+import logging
+import os
+import re
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from harvesters.generics import QueryValueType, SearchEntityType, SearchValue
+from harvesters.identifiers import InvalidIdentifierError, canonicalize
+
+logger = logging.getLogger(__name__)
+
+# detection patterns per identifier type, tried in this order. These are stricter than the patterns in harvesters.identifiers
+# where types would be ambiguous: ISSNs need a hyphen, an 'issn' prefix or a trailing X, so 8-digit numbers are read as PMIDs
+# (but only in named columns, see BulkImporter._search_value).
+DETECTION_PATTERNS: dict[QueryValueType, str] = {
+    QueryValueType.DOI: r"(?:https?://(?:dx\.)?doi\.org/|doi:\s*)?10\.\d{1,9}(?:\.\d+)*/\S+",
+    QueryValueType.ORCID: r"(?:https?://(?:www\.)?orcid\.org/)?\d{4}-?\d{4}-?\d{4}-?\d{3}[\dX]",
+    QueryValueType.ROR: r"(?:https?://(?:www\.)?ror\.org/)?0[a-hj-km-np-tv-z0-9]{6}\d{2}",
+    QueryValueType.OPENALEX_ID: r"(?:https?://(?:api\.)?openalex\.org/(?:[a-z]+/)?)?[WASIPFT]\d+",
+    QueryValueType.ISSN: r"(?:issn:?\s*)?\d{4}-\d{3}[\dX]|issn:?\s*\d{7}[\dX]|\d{7}X",
+    QueryValueType.PMID: r"(?:https?://(?:www\.)?(?:pubmed\.ncbi\.nlm\.nih\.gov|ncbi\.nlm\.nih\.gov/pubmed)/|pmid:\s*)?\d{1,9}/?",
+}
+# all detection patterns in one alternation, with a named group per type, so each cell is classified with a single match
+IDENTIFIER_PATTERN = re.compile(
+    "|".join(f"(?P<{field.value}>{pattern})" for field, pattern in DETECTION_PATTERNS.items()), re.IGNORECASE
+)
+
+# default entity type per identifier type; OpenAlex IDs get the entity type of their prefix
+ENTITY_TYPES: dict[QueryValueType, SearchEntityType] = {
+    QueryValueType.DOI: SearchEntityType.WORK,
+    QueryValueType.PMID: SearchEntityType.WORK,
+    QueryValueType.ORCID: SearchEntityType.AUTHOR,
+    QueryValueType.ROR: SearchEntityType.INSTITUTION,
+    QueryValueType.ISSN: SearchEntityType.SOURCE,
+}
+OPENALEX_ENTITY_TYPES: dict[str, SearchEntityType] = {
+    "W": SearchEntityType.WORK,
+    "A": SearchEntityType.AUTHOR,
+    "S": SearchEntityType.SOURCE,
+    "I": SearchEntityType.INSTITUTION,
+    "P": SearchEntityType.PUBLISHER,
+    "F": SearchEntityType.FUNDER,
+    "T": SearchEntityType.TOPIC,
+}
+
+def detect_type(value: str) -> QueryValueType | None:
+    """Return the identifier type of a value (e.g. QueryValueType.DOI for 'https://doi.org/10.1/abc'), or None if it isn't recognized"""
+    match = IDENTIFIER_PATTERN.fullmatch(value.strip())
+    return QueryValueType(match.lastgroup) if match else None
+
+@dataclass
+class ImportStats:
+    """Counts of an import: rows read, non-empty cells, and what happened to them"""
+    rows: int = 0
+    cells: int = 0
+    added: int = 0
+    duplicates: int = 0
+    unrecognized: int = 0
+    # recognized by the detection patterns, but rejected by the normalizer (e.g. a wrong checksum)
+    invalid: int = 0
+    per_type: Counter = field(default_factory=Counter)
+
+def _csv_rows(path: str, encoding: str, delimiter: str | None) -> Iterator[list]:
+    with open(path, newline="", encoding=encoding) as f:
+        if delimiter is None:
+            sample = f.read(64 * 1024)
+            f.seek(0)
+            try:
+                delimiter = csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+            except csv.Error:
+                # a single column, or no delimiter in the sample
+                delimiter = ","
+        yield from csv.reader(f, delimiter=delimiter)
+
+def _excel_rows(path: str, sheet: str | None) -> Iterator[tuple]:
+    try:
+        import openpyxl
+    except ImportError as e:
+        raise ImportError("Importing Excel files requires openpyxl: install it with `uv sync --extra excel` or `pip install openpyxl`") from e
+    # read-only mode streams the rows from the file, instead of loading the whole workbook
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.active
+        yield from worksheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def iter_rows(path: str, sheet: str | None = None, encoding: str = "utf-8-sig", delimiter: str | None = None) -> Iterator[list | tuple]:
+    """
+    Stream the rows of a CSV file (the delimiter is detected if not given) or an Excel file (.xlsx/.xlsm; sheet defaults to the active sheet).
+    Cells of CSV files are strings; cells of Excel files can also be numbers or None.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        return _excel_rows(path, sheet)
+    return _csv_rows(path, encoding, delimiter)
+
+def _is_header(row: Iterable) -> bool:
+    """Return True if a row contains no identifiers (bare numbers don't count, as they can be column names like years)"""
+    for cell in row:
+        value = str(cell).strip() if cell is not None else ""
+        if value and not value.isdigit() and detect_type(value) is not None:
+            return False
+    return True
+
+class BulkImporter:
+    """
+    Classifies, canonicalizes and deduplicates the identifiers in a file, and turns them into batches of SearchValues.
+    entity_types overrides the entity type used for an identifier type (see ENTITY_TYPES), e.g. {QueryValueType.ROR: SearchEntityType.WORK}
+    to search the works of the institutions instead of the institutions themselves.
+    Identifiers are deduplicated across all files imported with the same importer; stats holds the counts of all imports.
+    """
+
+    def __init__(self, entity_types: dict[QueryValueType, SearchEntityType] | None = None, batch_size: int = 10_000):
+        self.entity_types = {**ENTITY_TYPES, **(entity_types or {})}
+        self.batch_size = batch_size
+        self.stats = ImportStats()
+        # canonical 'field:value' keys of the identifiers seen so far
+        self._seen: set[str] = set()
+        # lookups by regex group name (the QueryValueType value), as enum attribute access is relatively slow in the inner loop
+        self._fields = {field.value: field for field in DETECTION_PATTERNS}
+        self._entities = {field.value: entity for field, entity in self.entity_types.items()}
+
+    def _search_value(self, cell, bare_pmids: bool = True) -> SearchValue | None:
+        """
+        Classify a cell and return its SearchValue, or None if it is empty, not an identifier, or a duplicate.
+        If bare_pmids is False, numbers without a 'pmid:' prefix or PubMed URL are not recognized as PMIDs.
+        """
+        if cell is None:
+            return None
+        if isinstance(cell, float) and cell.is_integer():
+            # numeric identifiers (PMIDs) in Excel files
+            cell = int(cell)
+        value = str(cell).strip()
+        if not value:
+            return None
+        stats = self.stats
+        stats.cells += 1
+        match = IDENTIFIER_PATTERN.fullmatch(value)
+        if match is None:
+            stats.unrecognized += 1
+            return None
+        field_name = match.lastgroup
+        if field_name == "pmid" and not bare_pmids and value.isdigit():
+            stats.unrecognized += 1
+            return None
+        try:
+            canonical = canonicalize(field_name, value)
+        except InvalidIdentifierError:
+            stats.invalid += 1
+            return None
+        # duplicates are dropped before creating a SearchValue, which is the most expensive step
+        key = f"{field_name}:{canonical}"
+        if key in self._seen:
+            stats.duplicates += 1
+            return None
+        self._seen.add(key)
+        if field_name == "openalex_id":
+            entity = OPENALEX_ENTITY_TYPES[canonical[0]]
+        else:
+            entity = self._entities[field_name]
+        stats.added += 1
+        stats.per_type[field_name] += 1
+        # SearchValue canonicalizes the value again: passing the original value makes that a hit in the memoized canonicalize()
+        return SearchValue(value, self._fields[field_name], entity)
+
+    def _cells(self, rows: Iterable, columns: list[str | int] | None) -> Iterator:
+        """
+        Yield the cells of the given columns (names from the header row, or 0-based indexes), or all cells if columns is None.
+        In that case, the first row is skipped if it is a header row, i.e. if it contains no identifiers.
+        """
+        rows = iter(rows)
+        if columns is None:
+            first = next(rows, None)
+            if first is None:
+                return
+            if not _is_header(first):
+                self.stats.rows += 1
+                yield from first
+            for row in rows:
+                self.stats.rows += 1
+                yield from row
+            return
+        indexes = [column for column in columns if isinstance(column, int)]
+        names = [column for column in columns if not isinstance(column, int)]
+        if names:
+            header = [str(cell).strip().casefold() if cell is not None else "" for cell in next(rows, [])]
+            missing = [name for name in names if name.strip().casefold() not in header]
+            if missing:
+                raise ValueError(f"Columns {missing} not found in the header row: {header}")
+            indexes.extend(header.index(name.strip().casefold()) for name in names)
+        for row in rows:
+            self.stats.rows += 1
+            for index in indexes:
+                if index < len(row):
+                    yield row[index]
+
+    def iter_search_values(self, cells: Iterable, bare_pmids: bool = True) -> Iterator[SearchValue]:
+        """Yield the SearchValues of the recognized, new identifiers among cells. See _search_value for bare_pmids."""
+        for cell in cells:
+            search_value = self._search_value(cell, bare_pmids)
+            if search_value is not None:
+                yield search_value
+
+    def iter_batches(self, path: str, columns: list[str | int] | None = None, **read_options) -> Iterator[list[SearchValue]]:
+        """
+        Stream a file (see iter_rows for the read_options) and yield lists of at most batch_size new SearchValues.
+        Only the given columns are read if set: header names (case-insensitive) or 0-based indexes; otherwise all cells are classified,
+        and numbers are only read as PMIDs if they have a 'pmid:' prefix or are PubMed URLs.
+        """
+        batch: list[SearchValue] = []
+        cells = self._cells(iter_rows(path, **read_options), columns)
+        for search_value in self.iter_search_values(cells, bare_pmids=columns is not None):
+            batch.append(search_value)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def import_file(
+        self,
+        path: str,
+        consumer: Callable[[list[SearchValue]], None],
+        columns: list[str | int] | None = None,
+        **read_options,
+    ) -> ImportStats:
+        """Pass the batches of new SearchValues in a file to consumer (e.g. HarvesterManager.add_search_values). Returns the stats."""
+        for batch in self.iter_batches(path, columns, **read_options):
+            consumer(batch)
+        stats = self.stats
+        logger.info(
+            f"Imported {stats.added} identifiers from {stats.rows} rows of {path} ({dict(stats.per_type)}); "
+            f"skipped {stats.duplicates} duplicates, {stats.unrecognized} unrecognized and {stats.invalid} invalid values."
+        )
+        return stats
@@ -0,0 +1,327 @@
+"""
+This module exports harvested OpenAlex records to columnar files (Parquet or Arrow IPC), using pyarrow.
+
+Nested records are flattened into typed tables: one table per entity type (works, authors, institutions, ...),
+plus link tables for the nested lists in works (authorships, referenced works).
+Records are written in batches straight from a result stream, so the full harvest never has to be kept in memory:
+
+    exporter_stream = ((entity, record) for _, entity, record in manager.iter_results(store=False))
+    export_results(exporter_stream, "output/")
+
+The resulting files can be memory-mapped by downstream tools (pyarrow, polars, duckdb) without parsing JSON.
+pyarrow is an optional dependency: install it with `uv sync --extra export` or `pip install pyarrow`.
+"""
+import logging
+import os
+from collections.abc import Callable, Iterable
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+def _short_id(value: str | None) -> str | None:
+    """Strip the URL prefix from an OpenAlex ID or other identifier URL, e.g. 'https://openalex.org/W1' -> 'W1'"""
+    return value.rsplit('/', 1)[-1] if value else None
+
+def _date(value: str | None) -> date | None:
+    return date.fromisoformat(value) if value else None
+
+def _get(record: dict | None, *path: str):
+    """Get a nested value from a record, returning None if any part of the path is missing"""
+    for key in path:
+        if not record:
+            return None
+        record = record.get(key)
+    return record
+
+def _flatten_work(record: dict) -> dict[str, list[dict]]:
+    source = _get(record, 'primary_location', 'source')
+    work_id = _short_id(record['id'])
+    authorships = []
+    for authorship in record.get('authorships') or []:
+        author = authorship.get('author') or {}
+        base = {
+            'work_id': work_id,
+            'author_position': authorship.get('author_position'),
+            'author_id': _short_id(author.get('id')),
+            'author_name': author.get('display_name'),
+            'orcid': _short_id(author.get('orcid')),
+            'is_corresponding': authorship.get('is_corresponding'),
+        }
+        # one row per (author, institution); authors without institutions get a single row without institution
+        for institution in authorship.get('institutions') or [{}]:
+            authorships.append(base | {
+                'institution_id': _short_id(institution.get('id')),
+                'institution_name': institution.get('display_name'),
+                'institution_ror': _short_id(institution.get('ror')),
+                'country_code': institution.get('country_code'),
+            })
+    return {
+        'works': [{
+            'id': work_id,
+            'doi': record['doi'].removeprefix('https://doi.org/') if record.get('doi') else None,
+            'title': record.get('title'),
+            'publication_year': record.get('publication_year'),
+            'publication_date': _date(record.get('publication_date')),
+            'type': record.get('type'),
+            'language': record.get('language'),
+            'is_oa': _get(record, 'open_access', 'is_oa'),
+            'oa_status': _get(record, 'open_access', 'oa_status'),
+            'oa_url': _get(record, 'open_access', 'oa_url'),
+            'cited_by_count': record.get('cited_by_count'),
+            'is_retracted': record.get('is_retracted'),
+            'source_id': _short_id(_get(source, 'id')),
+            'source_name': _get(source, 'display_name'),
+            'issn_l': _get(source, 'issn_l'),
+            'publisher_id': _short_id(_get(source, 'host_organization')),
+            'publisher_name': _get(source, 'host_organization_name'),
+            'license': _get(record, 'primary_location', 'license'),
+            'primary_topic_id': _short_id(_get(record, 'primary_topic', 'id')),
+            'authors_count': len(record.get('authorships') or []),
+            'referenced_works_count': record.get('referenced_works_count'),
+            'updated_date': record.get('updated_date'),
+        }],
+        'authorships': authorships,
+        'work_references': [
+            {'work_id': work_id, 'referenced_work_id': _short_id(referenced)}
+            for referenced in record.get('referenced_works') or []
+        ],
+    }
+
+def _flatten_author(record: dict) -> dict[str, list[dict]]:
+    institutions = record.get('last_known_institutions') or [{}]
+    return {'authors': [{
+        'id': _short_id(record['id']),
+        'orcid': _short_id(record.get('orcid')),
+        'display_name': record.get('display_name'),
+        'works_count': record.get('works_count'),
+        'cited_by_count': record.get('cited_by_count'),
+        'h_index': _get(record, 'summary_stats', 'h_index'),
+        'last_known_institution_id': _short_id(institutions[0].get('id')),
+        'updated_date': record.get('updated_date'),
+    }]}
+
+def _flatten_institution(record: dict) -> dict[str, list[dict]]:
+    return {'institutions': [{
+        'id': _short_id(record['id']),
+        'ror': _short_id(record.get('ror')),
+        'display_name': record.get('display_name'),
+        'country_code': record.get('country_code'),
+        'type': record.get('type'),
+        'city': _get(record, 'geo', 'city'),
+        'works_count': record.get('works_count'),
+        'cited_by_count': record.get('cited_by_count'),
+        'updated_date': record.get('updated_date'),
+    }]}
+
+def _flatten_source(record: dict) -> dict[str, list[dict]]:
+    return {'sources': [{
+        'id': _short_id(record['id']),
+        'issn_l': record.get('issn_l'),
+        'issn': record.get('issn') or [],
+        'display_name': record.get('display_name'),
+        'type': record.get('type'),
+        'host_organization_id': _short_id(record.get('host_organization')),
+        'host_organization_name': record.get('host_organization_name'),
+        'is_oa': record.get('is_oa'),
+        'is_in_doaj': record.get('is_in_doaj'),
+        'apc_usd': record.get('apc_usd'),
+        'works_count': record.get('works_count'),
+        'cited_by_count': record.get('cited_by_count'),
+        'updated_date': record.get('updated_date'),
+    }]}
+
+def _flatten_publisher(record: dict) -> dict[str, list[dict]]:
+    # parent_publisher is either an ID or a dehydrated publisher, depending on the API version
+    parent = record.get('parent_publisher')
+    if isinstance(parent, dict):
+        parent = parent.get('id')
+    return {'publishers': [{
+        'id': _short_id(record['id']),
+        'ror': _short_id(_get(record, 'ids', 'ror')),
+        'display_name': record.get('display_name'),
+        'hierarchy_level': record.get('hierarchy_level'),
+        'parent_publisher_id': _short_id(parent),
+        'country_codes': record.get('country_codes') or [],
+        'works_count': record.get('works_count'),
+        'cited_by_count': record.get('cited_by_count'),
+        'updated_date': record.get('updated_date'),
+    }]}
+
+def _flatten_funder(record: dict) -> dict[str, list[dict]]:
+    return {'funders': [{
+        'id': _short_id(record['id']),
+        'ror': _short_id(_get(record, 'ids', 'ror')),
+        'display_name': record.get('display_name'),
+        'country_code': record.get('country_code'),
+        'grants_count': record.get('grants_count'),
+        'works_count': record.get('works_count'),
+        'cited_by_count': record.get('cited_by_count'),
+        'updated_date': record.get('updated_date'),
+    }]}
+
+def _flatten_concept(entity_key: str) -> Callable[[dict], dict[str, list[dict]]]:
+    """Flattener for the topic hierarchy entities (topics, subfields, fields, domains), which share the same basic layout"""
+    def flatten(record: dict) -> dict[str, list[dict]]:
+        return {entity_key: [{
+            'id': _short_id(record['id']),
+            'display_name': record.get('display_name'),
+            'works_count': record.get('works_count'),
+            'cited_by_count': record.get('cited_by_count'),
+            'updated_date': record.get('updated_date'),
+        }]}
+    return flatten
+
+# maps the entity keys used in the harvester results to the function that flattens a record of that entity into table rows
+FLATTENERS: dict[str, Callable[[dict], dict[str, list[dict]]]] = {
+    'works': _flatten_work,
+    'authors': _flatten_author,
+    'institutions': _flatten_institution,
+    'sources': _flatten_source,
+    'publishers': _flatten_publisher,
+    'funders': _flatten_funder,
+    'topics': _flatten_concept('topics'),
+    'subfields': _flatten_concept('subfields'),
+    'fields': _flatten_concept('fields'),
+    'domains': _flatten_concept('domains'),
+}
+
+def _schemas(pa) -> dict:
+    """Return the pyarrow schema of each output table. Takes the pyarrow module, as it is imported lazily."""
+    string, int32, boolean = pa.string(), pa.int32(), pa.bool_()
+    counts = [('works_count', int32), ('cited_by_count', int32), ('updated_date', string)]
+    concept = pa.schema([('id', string), ('display_name', string), *counts])
+    return {
+        'works': pa.schema([
+            ('id', string), ('doi', string), ('title', string), ('publication_year', pa.int16()), ('publication_date', pa.date32()),
+            ('type', string), ('language', string), ('is_oa', boolean), ('oa_status', string), ('oa_url', string),
+            ('cited_by_count', int32), ('is_retracted', boolean), ('source_id', string), ('source_name', string), ('issn_l', string),
+            ('publisher_id', string), ('publisher_name', string), ('license', string), ('primary_topic_id', string),
+            ('authors_count', int32), ('referenced_works_count', int32), ('updated_date', string),
+        ]),
+        'authorships': pa.schema([
+            ('work_id', string), ('author_position', string), ('author_id', string), ('author_name', string), ('orcid', string),
+            ('is_corresponding', boolean), ('institution_id', string), ('institution_name', string), ('institution_ror', string),
+            ('country_code', string),
+        ]),
+        'work_references': pa.schema([('work_id', string), ('referenced_work_id', string)]),
+        'authors': pa.schema([
+            ('id', string), ('orcid', string), ('display_name', string), ('works_count', int32), ('cited_by_count', int32),
+            ('h_index', int32), ('last_known_institution_id', string), ('updated_date', string),
+        ]),
+        'institutions': pa.schema([
+            ('id', string), ('ror', string), ('display_name', string), ('country_code', string), ('type', string), ('city', string), *counts,
+        ]),
+        'sources': pa.schema([
+            ('id', string), ('issn_l', string), ('issn', pa.list_(string)), ('display_name', string), ('type', string),
+            ('host_organization_id', string), ('host_organization_name', string), ('is_oa', boolean), ('is_in_doaj', boolean),
+            ('apc_usd', int32), *counts,
+        ]),
+        'publishers': pa.schema([
+            ('id', string), ('ror', string), ('display_name', string), ('hierarchy_level', int32), ('parent_publisher_id', string),
+            ('country_codes', pa.list_(string)), *counts,
+        ]),
+        'funders': pa.schema([
+            ('id', string), ('ror', string), ('display_name', string), ('country_code', string), ('grants_count', int32), *counts,
+        ]),
+        'topics': concept,
+        'subfields': concept,
+        'fields': concept,
+        'domains': concept,
+    }
+
+class ColumnarExporter:
+    """
+    Writes flattened records to one file per table in output_dir, in batches of batch_size rows.
+    file_format is either 'parquet' or 'arrow' (Arrow IPC file format).
+    Use as a context manager, or call close() when done to flush the remaining rows and finalize the files.
+    """
+
+    FILE_FORMATS = ('parquet', 'arrow')
+
+    def __init__(self, output_dir: str, file_format: str = 'parquet', batch_size: int = 10_000):
+        try:
+            import pyarrow
+        except ImportError as e:
+            raise ImportError("Exporting results requires pyarrow: install it with `uv sync --extra export` or `pip install pyarrow`") from e
+        if file_format not in self.FILE_FORMATS:
+            raise ValueError(f"file_format must be one of {self.FILE_FORMATS}, got {file_format}")
+        self._pa = pyarrow
+        self.output_dir = output_dir
+        self.file_format = file_format
+        self.batch_size = batch_size
+        self.schemas = _schemas(pyarrow)
+        self.paths: dict[str, str] = {}
+        self._buffers: dict[str, dict[str, list]] = {}
+        self._buffered_rows: dict[str, int] = {}
+        self._writers: dict = {}
+        os.makedirs(output_dir, exist_ok=True)
+
+    def add(self, entity_key: str, record: dict) -> None:
+        """Flatten a record and add the rows to the table buffers, writing a batch when a buffer is full"""
+        flatten = FLATTENERS.get(entity_key)
+        if flatten is None:
+            logger.warning(f"Cannot export records of type {entity_key}, skipping")
+            return
+        for table, rows in flatten(record).items():
+            if not rows:
+                continue
+            buffer = self._buffers.setdefault(table, {name: [] for name in self.schemas[table].names})
+            for row in rows:
+                for name, column in buffer.items():
+                    column.append(row.get(name))
+            self._buffered_rows[table] = self._buffered_rows.get(table, 0) + len(rows)
+            if self._buffered_rows[table] >= self.batch_size:
+                self._flush(table)
+
+    def add_all(self, records: Iterable[tuple[str, dict]]) -> None:
+        """Add all (entity type, record) tuples from a result stream, e.g. Harvester.iter_results(store=False)"""
+        for entity_key, record in records:
+            self.add(entity_key, record)
+
+    def _writer(self, table: str):
+        if table not in self._writers:
+            schema = self.schemas[table]
+            path = os.path.join(self.output_dir, f"{table}.{self.file_format}")
+            if self.file_format == 'parquet':
+                import pyarrow.parquet
+                self._writers[table] = pyarrow.parquet.ParquetWriter(path, schema, compression='zstd')
+            else:
+                self._writers[table] = self._pa.ipc.new_file(path, schema)
+            self.paths[table] = path
+        return self._writers[table]
+
+    def _flush(self, table: str) -> None:
+        if not self._buffered_rows.get(table):
+            return
+        batch = self._pa.RecordBatch.from_pydict(self._buffers[table], schema=self.schemas[table])
+        self._writer(table).write_batch(batch)
+        for column in self._buffers[table].values():
+            column.clear()
+        self._buffered_rows[table] = 0
+
+    def close(self) -> dict[str, str]:
+        """Write the remaining rows and close all files. Returns the paths of the written files by table name."""
+        for table in list(self._buffers):
+            self._flush(table)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+        return self.paths
+
+    def __enter__(self) -> "ColumnarExporter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+def export_results(records: Iterable[tuple[str, dict]] | dict[str, dict], output_dir: str, file_format: str = 'parquet', batch_size: int = 10_000) -> dict[str, str]:
+    """
+    Export harvested records to columnar files in output_dir. Returns the paths of the written files by table name.
+    records can be a stream of (entity type, record) tuples (e.g. from Harvester.iter_results(store=False)),
+    or a results dict as returned by Harvester.get_results().
+    """
+    if isinstance(records, dict):
+        records = ((entity_key, record) for entity_key, entity_records in records.items() for record in entity_records.values())
+    with ColumnarExporter(output_dir, file_format, batch_size) as exporter:
+        exporter.add_all(records)
+    return exporter.paths
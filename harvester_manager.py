@@ -2,37 +2,53 @@
 This module is centered on the HarvesterManager class, which can be used to create and manage harvesters for various sources.
 """
 
-from settings import SETTINGS, Source
+import importlib
+import logging
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+from settings import Source, get_settings
 from harvesters.generics import Harvester, SearchValue, SearchEntityType, QueryValueType
-from harvesters.openalex import OpenAlexHarvester
-from harvesters.not_yet_implemented import *
+from harvesters.identifiers import InvalidIdentifierError
+from harvesters.merge import MergedRecord, RecordMerger
+from harvesters.metrics import Metrics, MetricsRegistry
+
+if TYPE_CHECKING:
+    from bulk_import import ImportStats
+
+logger = logging.getLogger(__name__)
 
 class HarvesterManager:
     """
     Use to run harvesters & retrieve their data.
     On init: Creates harvesters based on contents of settings.sources
     """
-    HARVESTER_MAPPING = {
-            "crossref": CrossrefHarvester,
-            "openalex": OpenAlexHarvester,
-            "semantic_scholar": SemanticScholarHarvester,
-            "zenodo": ZenodoHarvester,
-            "datacite": DataCiteHarvester,
-            "openaire": OpenAIREHarvester,
-            "openapc": OpenAPCHarvester,
-            "core": COREHarvester,
-            "base": BASEHarvester,
-            "pubmed": PubmedHarvester,
-            "arxiv": ArxivHarvester,
-            "unpaywall": UnpaywallHarvester,
-            "journal_browser": JournalBrowserHarvester,
-            "doaj": DOAJHarvester,
+    # maps source names to their harvester class, as 'module:class' strings.
+    # The modules are only imported when a harvester for that source is created, so unused clients (e.g. pyalex) are never loaded.
+    HARVESTER_MAPPING: dict[str, str] = {
+            "crossref": "harvesters.not_yet_implemented:CrossrefHarvester",
+            "openalex": "harvesters.openalex:OpenAlexHarvester",
+            "semantic_scholar": "harvesters.not_yet_implemented:SemanticScholarHarvester",
+            "zenodo": "harvesters.not_yet_implemented:ZenodoHarvester",
+            "datacite": "harvesters.not_yet_implemented:DataCiteHarvester",
+            "openaire": "harvesters.not_yet_implemented:OpenAIREHarvester",
+            "openapc": "harvesters.openapc:OpenAPCHarvester",
+            "core": "harvesters.not_yet_implemented:COREHarvester",
+            "base": "harvesters.not_yet_implemented:BASEHarvester",
+            "pubmed": "harvesters.not_yet_implemented:PubmedHarvester",
+            "arxiv": "harvesters.not_yet_implemented:ArxivHarvester",
+            "unpaywall": "harvesters.not_yet_implemented:UnpaywallHarvester",
+            "journal_browser": "harvesters.not_yet_implemented:JournalBrowserHarvester",
+            "doaj": "harvesters.not_yet_implemented:DOAJHarvester",
         }
 
-    harvesters: dict[str, Harvester] = {}
-    disabled_harvesters: dict[str, Harvester] = {}
+    harvesters: dict[str, Harvester]
+    disabled_harvesters: dict[str, Harvester]
     def __init__(self):
-        for source in SETTINGS.sources:
+        self.harvesters = {}
+        self.disabled_harvesters = {}
+        self._metrics = Metrics({"source": "manager"})
+        for source in get_settings().sources:
             if source.enabled:
                 self.harvesters[source.name] = self._create_harvester(source)
 
@@ -50,15 +66,28 @@ class HarvesterManager:
             self.disabled_harvesters[source_name] = self.harvesters[source_name]
             del self.harvesters[source_name]
         else:
-            print(f"Harvester {source_name} not found in enabled harvesters. Current harvesters: {self.harvesters.keys()}")
+            logger.warning(f"Harvester {source_name} not found in enabled harvesters. Current harvesters: {self.harvesters.keys()}")
+
+    @property
+    def metrics(self) -> MetricsRegistry:
+        """
+        The metrics of the manager (e.g. the duration of harvest runs) and of all enabled harvesters, labeled by source.
+        Use metrics.to_json(), metrics.to_prometheus() or metrics.dump(path, format) to output them.
+        """
+        return MetricsRegistry([self._metrics, *(harvester.metrics for harvester in self.harvesters.values())])
+
+    @classmethod
+    def harvester_class(cls, source_name: str) -> type[Harvester]:
+        """Return the harvester class for a source, importing its module if needed"""
+        path = cls.HARVESTER_MAPPING.get(source_name.lower())
+        if path is None:
+            raise ValueError(f"Cannot determine harvester for: {source_name}")
+        module_name, _, class_name = path.partition(":")
+        return getattr(importlib.import_module(module_name), class_name)
 
     def _create_harvester(self, source: Source) -> Harvester:
         """Create a harvester for the given source"""
-        harvest_class = self.HARVESTER_MAPPING.get(source.name.lower())
-        if harvest_class:
-            return harvest_class(source)
-        else:
-            raise ValueError(f"Cannot determine harvester for: {source}")
+        return self.harvester_class(source.name)(source)
 
     def add_single_type_search_values(self, entity_type: SearchEntityType, value_type: QueryValueType, values: list[str]) -> None:
         """
@@ -66,31 +95,163 @@ class HarvesterManager:
         The manager will create the SearchValue instances based on the input.
         """
         # TODO: implement this -- map entity and value types to match the harvester's search fields etc
+        # values are canonicalized when the SearchValues are created; duplicates and invalid identifiers are dropped here
+        search_values: dict[SearchValue, None] = {}
+        for value in values:
+            try:
+                search_values[SearchValue(value, value_type, entity_type)] = None
+            except InvalidIdentifierError as e:
+                logger.warning(f"Skipping invalid search value: {e}")
         for harvester_name, harvester in self.harvesters.items():
-            print(f"Adding search values to {harvester_name}")
+            logger.debug(f"Adding search values to {harvester_name}")
 
             if entity_type in harvester.ENTITY_MAPPING:
-                search_values = [SearchValue(value, value_type, entity_type) for value in values]
-                harvester.search_values = search_values
-                print(f"Added {len(search_values)} search values to {harvester_name}")
+                harvester.search_values = list(search_values)
+                logger.info(f"Added {len(search_values)} search values to {harvester_name}")
 
     def add_search_values(self, search_values: list[SearchValue]) -> None:
         """
         Add search values to all enabled harvesters.
+        The values are already canonicalized by SearchValue, so different notations of the same identifier are only added once.
         """
         if not search_values:
-            print("No search values provided")
+            logger.warning("No search values provided")
             return
+        search_values = list(dict.fromkeys(search_values))
         for harvester_name, harvester in self.harvesters.items():
-            valid_values = list()
             valid_entities = harvester.ENTITY_MAPPING.keys()
-            for entry in search_values:
-                for valid_type in valid_entities:
-                    if entry.entity is valid_type:
-                        valid_values.append(entry)
-                        break
+            valid_values = [entry for entry in search_values if entry.entity in valid_entities]
             if not valid_values:
-                print(f"No compatible search values received for {harvester_name}")
+                logger.info(f"No compatible search values received for {harvester_name}")
                 continue
             harvester.search_values = valid_values
-            print(f"Added {len(valid_values)} search values to {harvester_name}")
+            logger.info(f"Added {len(valid_values)} search values to {harvester_name}")
+
+    def import_search_values(
+        self,
+        path: str,
+        columns: list[str | int] | None = None,
+        entity_types: dict[QueryValueType, SearchEntityType] | None = None,
+        batch_size: int = 10_000,
+        **read_options,
+    ) -> "ImportStats":
+        """
+        Import the identifiers (DOIs, ORCIDs, ROR IDs, OpenAlex IDs, ISSNs, PMIDs) in a CSV or Excel file as search values, see bulk_import.
+        The file is streamed, and the identifiers are detected, deduplicated and added to the harvesters in batches of batch_size.
+        columns limits the import to these columns (header names or 0-based indexes); entity_types overrides the entity type per identifier type.
+        read_options are passed to bulk_import.iter_rows (sheet, encoding, delimiter). Returns the counts of the import.
+        """
+        from bulk_import import BulkImporter
+
+        importer = BulkImporter(entity_types=entity_types, batch_size=batch_size)
+        with self._metrics.span("import"):
+            return importer.import_file(path, self.add_search_values, columns, **read_options)
+
+    def iter_results(self, refresh: bool = False, store: bool = True) -> Iterator[tuple[str, str, dict]]:
+        """
+        Stream the results of all enabled harvesters that have search values,
+        yielding (harvester name, entity type, record) tuples as soon as they are retrieved.
+        See Harvester.iter_results for the meaning of refresh and store.
+        Harvesters that have not implemented searching yet are skipped.
+        """
+        for harvester_name, harvester in self.harvesters.items():
+            if not harvester.search_values:
+                continue
+            try:
+                for entity_key, record in harvester.iter_results(refresh=refresh, store=store):
+                    yield harvester_name, entity_key, record
+            except NotImplementedError:
+                logger.info(f"Skipping {harvester_name}: searching is not implemented yet")
+
+    def harvest(
+        self,
+        refresh: bool = False,
+        progress: Callable[[str, str, int], None] | None = None,
+        incremental: bool = False,
+    ) -> dict[str, dict[str, dict[str, dict]]]:
+        """
+        Run all enabled harvesters that have search values concurrently, each with its own concurrency and rate limit budget,
+        so the total time is roughly that of the slowest source instead of the sum of all sources.
+        If incremental is True, only the records that changed since the last harvest are retrieved (see Harvester.incremental_refresh);
+        harvesters that don't support this are skipped.
+
+        progress is called as progress(harvester name, status, number of records retrieved so far),
+        with status one of 'started', 'running', 'done', 'skipped' or 'failed'. By default, progress is logged at INFO level.
+        For incremental refreshes, only the records that were retrieved are counted, not the unchanged records loaded from the cache.
+
+        Returns the merged results, keyed by entity type and canonical identifier (see Harvester._canonical_key):
+        {entity type: {canonical id: {harvester name: record}}}
+        """
+        progress = progress or self._log_progress
+        harvesters = {name: harvester for name, harvester in self.harvesters.items() if harvester.search_values}
+        if not harvesters:
+            logger.warning("No harvesters with search values to run")
+            return {}
+        with self._metrics.span("harvest"), ThreadPoolExecutor(max_workers=len(harvesters)) as executor:
+            futures = {
+                name: executor.submit(self._run_harvester, name, harvester, refresh, progress, incremental)
+                for name, harvester in harvesters.items()
+            }
+        # merge in harvester order, so the result does not depend on which source finished first
+        merged: dict[str, dict[str, dict[str, dict]]] = {}
+        for name, future in futures.items():
+            if not future.result():
+                continue
+            harvester = harvesters[name]
+            for entity_key, records in harvester.get_results().items():
+                if not records:
+                    continue
+                entity_results = merged.setdefault(entity_key, {})
+                for record in records.values():
+                    entity_results.setdefault(harvester._canonical_key(entity_key, record), {})[name] = record
+        return merged
+
+    def merge_results(self, source_priority: list[str] | None = None, fuzzy: bool = True) -> dict[str, dict[str, MergedRecord]]:
+        """
+        Merge the results retrieved so far by all enabled harvesters into one record per entity, see harvesters.merge.
+        Records are linked by shared identifiers, and works without shared identifiers also by title and year (unless fuzzy is False).
+        Field values are taken from the sources in source_priority order (default: the order of the harvesters).
+        Returns {entity type: {canonical id: MergedRecord}}.
+        """
+        merger = RecordMerger(source_priority or list(self.harvesters), fuzzy=fuzzy)
+        for name, harvester in self.harvesters.items():
+            merger.add_harvester(name, harvester)
+        with self._metrics.span("merge"):
+            return merger.merge_all()
+
+    def _run_harvester(
+        self,
+        name: str,
+        harvester: Harvester,
+        refresh: bool,
+        progress: Callable[[str, str, int], None],
+        incremental: bool = False,
+    ) -> bool:
+        """Run a single harvester, reporting progress. Returns True if the harvester finished successfully."""
+        progress(name, "started", 0)
+        retrieved = 0
+        try:
+            with harvester.metrics.span("harvest"):
+                if incremental:
+                    # only count the records the refresh retrieved, not the unchanged records it loaded from the cache
+                    refreshed = harvester.metrics.counters.get("refreshed_records", 0)
+                    harvester.incremental_refresh()
+                    retrieved = int(harvester.metrics.counters.get("refreshed_records", 0) - refreshed)
+                else:
+                    for _ in harvester.iter_results(refresh=refresh):
+                        retrieved += 1
+                        if retrieved % 200 == 0:
+                            progress(name, "running", retrieved)
+        except NotImplementedError:
+            progress(name, "skipped", retrieved)
+            return False
+        except Exception:
+            logger.exception(f"Error while harvesting {name}")
+            progress(name, "failed", retrieved)
+            return False
+        progress(name, "done", retrieved)
+        return True
+
+    @staticmethod
+    def _log_progress(name: str, status: str, retrieved: int) -> None:
+        logger.info(f"[{name}] {status}: {retrieved} records retrieved")
@@ -0,0 +1,286 @@
+"""
+Persistent on-disk cache for harvested records, stored in a single SQLite file.
+
+Records are stored per (source, entity, record id), and can be looked up by any identifier registered for them
+(e.g. a work can be found by its OpenAlex ID, DOI or PMID). Each source has its own TTL, after which cached records
+are considered stale and will be fetched again. When the total size of the cached records exceeds the configured maximum,
+the least recently used records are evicted.
+
+The cache also keeps a harvest log: the time each query (search value) was last retrieved from a source, and the ids of the
+records it matched. Incremental refreshes use it to only retrieve the records that changed since then, and load the others from the cache.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections.abc import Iterator
+from functools import cache
+from settings import get_settings
+
+HOUR = 3600
+
+class ResponseCache:
+    """
+    SQLite-backed cache of harvested records with per-source TTLs and LRU eviction by total size.
+    Safe to share between threads and harvesters.
+    """
+
+    def __init__(self, path: str, max_bytes: int, default_ttl: float, ttls: dict[str, float] | None = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.ttls = ttls or {}
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS records (
+                source TEXT NOT NULL,
+                entity TEXT NOT NULL,
+                record_id TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (source, entity, record_id)
+            );
+            CREATE INDEX IF NOT EXISTS records_accessed_at ON records (accessed_at);
+            CREATE TABLE IF NOT EXISTS aliases (
+                source TEXT NOT NULL,
+                entity TEXT NOT NULL,
+                identifier TEXT NOT NULL,
+                record_id TEXT NOT NULL,
+                PRIMARY KEY (source, entity, identifier)
+            );
+            CREATE TABLE IF NOT EXISTS harvest_log (
+                source TEXT NOT NULL,
+                query_key TEXT NOT NULL,
+                harvested_at REAL NOT NULL,
+                PRIMARY KEY (source, query_key)
+            );
+            CREATE TABLE IF NOT EXISTS harvest_records (
+                source TEXT NOT NULL,
+                query_key TEXT NOT NULL,
+                record_ids BLOB NOT NULL,
+                PRIMARY KEY (source, query_key)
+            );
+            """
+        )
+        self._total_bytes = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM records").fetchone()[0]
+
+    @classmethod
+    def from_settings(cls, cache_settings: dict) -> "ResponseCache | None":
+        """Create a cache from the cache_settings section of the settings file. Returns None if caching is disabled."""
+        if not cache_settings.get("enabled", True):
+            return None
+        return cls(
+            path=cache_settings.get("path", ".cache/harvest_cache.sqlite"),
+            max_bytes=int(cache_settings.get("max_size_mb", 1024) * 1024 * 1024),
+            default_ttl=cache_settings.get("default_ttl_hours", 168) * HOUR,
+            ttls={source: hours * HOUR for source, hours in cache_settings.get("ttl_hours", {}).items()},
+        )
+
+    def ttl(self, source: str) -> float:
+        """Return the TTL in seconds for records of the given source."""
+        return self.ttls.get(source, self.default_ttl)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def _fresh_rows(self, source: str, entity: str, identifiers: list[str], columns: str):
+        """Yield the requested columns for all fresh records matching the identifiers. Call with the lock held."""
+        oldest = time.time() - self.ttl(source)
+        # query in chunks to stay below SQLite's limit on the number of host parameters
+        for start in range(0, len(identifiers), 500):
+            chunk = identifiers[start:start + 500]
+            yield from self._connection.execute(
+                f"""
+                SELECT {columns}
+                FROM aliases JOIN records
+                    ON records.source = aliases.source AND records.entity = aliases.entity AND records.record_id = aliases.record_id
+                WHERE aliases.source = ? AND aliases.entity = ? AND records.stored_at >= ?
+                    AND aliases.identifier IN ({",".join("?" * len(chunk))})
+                """,
+                (source, entity, oldest, *chunk),
+            ).fetchall()
+
+    def contains_many(self, source: str, entity: str, identifiers: list[str]) -> set[str]:
+        """Return the identifiers that have a fresh (non-expired) record in the cache, without loading the records."""
+        with self._lock:
+            return {identifier for (identifier,) in self._fresh_rows(source, entity, identifiers, "aliases.identifier")}
+
+    def get_many(self, source: str, entity: str, identifiers: list[str]) -> dict[str, dict]:
+        """
+        Look up records by identifier.
+        Returns a dict {identifier: record} for all identifiers that have a fresh (non-expired) record in the cache.
+        """
+        if not identifiers:
+            return {}
+        found: dict[str, dict] = {}
+        hit_ids: set[str] = set()
+        with self._lock:
+            for identifier, record_id, payload in self._fresh_rows(
+                source, entity, identifiers, "aliases.identifier, records.record_id, records.payload"
+            ):
+                found[identifier] = json.loads(zlib.decompress(payload))
+                hit_ids.add(record_id)
+            if hit_ids:
+                now = time.time()
+                self._connection.executemany(
+                    "UPDATE records SET accessed_at = ? WHERE source = ? AND entity = ? AND record_id = ?",
+                    [(now, source, entity, record_id) for record_id in hit_ids],
+                )
+                self._connection.commit()
+        return found
+
+    def iter_many(self, source: str, entity: str, identifiers: list[str], chunk_size: int = 1000) -> Iterator[tuple[str, dict]]:
+        """Like get_many, but yields (identifier, record) tuples, loading chunk_size records at a time."""
+        for start in range(0, len(identifiers), chunk_size):
+            yield from self.get_many(source, entity, identifiers[start:start + chunk_size]).items()
+
+    def put_many(self, source: str, entity: str, records: list[tuple[str, list[str], dict]]) -> None:
+        """
+        Store records in the cache.
+        Each entry is a tuple of (record_id, identifiers, record); the record can be retrieved using any of the identifiers.
+        Evicts the least recently used records if the cache grows beyond its maximum size.
+        """
+        if not records:
+            return
+        now = time.time()
+        with self._lock:
+            for record_id, identifiers, record in records:
+                payload = zlib.compress(json.dumps(record, separators=(",", ":")).encode(), 1)
+                previous = self._connection.execute(
+                    "SELECT size FROM records WHERE source = ? AND entity = ? AND record_id = ?",
+                    (source, entity, record_id),
+                ).fetchone()
+                if previous:
+                    self._total_bytes -= previous[0]
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (source, entity, record_id, payload, len(payload), now, now),
+                )
+                self._total_bytes += len(payload)
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO aliases VALUES (?, ?, ?, ?)",
+                    [(source, entity, identifier, record_id) for identifier in {record_id, *identifiers}],
+                )
+            self._evict()
+            self._connection.commit()
+
+    def touch_many(self, source: str, entity: str, identifiers: list[str]) -> None:
+        """
+        Mark the records matching the identifiers as fresh, as if they were stored now.
+        Used when a source confirms that the records have not changed since they were cached.
+        """
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(identifiers), 500):
+                chunk = identifiers[start:start + 500]
+                self._connection.execute(
+                    f"""
+                    UPDATE records SET stored_at = ?
+                    WHERE source = ? AND entity = ? AND record_id IN (
+                        SELECT record_id FROM aliases
+                        WHERE source = ? AND entity = ? AND identifier IN ({",".join("?" * len(chunk))})
+                    )
+                    """,
+                    (now, source, entity, source, entity, *chunk),
+                )
+            self._connection.commit()
+
+    def get_harvest_times(self, source: str, query_keys: list[str]) -> dict[str, float]:
+        """Return {query key: time of the last harvest} for the queries in the harvest log"""
+        found: dict[str, float] = {}
+        with self._lock:
+            for start in range(0, len(query_keys), 500):
+                chunk = query_keys[start:start + 500]
+                found.update(self._connection.execute(
+                    f"""SELECT query_key, harvested_at FROM harvest_log WHERE source = ? AND query_key IN ({",".join("?" * len(chunk))})""",
+                    (source, *chunk),
+                ).fetchall())
+        return found
+
+    def set_harvest_times(self, source: str, query_keys: list[str], harvested_at: float) -> None:
+        """Record harvested_at as the time of the last harvest of the given queries"""
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO harvest_log VALUES (?, ?, ?)",
+                [(source, query_key, harvested_at) for query_key in query_keys],
+            )
+            self._connection.commit()
+
+    def get_harvest_records(self, source: str, query_keys: list[str]) -> dict[str, list[str]]:
+        """Return {query key: ids of the records matched at the last harvest} for the queries of which these are known"""
+        found: dict[str, list[str]] = {}
+        with self._lock:
+            for start in range(0, len(query_keys), 500):
+                chunk = query_keys[start:start + 500]
+                for query_key, record_ids in self._connection.execute(
+                    f"""SELECT query_key, record_ids FROM harvest_records WHERE source = ? AND query_key IN ({",".join("?" * len(chunk))})""",
+                    (source, *chunk),
+                ):
+                    found[query_key] = json.loads(zlib.decompress(record_ids))
+        return found
+
+    def set_harvest_records(self, source: str, records: dict[str, list[str] | None]) -> None:
+        """Record the ids of the records matched by each query at its last harvest. None removes the ids of a query, i.e. they are unknown."""
+        with self._lock:
+            self._connection.executemany(
+                "DELETE FROM harvest_records WHERE source = ? AND query_key = ?",
+                [(source, query_key) for query_key, record_ids in records.items() if record_ids is None],
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO harvest_records VALUES (?, ?, ?)",
+                [
+                    (source, query_key, zlib.compress(json.dumps(record_ids, separators=(",", ":")).encode(), 1))
+                    for query_key, record_ids in records.items() if record_ids is not None
+                ],
+            )
+            self._connection.commit()
+
+    def _evict(self) -> None:
+        """Remove the least recently used records until the total size is below max_bytes. Call with the lock held."""
+        if self._total_bytes <= self.max_bytes:
+            return
+        to_free = self._total_bytes - self.max_bytes
+        evicted = []
+        for source, entity, record_id, size in self._connection.execute(
+            "SELECT source, entity, record_id, size FROM records ORDER BY accessed_at"
+        ):
+            evicted.append((source, entity, record_id))
+            to_free -= size
+            self._total_bytes -= size
+            if to_free <= 0:
+                break
+        self._connection.executemany("DELETE FROM records WHERE source = ? AND entity = ? AND record_id = ?", evicted)
+        self._connection.executemany("DELETE FROM aliases WHERE source = ? AND entity = ? AND record_id = ?", evicted)
+
+    def clear(self, source: str | None = None) -> None:
+        """Remove all cached records and the harvest log, or only those of the given source."""
+        with self._lock:
+            if source is None:
+                self._connection.execute("DELETE FROM records")
+                self._connection.execute("DELETE FROM aliases")
+                self._connection.execute("DELETE FROM harvest_log")
+                self._connection.execute("DELETE FROM harvest_records")
+            else:
+                self._connection.execute("DELETE FROM records WHERE source = ?", (source,))
+                self._connection.execute("DELETE FROM aliases WHERE source = ?", (source,))
+                self._connection.execute("DELETE FROM harvest_log WHERE source = ?", (source,))
+                self._connection.execute("DELETE FROM harvest_records WHERE source = ?", (source,))
+            self._connection.commit()
+            self._total_bytes = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM records").fetchone()[0]
+
+
+@cache
+def get_cache() -> ResponseCache | None:
+    """Return the cache shared by all harvesters, created from the cache_settings of the app settings on first use."""
+    return ResponseCache.from_settings(get_settings().cache_settings)
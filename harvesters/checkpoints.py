@@ -0,0 +1,84 @@
+"""
+Checkpoints for long-running (deep) harvests, so an interrupted harvest can be resumed instead of started over.
+
+Each query gets its own checkpoint, consisting of two files in the checkpoint directory:
+    <key>.jsonl: the records retrieved so far, one JSON record per line
+    <key>.json:  the state: the cursor for the next page, the number of records retrieved, and the size of the records file
+The state is written after the page is appended to the records file, and replaced atomically.
+On resume, any records written after the last saved state (e.g. when the process crashed mid-page) are discarded.
+"""
+import hashlib
+import json
+import os
+from collections.abc import Iterator
+
+class HarvestCheckpoint:
+    """Checkpoint for a single paginated query, identified by its URL"""
+
+    def __init__(self, directory: str, query_url: str):
+        self.directory = directory
+        self.query_url = query_url
+        key = hashlib.sha1(query_url.encode()).hexdigest()[:16]
+        self.state_path = os.path.join(directory, f"{key}.json")
+        self.records_path = os.path.join(directory, f"{key}.jsonl")
+        self.cursor: str = "*"
+        self.retrieved: int = 0
+        self._offset: int = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        """Load the saved state, if any, and discard records written after it"""
+        if not os.path.exists(self.state_path):
+            return
+        with open(self.state_path) as f:
+            state = json.load(f)
+        if state.get("query_url") != self.query_url:
+            return
+        self.cursor = state["cursor"]
+        self.retrieved = state["retrieved"]
+        self._offset = state["offset"]
+        if os.path.exists(self.records_path) and os.path.getsize(self.records_path) > self._offset:
+            with open(self.records_path, "r+b") as f:
+                f.truncate(self._offset)
+
+    @property
+    def is_complete(self) -> bool:
+        """True if all pages have been retrieved"""
+        return self.cursor is None
+
+    def iter_pages(self, page_size: int = 200) -> Iterator[list[dict]]:
+        """Yield the records retrieved in earlier runs, in lists of page_size records"""
+        if not self._offset:
+            return
+        page = []
+        with open(self.records_path, "rb") as f:
+            for line in f:
+                page.append(json.loads(line))
+                if len(page) >= page_size:
+                    yield page
+                    page = []
+        if page:
+            yield page
+
+    def save_page(self, records: list[dict], next_cursor: str | None) -> None:
+        """Append a page of records, then save the cursor for the next page"""
+        with open(self.records_path, "ab") as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+            self._offset = f.tell()
+        self.cursor = next_cursor
+        self.retrieved += len(records)
+        state = {"query_url": self.query_url, "cursor": self.cursor, "retrieved": self.retrieved, "offset": self._offset}
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_path)
+
+    def remove(self) -> None:
+        """Delete the checkpoint files"""
+        for path in (self.state_path, self.records_path):
+            if os.path.exists(path):
+                os.remove(path)
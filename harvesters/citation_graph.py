@@ -0,0 +1,96 @@
+"""
+Compact citation graph, as built by OpenAlexHarvester.expand_citations().
+
+Nodes are works, mapped to consecutive integers; edges point from the citing work to the cited work.
+The adjacency is stored in CSR (compressed sparse row) form, in two typed arrays:
+    indptr:  for node n, its cited works are indices[indptr[n]:indptr[n + 1]]   (length: number of nodes + 1)
+    indices: the node numbers of the cited works                               (length: number of edges)
+This takes ~12 bytes per edge and ~8 bytes per node plus the ID strings, so graphs with millions of edges fit in memory,
+and the arrays can be passed directly to e.g. scipy.sparse.csr_matrix((data, indices, indptr)) for further analysis.
+"""
+from array import array
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+
+@dataclass
+class CitationGraph:
+    """Directed citation graph in CSR form. ids[n] is the OpenAlex ID (e.g. 'W2741809807') of node n."""
+    ids: list[str]
+    indptr: array
+    indices: array
+    _index: dict[str, int] = field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self):
+        self._index = {work_id: node for node, work_id in enumerate(self.ids)}
+
+    @classmethod
+    def from_edges(cls, ids: list[str], sources: array, targets: array) -> "CitationGraph":
+        """Build the CSR arrays from parallel arrays of edge sources and targets (node numbers). Duplicate edges are removed."""
+        num_nodes = len(ids)
+        # counting sort of the edges by source, then sort and deduplicate the targets of each source
+        counts = array("q", [0]) * (num_nodes + 1)
+        for source in sources:
+            counts[source + 1] += 1
+        for node in range(num_nodes):
+            counts[node + 1] += counts[node]
+        fill = counts[:-1]
+        targets_by_source = array("i", [0]) * len(sources)
+        for source, target in zip(sources, targets):
+            targets_by_source[fill[source]] = target
+            fill[source] += 1
+        indptr = array("q", [0]) * (num_nodes + 1)
+        indices = array("i")
+        for node in range(num_nodes):
+            indices.extend(sorted(set(targets_by_source[counts[node]:counts[node + 1]])))
+            indptr[node + 1] = len(indices)
+        return cls(ids, indptr, indices)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.ids)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.indices)
+
+    def __contains__(self, work_id: str) -> bool:
+        return work_id in self._index
+
+    def node(self, work_id: str) -> int:
+        """Return the node number of a work"""
+        return self._index[work_id]
+
+    def references(self, work_id: str) -> list[str]:
+        """Return the IDs of the works cited by a work, that are part of the graph"""
+        node = self._index[work_id]
+        return [self.ids[target] for target in self.indices[self.indptr[node]:self.indptr[node + 1]]]
+
+    def out_degree(self) -> array:
+        """Number of cited works per node"""
+        return array("i", (self.indptr[node + 1] - self.indptr[node] for node in range(self.num_nodes)))
+
+    def in_degree(self) -> array:
+        """Number of citing works per node (within the graph)"""
+        degrees = array("i", [0]) * self.num_nodes
+        for target in self.indices:
+            degrees[target] += 1
+        return degrees
+
+    def edges(self) -> Iterator[tuple[str, str]]:
+        """Yield (citing work ID, cited work ID) for all edges"""
+        for node in range(self.num_nodes):
+            for target in self.indices[self.indptr[node]:self.indptr[node + 1]]:
+                yield self.ids[node], self.ids[target]
+
+    def reverse(self) -> "CitationGraph":
+        """Return the graph with all edges reversed, i.e. from cited to citing work"""
+        sources = array("i")
+        targets = array("i")
+        for node in range(self.num_nodes):
+            for target in self.indices[self.indptr[node]:self.indptr[node + 1]]:
+                sources.append(target)
+                targets.append(node)
+        return CitationGraph.from_edges(self.ids, sources, targets)
+
+    def __repr__(self) -> str:
+        return f"CitationGraph({self.num_nodes} works, {self.num_edges} citations)"
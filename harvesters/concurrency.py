@@ -0,0 +1,102 @@
+"""
+Helpers for running harvester requests concurrently while staying within the rate limits of an API.
+"""
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    The bucket holds up to `capacity` tokens and is refilled at `rate` tokens per second.
+    Each call to acquire() takes a token, blocking until one is available.
+    A rate of 0 or less disables rate limiting.
+    """
+
+    def __init__(self, rate: float, capacity: int | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self, tokens: int = 1) -> None:
+        """Take `tokens` tokens from the bucket, waiting until enough are available."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class _Failure:
+    """Wraps an exception raised in a producer thread, so it can be re-raised in the consuming thread."""
+    def __init__(self, exception: BaseException):
+        self.exception = exception
+
+_DONE = object()
+
+def stream_concurrently(producers: list[Callable[[], Iterable]], max_workers: int, max_buffered: int = 16) -> Iterator[tuple[int, object]]:
+    """
+    Run each producer (a function returning an iterable) in a pool of max_workers threads,
+    and yield (producer index, item) tuples as soon as any producer yields an item.
+
+    At most max_buffered items are kept waiting; producers block until the consumer catches up,
+    so memory use does not depend on the total number of items.
+    Exceptions raised by a producer are re-raised in the consumer.
+    If the consumer stops iterating early, the producers are stopped after their current item.
+    """
+    items: queue.Queue = queue.Queue(maxsize=max_buffered)
+    stopped = threading.Event()
+
+    def put(entry) -> bool:
+        while not stopped.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(index: int, producer: Callable[[], Iterable]) -> None:
+        try:
+            if stopped.is_set():
+                return
+            for item in producer():
+                if not put((index, item)):
+                    return
+        except BaseException as e:
+            put((index, _Failure(e)))
+        finally:
+            put((index, _DONE))
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for index, producer in enumerate(producers):
+            executor.submit(run, index, producer)
+        remaining = len(producers)
+        while remaining:
+            index, item = items.get()
+            if item is _DONE:
+                remaining -= 1
+            elif isinstance(item, _Failure):
+                raise item.exception
+            else:
+                yield index, item
+    finally:
+        stopped.set()
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -1,6 +1,19 @@
-from dataclasses import dataclass, field
+import logging
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from itertools import chain
 from settings import Source
 from enum import Enum
+from harvesters.cache import ResponseCache, get_cache
+from harvesters.concurrency import TokenBucket
+from harvesters.identifiers import canonicalize
+from harvesters.metrics import Metrics
+from harvesters.record_store import RecordStore
+from harvesters.transport import HttpTransport, get_transport
+
+logger = logging.getLogger(__name__)
+
 class QueryValueType(Enum):
     """
     Contains all recognized query value types (aka 'field' or 'search field' etc) for searching.
@@ -50,33 +63,107 @@ class SearchEntityType(Enum):
     LICENSE = "license"
     JOURNAL = "journal"
 
-@dataclass
+@dataclass(frozen=True)
 class SearchValue:
     """
     Stores a search value, the type to search for, and which search field to use.
     The 'field' and 'entity' fields should be of type QueryValueType and SearchEntityType respectively.
     If initialized with strings, they are converted to the corresponding Enum entries during init.
+    The value is converted to its canonical form during init (see harvesters.identifiers), so that equal identifiers result in equal SearchValues,
+    e.g. 'https://doi.org/10.1/ABC' and 'doi:10.1/abc' both become '10.1/abc'. Invalid identifiers raise an InvalidIdentifierError.
 
-    Optionally, additional filters can be added to the search value. This is a list of SearchValue objects that can be used to filter the search results further -- e.g. to filter by year or other metadata.
-    Do not change field or entity values after initialization (for now)
+    Optionally, additional filters can be added to the search value. This is a tuple of SearchValue objects that can be used to filter the search results further -- e.g. to filter by year or other metadata.
+    SearchValues are immutable and hashable, so they can be stored in sets and used as dict keys.
     """
     value: str
     field: QueryValueType | str
     entity: SearchEntityType | str
-    additional_filters: list["SearchValue"] = field(default_factory=list)
+    additional_filters: tuple["SearchValue", ...] = ()
 
     def __post_init__(self):
+        # the dataclass is frozen, so normalized values are set with object.__setattr__
         if isinstance(self.field, str):
-            self.field = QueryValueType[self.field.upper()]
+            object.__setattr__(self, "field", QueryValueType[self.field.upper()])
         if isinstance(self.entity, str):
-            self.entity = SearchEntityType[self.entity.upper()]
+            object.__setattr__(self, "entity", SearchEntityType[self.entity.upper()])
+        object.__setattr__(self, "value", canonicalize(self.field.value, self.value))
+        object.__setattr__(self, "additional_filters", tuple(self.additional_filters))
+
+# identifier types that are shared between sources, in order of preference for matching records across sources
+CANONICAL_FIELDS: list[QueryValueType] = [
+    QueryValueType.DOI,
+    QueryValueType.ORCID,
+    QueryValueType.ROR,
+    QueryValueType.ISSN,
+    QueryValueType.PMID,
+    QueryValueType.ISBN,
+]
+
+class SearchValueStore:
+    """
+    Insertion-ordered set of SearchValues, with O(1) inserts, membership tests and removals.
+    Also keeps track of which values have not been harvested yet, so a new run can retrieve only the added values (the 'delta').
+    """
+
+    def __init__(self, values: list[SearchValue] | None = None):
+        # dicts are used as insertion-ordered sets
+        self._values: dict[SearchValue, None] = {}
+        self._pending: dict[SearchValue, None] = {}
+        if values:
+            self.update(values)
+
+    def add(self, value: SearchValue) -> bool:
+        """Add a value. Returns True if it was not present yet."""
+        if value in self._values:
+            return False
+        self._values[value] = None
+        self._pending[value] = None
+        return True
+
+    def update(self, values: list[SearchValue]) -> list[SearchValue]:
+        """Add multiple values. Returns the values that were not present yet."""
+        return [value for value in values if self.add(value)]
+
+    def discard(self, value: SearchValue) -> None:
+        """Remove a value if present."""
+        self._values.pop(value, None)
+        self._pending.pop(value, None)
+
+    def pending(self) -> list[SearchValue]:
+        """Return the values that have not been harvested yet."""
+        return list(self._pending)
+
+    def mark_harvested(self, values: list[SearchValue]) -> None:
+        """Mark values as harvested, so they are not part of the next delta."""
+        for value in values:
+            self._pending.pop(value, None)
+
+    def reset(self) -> None:
+        """Mark all values as not harvested."""
+        self._pending = dict.fromkeys(self._values)
+
+    def __contains__(self, value: SearchValue) -> bool:
+        return value in self._values
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __repr__(self) -> str:
+        return f"SearchValueStore({list(self._values)}, pending={len(self._pending)})"
 
 class Harvester:
     """Base class for harvesters"""
 
     settings: Source
-    _search_values: list[SearchValue] = list()
-    _results: dict[str,dict] = dict() # store the harvest results here. key: inputted search value, value: retrieved result
+    max_workers: int
+    rate_limiter: TokenBucket
+    transport: HttpTransport
+    metrics: Metrics
+    _search_values: SearchValueStore
+    _results: dict[str, RecordStore] # store the harvest results here. key: entity type, value: compact mapping of retrieved records by id
     default_search_field: str = "id"
     default_entity: str = "work"
 
@@ -86,15 +173,43 @@ class Harvester:
     VALID_FIELDNAMES: list[QueryValueType]
     def __init__(self, settings: Source):
         self.settings = settings
+        # the shared cache is opened on first use (see the cache property), so creating a harvester doesn't touch the file system
+        self._cache: ResponseCache | None = None
+        self._cache_set = False
+        # each source has its own concurrency and rate limit budget
+        self.max_workers = settings.max_workers
+        self.rate_limiter = TokenBucket(rate=settings.requests_per_second)
+        # HTTP transport shared by all harvesters: pooled connections per host, retries with backoff and a circuit breaker
+        self.transport = get_transport()
+        # counters and timings of this harvester, see harvesters.metrics
+        self.metrics = Metrics({"source": settings.name})
+        self._search_values = SearchValueStore()
+        self._results = dict()
+        # time of the last harvest per search value, used if there is no cache to keep the harvest log (see _log_harvest)
+        self._harvest_log: dict[str, float] = {}
+        # ids of the records retrieved per search value (by harvest key) since its query started, see _add_matches
+        self._matches: dict[str, set[str]] = {}
 
     @property
-    def search_values(self) -> list[SearchValue]:
+    def cache(self) -> ResponseCache | None:
+        """The cache of retrieved records and the harvest log: the shared cache of the app (see harvesters.cache.get_cache), unless set"""
+        if not self._cache_set:
+            self.cache = get_cache()
+        return self._cache
+
+    @cache.setter
+    def cache(self, cache: ResponseCache | None) -> None:
+        self._cache = cache
+        self._cache_set = True
+
+    @property
+    def search_values(self) -> SearchValueStore:
         return self._search_values
 
     @search_values.setter
     def search_values(self, values: list[SearchValue]|list[dict]|list[tuple]|list[str]) -> None:
         """
-        Set the values to search for.
+        Add values to search for. Values that are already present are ignored.
         Can be a list of strings, dicts, tuples or SearchValue objects.
         Should contain a value, field, and entity type for each search term (all strs).
         For a list of strings, self.default_search_field is used for 'field' (default = "id").
@@ -114,22 +229,307 @@ class Harvester:
         else:
             raise ValueError("search_values must be a list of strings, dicts, tuples or SearchValue objects")
 
-        values = [value for value in values if value not in self._search_values]
-        self._search_values.extend(values)
+        self._search_values.update(values)
+
+    def remove_search_values(self, values: list[SearchValue]) -> None:
+        """Remove values from the search values. Already retrieved results are kept."""
+        for value in values:
+            self._search_values.discard(value)
 
+    def _get(self, url: str, **kwargs):
+        """
+        Send a GET request through the shared transport, within the rate limit of this source, and record it in the metrics.
+        kwargs are passed to requests (e.g. params, headers). Returns the requests.Response.
+        """
+        start = time.perf_counter()
+        self.rate_limiter.acquire()
+        self.metrics.observe("rate_limit_wait", time.perf_counter() - start)
+        return self.transport.get(url, metrics=self.metrics, **kwargs)
 
-    def _search(self) -> None:
+    def _search(self, search_values: list[SearchValue]) -> None:
         """Search for the given search values and store the results"""
+        for entity_key, record in self._iter_search(search_values):
+            self._add_result(entity_key, record)
+
+    def _iter_search(self, search_values: list[SearchValue]) -> Iterator[tuple[str, dict]]:
+        """Search for the given search values, and yield (entity type, record) tuples as soon as they are retrieved"""
         raise NotImplementedError("Implement the search method")
 
-    def get_results(self, refresh: bool = False) -> dict[str,dict]:
+    def _iter_search_updated(self, search_values: list[SearchValue], since: float) -> Iterator[tuple[str, dict]]:
+        """
+        Like _iter_search, but only yield the records that were created or updated since the given time (a unix timestamp).
+        Implement this in harvesters for sources that can filter on the update date, to support incremental_refresh().
+        """
+        raise NotImplementedError("Incremental refreshes are not supported by this harvester")
+
+    def _harvest_key(self, search_value: SearchValue) -> str:
+        """Return the key of a search value in the harvest log"""
+        return f"{search_value.entity.value}:{search_value.field.value}:{search_value.value}"
+
+    def _harvest_times(self, search_values: list[SearchValue]) -> dict[SearchValue, float]:
+        """Return {search value: time of the last harvest} for the search values that were harvested before"""
+        keys = {self._harvest_key(value): value for value in search_values}
+        if self.cache is None:
+            times = {key: self._harvest_log[key] for key in keys if key in self._harvest_log}
+        else:
+            times = self.cache.get_harvest_times(self.settings.name, list(keys))
+        return {keys[key]: harvested_at for key, harvested_at in times.items()}
+
+    def _harvest_records(self, search_values: list[SearchValue]) -> dict[SearchValue, list[str]]:
+        """Return {search value: ids of the records it matched at its last harvest} for the search values of which these are known"""
+        if self.cache is None:
+            return {}
+        keys = {self._harvest_key(value): value for value in search_values}
+        records = self.cache.get_harvest_records(self.settings.name, list(keys))
+        return {keys[key]: record_ids for key, record_ids in records.items()}
+
+    def _start_matches(self, harvest_keys: list[str]) -> None:
+        """Start collecting the records matched by the search values with the given harvest keys, when their query is run"""
+        for key in harvest_keys:
+            self._matches[key] = set()
+
+    def _add_matches(self, harvest_keys: list[str], records: list[dict]) -> None:
+        """
+        Remember that the records were retrieved by the query of the search values with the given harvest keys.
+        Values that are packed into one query share its records. The ids are stored in the harvest log by _log_harvest.
+        """
+        record_ids = [self._record_id(record) for record in records]
+        for key in harvest_keys:
+            self._matches.setdefault(key, set()).update(record_ids)
+
+    def _log_harvest(self, search_values: list[SearchValue], harvested_at: float) -> None:
+        """
+        Record harvested_at as the time of the last harvest of the search values: in the cache, or in memory if there is no cache.
+        Use the time the harvest started, so records that change during the harvest are retrieved again by the next incremental refresh.
+        The ids of the records matched by each search value (see _add_matches) are stored as well; for values without them, they become unknown.
+        """
+        if not search_values:
+            return
+        keys = [self._harvest_key(value) for value in search_values]
+        matches = {key: self._matches.pop(key, None) for key in keys}
+        if self.cache is None:
+            self._harvest_log.update(dict.fromkeys(keys, harvested_at))
+        else:
+            self.cache.set_harvest_times(self.settings.name, keys, harvested_at)
+            self.cache.set_harvest_records(
+                self.settings.name, {key: sorted(record_ids) if record_ids is not None else None for key, record_ids in matches.items()}
+            )
+
+    def _cache_key(self, search_value: SearchValue) -> str | None:
+        """
+        Return the identifier used to look up the result for this search value in the cache.
+        Return None if results for this search value can't be cached (e.g. searches that return a variable set of records).
+        Override in implementing classes to enable caching; by default nothing is cached.
+        """
+        return None
+
+    def _record_keys(self, entity_key: str, record: dict) -> list[str]:
+        """
+        Return all identifiers under which a retrieved record is stored in the cache.
+        These should match the values returned by _cache_key for the search values that would retrieve this record.
+        """
+        return []
+
+    def _canonical_key(self, entity_key: str, record: dict) -> str:
+        """
+        Return the identifier used to match this record with records of the same entity from other sources.
+        Uses the first available identifier in CANONICAL_FIELDS order, falling back to the source-specific record id.
+        """
+        keys = self._record_keys(entity_key, record)
+        for value_type in CANONICAL_FIELDS:
+            prefix = f"{value_type.value}:"
+            for key in keys:
+                if key.startswith(prefix):
+                    return key
+        return f"{self.settings.name}:{canonicalize(QueryValueType.ID.value, self._record_id(record))}"
+
+    def _record_id(self, record: dict) -> str:
+        """Return the id used to store a record in self._results"""
+        return record['id']
+
+    def _add_result(self, entity_key: str, record: dict) -> None:
+        """Store a retrieved record in self._results"""
+        store = self._results.get(entity_key)
+        if store is None:
+            store = self._results[entity_key] = RecordStore(entity_key)
+        store[self._record_id(record)] = record
+
+    def _load_from_cache(self, search_values: list[SearchValue]) -> tuple[Iterator[tuple[str, dict]], list[SearchValue]]:
         """
-        Return the results of the search.
-        If no results are present, run the search first.
-        If refresh is True, run the search again regardless of results.
+        Look up the given search values in the cache.
+        Returns an iterator of (entity type, record) tuples that loads the cached records in chunks,
+        and the search values that still need to be retrieved: non-cacheable values, and values that are missing or stale in the cache.
         """
-        if not self._results or refresh:
-            if not self._search_values:
-                raise ValueError("No search values set, cannot retrieve results")
-            self._search()
+        if self.cache is None:
+            return iter(()), list(search_values)
+        remaining = []
+        hits: dict[str, list[str]] = {}
+        lookups: dict[str, dict[str, list[SearchValue]]] = {}
+        for search_value in search_values:
+            key = self._cache_key(search_value)
+            if key is None:
+                remaining.append(search_value)
+            else:
+                lookups.setdefault(search_value.entity.value + 's', {}).setdefault(key, []).append(search_value)
+        with self.metrics.span("cache_lookup"):
+            for entity_key, keys in lookups.items():
+                found = self.cache.contains_many(self.settings.name, entity_key, list(keys))
+                hits[entity_key] = [key for key in keys if key in found]
+                remaining.extend(value for key, values in keys.items() if key not in found for value in values)
+        num_hits = sum(len(keys) for keys in hits.values())
+        self.metrics.increment("cache_hits", num_hits)
+        self.metrics.increment("cache_misses", sum(len(keys) for keys in lookups.values()) - num_hits)
+        logger.info(f"{len(search_values) - len(remaining)} of {len(search_values)} search values loaded from cache.")
+        cached = (
+            (entity_key, record)
+            for entity_key, keys in hits.items()
+            for _, record in self.cache.iter_many(self.settings.name, entity_key, keys)
+        )
+        return cached, remaining
+
+    def _store_in_cache(self, entity_key: str, records: list[dict]) -> None:
+        """Store retrieved records in the cache, if enabled."""
+        if self.cache is None or not records:
+            return
+        with self.metrics.span("cache_store"):
+            self.cache.put_many(
+                self.settings.name,
+                entity_key,
+                [(self._record_id(record), self._record_keys(entity_key, record), record) for record in records],
+            )
+
+    def get_results(self, refresh: bool = False) -> dict[str, RecordStore]:
+        """
+        Return the results of the search: {entity type: {record id: record}}.
+        The records of each entity type are kept in a RecordStore, a compact mapping that returns read-only views of the records.
+        Search values that have been added since the last run are retrieved first; values that were harvested before are not retrieved again.
+        If refresh is True, all search values are retrieved again.
+        Search values with a fresh record in the cache are not retrieved again.
+        """
+        if not self._search_values:
+            raise ValueError("No search values set, cannot retrieve results")
+        if refresh:
+            self._search_values.reset()
+        search_values = self._search_values.pending()
+        if search_values:
+            started = time.time()
+            cached, remaining = self._load_from_cache(search_values)
+            for entity_key, record in cached:
+                self._add_result(entity_key, record)
+            if remaining:
+                self._search(remaining)
+            self._log_harvest(remaining, started)
+            self._search_values.mark_harvested(search_values)
+        return self._results
+
+    def _load_unchanged(self, search_values: list[SearchValue], records: dict[SearchValue, list[str]]) -> list[SearchValue]:
+        """
+        Mark the cached records of search values that were harvested before as fresh, as they are confirmed to be unchanged,
+        and load them into the results. The records of a search value are those in the harvest log (records), or else its cached record.
+        Returns the search values that have to be retrieved in full: values of which the records are not known, or no longer in the cache.
+        """
+        identifiers: dict[str, dict[str, list[SearchValue]]] = {}
+        missing: dict[SearchValue, None] = {}
+        for value in search_values:
+            if value in records:
+                value_identifiers = records[value]
+            else:
+                key = self._cache_key(value)
+                if key is None:
+                    missing[value] = None
+                    continue
+                value_identifiers = [key]
+            entity_identifiers = identifiers.setdefault(value.entity.value + 's', {})
+            for identifier in value_identifiers:
+                entity_identifiers.setdefault(identifier, []).append(value)
+        loaded = 0
+        with self.metrics.span("cache_lookup"):
+            for entity_key, entity_identifiers in identifiers.items():
+                keys = list(entity_identifiers)
+                self.cache.touch_many(self.settings.name, entity_key, keys)
+                found = self.cache.contains_many(self.settings.name, entity_key, keys)
+                missing.update((value, None) for key in keys if key not in found for value in entity_identifiers[key])
+                for _, record in self.cache.iter_many(self.settings.name, entity_key, [key for key in keys if key in found]):
+                    self._add_result(entity_key, record)
+                    loaded += 1
+        logger.info(f"{loaded} unchanged records of {len(search_values) - len(missing)} search values loaded from cache.")
+        return list(missing)
+
+    def incremental_refresh(self) -> dict[str, RecordStore]:
+        """
+        Refresh the results by only retrieving the records that were created or updated since the last harvest of each search value,
+        instead of retrieving all records again like get_results(refresh=True). Returns self._results.
+        The harvest log of the cache keeps the time of the last harvest of each search value, and the ids of the records it matched.
+        Without a cache, the harvest times are kept in memory, and unchanged records are only available in the results of earlier runs.
+
+        Search values that were not harvested before are retrieved in full.
+        For the other search values, the records of the last harvest are loaded from the cache first, and then replaced by the records
+        that changed since. Values of which these records are not known (or no longer in the cache) are retrieved in full.
+        The number of changed and fully retrieved records is added to the 'refreshed_records' counter of self.metrics.
+        Only supported by harvesters that implement _iter_search_updated.
+        """
+        if not self._search_values:
+            raise ValueError("No search values set, cannot retrieve results")
+        started = time.time()
+        search_values = list(self._search_values)
+        harvest_times = self._harvest_times(search_values)
+        new_values = [value for value in search_values if value not in harvest_times]
+        records = self._harvest_records(list(harvest_times))
+        if self.cache is not None and harvest_times:
+            missing = self._load_unchanged(list(harvest_times), records)
+            for value in missing:
+                del harvest_times[value]
+            new_values.extend(missing)
+        # group the search values by the time of their last harvest, so values harvested together are refreshed in the same queries
+        groups: dict[float, list[SearchValue]] = {}
+        for value, harvested_at in harvest_times.items():
+            groups.setdefault(harvested_at, []).append(value)
+        updated = 0
+        for harvested_at, values in groups.items():
+            for entity_key, record in self._iter_search_updated(values, harvested_at):
+                self._add_result(entity_key, record)
+                updated += 1
+        logger.info(f"{updated} records changed since the last harvest of {len(harvest_times)} search values.")
+        # the records of a refreshed value are those of its last harvest, and the changed records that it matches now
+        for value in harvest_times:
+            key = self._harvest_key(value)
+            if value in records:
+                self._matches.setdefault(key, set()).update(records[value])
+            else:
+                self._matches.pop(key, None)
+        if new_values:
+            logger.info(f"Retrieving {len(new_values)} search values in full.")
+            for entity_key, record in self._iter_search(new_values):
+                self._add_result(entity_key, record)
+                updated += 1
+        # records that were actually retrieved by this refresh, as opposed to the unchanged records loaded from the cache
+        self.metrics.increment("refreshed_records", updated)
+        self._log_harvest(search_values, started)
+        self._search_values.mark_harvested(search_values)
         return self._results
+
+    def iter_results(self, refresh: bool = False, store: bool = True) -> Iterator[tuple[str, dict]]:
+        """
+        Streaming version of get_results: yields (entity type, record) tuples as soon as each page of results is retrieved,
+        starting with the records found in the cache.
+        Like get_results, only the search values added since the last run are retrieved, unless refresh is True.
+
+        If store is False, the records are not kept in self._results, so memory use stays flat regardless of the size of the harvest.
+        In that case the search values are not marked as harvested, and will be retrieved again (or loaded from the cache) on the next run.
+        """
+        if not self._search_values:
+            raise ValueError("No search values set, cannot retrieve results")
+        if refresh:
+            self._search_values.reset()
+        search_values = self._search_values.pending()
+        if not search_values:
+            return
+        started = time.time()
+        cached, remaining = self._load_from_cache(search_values)
+        for entity_key, record in chain(cached, self._iter_search(remaining) if remaining else ()):
+            if store:
+                self._add_result(entity_key, record)
+            yield entity_key, record
+        self._log_harvest(remaining, started)
+        if store:
+            self._search_values.mark_harvested(search_values)
@@ -0,0 +1,130 @@
+"""
+Normalization and validation of identifiers (DOI, ORCID, ROR, ISSN, PMID, OpenAlex ID).
+
+Each identifier type has a single canonical (bare) form, so that e.g. 'https://doi.org/10.1/ABC', 'doi:10.1/abc' and '10.1/abc'
+all result in the same value. This prevents duplicate lookups, and allows results from different sources to be joined on identifier.
+
+Functions in this module take the field name as a string (the value of a QueryValueType), so this module can be used without importing the harvesters.
+"""
+import re
+from functools import lru_cache
+
+class InvalidIdentifierError(ValueError):
+    """Raised when a value is not a valid identifier of the given type"""
+
+DOI_PATTERN = re.compile(r"^(?:https?://(?:dx\.)?doi\.org/|doi:\s*)?(10\.\d{1,9}(?:\.\d+)*/\S+)$", re.IGNORECASE)
+ORCID_PATTERN = re.compile(r"^(?:https?://(?:www\.)?orcid\.org/)?(\d{4})-?(\d{4})-?(\d{4})-?(\d{3}[\dX])$", re.IGNORECASE)
+ROR_PATTERN = re.compile(r"^(?:https?://(?:www\.)?ror\.org/)?(0[a-hj-km-np-tv-z0-9]{6}[0-9]{2})$", re.IGNORECASE)
+ISSN_PATTERN = re.compile(r"^(?:issn:?\s*)?(\d{4})-?(\d{3}[\dX])$", re.IGNORECASE)
+PMID_PATTERN = re.compile(r"^(?:https?://(?:www\.)?(?:pubmed\.ncbi\.nlm\.nih\.gov|ncbi\.nlm\.nih\.gov/pubmed)/|pmid:\s*)?0*(\d{1,9})/?$", re.IGNORECASE)
+OPENALEX_ID_PATTERN = re.compile(r"^(?:https?://(?:api\.)?openalex\.org/(?:[a-z]+/)?)?([WASIPFTCK]\d+)$", re.IGNORECASE)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# characters used by ROR IDs (Crockford base32), used to verify the checksum
+ROR_ALPHABET = "0123456789abcdefghjkmnpqrstvwxyz"
+
+def orcid_checksum(digits: str) -> str:
+    """ISO 7064 11,2 checksum over the first 15 digits of an ORCID"""
+    total = 0
+    for digit in digits:
+        total = (total + int(digit)) * 2
+    result = (12 - total % 11) % 11
+    return "X" if result == 10 else str(result)
+
+def issn_checksum(digits: str) -> str:
+    """Modulus 11 checksum over the first 7 digits of an ISSN"""
+    total = sum(int(digit) * weight for digit, weight in zip(digits, range(8, 1, -1)))
+    result = (11 - total % 11) % 11
+    return "X" if result == 10 else str(result)
+
+def ror_checksum(ror: str) -> str:
+    """ISO 7064 97,10 checksum over the base32-decoded first 7 characters of a ROR ID"""
+    number = 0
+    for char in ror[:7]:
+        number = number * 32 + ROR_ALPHABET.index(char)
+    return f"{98 - (number * 100) % 97:02d}"
+
+def normalize_doi(value: str) -> str:
+    """Return the bare, lowercase form of a DOI, e.g. '10.1234/abc'"""
+    match = DOI_PATTERN.match(value)
+    if not match:
+        raise InvalidIdentifierError(f"Invalid DOI: {value}")
+    return match.group(1).lower()
+
+def normalize_orcid(value: str) -> str:
+    """Return the bare, hyphenated form of an ORCID, e.g. '0000-0002-4769-5239'. Verifies the checksum."""
+    match = ORCID_PATTERN.match(value)
+    if not match:
+        raise InvalidIdentifierError(f"Invalid ORCID: {value}")
+    orcid = "-".join(match.groups()).upper()
+    if orcid_checksum(orcid.replace("-", "")[:15]) != orcid[-1]:
+        raise InvalidIdentifierError(f"Invalid ORCID checksum: {value}")
+    return orcid
+
+def normalize_ror(value: str) -> str:
+    """Return the bare, lowercase form of a ROR ID, e.g. '006hf6230'. Verifies the checksum."""
+    match = ROR_PATTERN.match(value)
+    if not match:
+        raise InvalidIdentifierError(f"Invalid ROR ID: {value}")
+    ror = match.group(1).lower()
+    if ror_checksum(ror) != ror[7:]:
+        raise InvalidIdentifierError(f"Invalid ROR checksum: {value}")
+    return ror
+
+def normalize_issn(value: str) -> str:
+    """Return the hyphenated, uppercase form of an ISSN, e.g. '1234-567X'. Verifies the checksum."""
+    match = ISSN_PATTERN.match(value)
+    if not match:
+        raise InvalidIdentifierError(f"Invalid ISSN: {value}")
+    issn = "-".join(match.groups()).upper()
+    if issn_checksum(issn.replace("-", "")[:7]) != issn[-1]:
+        raise InvalidIdentifierError(f"Invalid ISSN checksum: {value}")
+    return issn
+
+def normalize_pmid(value: str) -> str:
+    """Return the bare form of a PubMed ID without leading zeros, e.g. '12345678'"""
+    match = PMID_PATTERN.match(value)
+    if not match:
+        raise InvalidIdentifierError(f"Invalid PMID: {value}")
+    return match.group(1)
+
+def normalize_openalex_id(value: str) -> str:
+    """Return the short form of an OpenAlex ID, e.g. 'W2741809807'"""
+    match = OPENALEX_ID_PATTERN.match(value)
+    if not match:
+        raise InvalidIdentifierError(f"Invalid OpenAlex ID: {value}")
+    return match.group(1).upper()
+
+def normalize_id(value: str) -> str:
+    """
+    Normalize a generic 'id' value. These are OpenAlex IDs for the OpenAlex harvester,
+    but can be source-specific IDs for other sources, so values that are not OpenAlex IDs are left as is.
+    """
+    try:
+        return normalize_openalex_id(value)
+    except InvalidIdentifierError:
+        return value
+
+# maps QueryValueType values to their normalization function
+NORMALIZERS = {
+    "doi": normalize_doi,
+    "orcid": normalize_orcid,
+    "ror": normalize_ror,
+    "issn": normalize_issn,
+    "pmid": normalize_pmid,
+    "openalex_id": normalize_openalex_id,
+    "id": normalize_id,
+}
+
+@lru_cache(maxsize=2**16)
+def canonicalize(field: str, value: str) -> str:
+    """
+    Return the canonical form of value for the given field (a QueryValueType value, e.g. 'doi').
+    Identifier types without a normalizer only have their whitespace collapsed.
+    Raises InvalidIdentifierError if the value is not a valid identifier of the given type.
+    """
+    value = WHITESPACE_PATTERN.sub(" ", value).strip()
+    normalizer = NORMALIZERS.get(field)
+    if normalizer is None:
+        return value
+    return normalizer(value)
@@ -0,0 +1,247 @@
+"""
+Entity resolution across sources: merges the records that different harvesters retrieved for the same entity into one record.
+
+Records are linked in two steps:
+    1. identifier join: records that share an identifier (a DOI, ORCID, ROR, OpenAlex ID, ...) are linked, using a hash table
+       of identifier -> first record with that identifier. Links are kept in a union-find structure, so chains of shared
+       identifiers (A shares a DOI with B, B shares a PMID with C) end up in the same group.
+    2. fuzzy matching (works only): records without a shared identifier type (see CANONICAL_FIELDS) are compared to the works
+       of other sources in the same block, i.e. with the same rare title word and a publication year within one year,
+       and linked if their normalized titles are similar enough. Blocks are capped in size, so this stays linear in the number of records.
+
+Each group of linked records becomes a MergedRecord: the fields of the records, taken from the source with the highest priority that
+has a value for it, with the source of every field (provenance) and the ids of the merged records per source.
+
+Usage, after harvesting:
+    merged = manager.merge_results(source_priority=["openalex", "crossref"])
+    merged["works"]["doi:10.1234/abc"].provenance
+"""
+import logging
+import re
+import unicodedata
+from array import array
+from collections import Counter
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from harvesters.generics import CANONICAL_FIELDS, Harvester, QueryValueType
+
+logger = logging.getLogger(__name__)
+
+NON_ALPHANUMERIC = re.compile(r"[^0-9a-z]+")
+# title words that are too common to be useful for blocking
+STOPWORDS = frozenset("a an and as at by for from in into of on or the to with".split())
+
+@dataclass
+class MergedRecord:
+    """A single entity, merged from the records of one or more sources"""
+    key: str
+    entity_key: str
+    fields: dict = field(default_factory=dict)
+    # field name -> name of the source the value was taken from
+    provenance: dict[str, str] = field(default_factory=dict)
+    # source name -> ids of the records of that source that were merged
+    sources: dict[str, list[str]] = field(default_factory=dict)
+    identifiers: list[str] = field(default_factory=list)
+    # 'identifier' if all records were linked by shared identifiers, 'fuzzy' if title matching was needed
+    match: str = "identifier"
+
+def normalize_title(title: str | None) -> str:
+    """Lowercase a title, strip accents and replace punctuation by single spaces"""
+    if not title:
+        return ""
+    title = unicodedata.normalize("NFKD", title.casefold()).encode("ascii", "ignore").decode()
+    return NON_ALPHANUMERIC.sub(" ", title).strip()
+
+def _title(record: Mapping) -> str | None:
+    title = record.get("title") or record.get("display_name")
+    # some APIs (e.g. Crossref) return titles as a list
+    if isinstance(title, list):
+        title = title[0] if title else None
+    return title if isinstance(title, str) else None
+
+def _year(record: Mapping) -> int | None:
+    year = record.get("publication_year") or record.get("year")
+    return year if isinstance(year, int) else None
+
+def _is_empty(value) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+class _UnionFind:
+    """Disjoint sets over consecutive integers, with union by size and path halving, stored in typed arrays"""
+
+    def __init__(self):
+        self.parent = array("i")
+        self.size = array("i")
+
+    def add(self) -> int:
+        node = len(self.parent)
+        self.parent.append(node)
+        self.size.append(1)
+        return node
+
+    def find(self, node: int) -> int:
+        parent = self.parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(self, a: int, b: int) -> bool:
+        """Link the sets of a and b. Returns False if they were already linked."""
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return True
+
+class RecordMerger:
+    """
+    Collects records from multiple sources, and merges the records of the same entity, see the module docstring.
+    source_priority lists the sources in order of preference for field values; sources that are not listed come last, in the order they were added.
+    Fuzzy title matching can be disabled with fuzzy=False; title_threshold is the minimum similarity (0-1) of two normalized titles,
+    and max_block_size the maximum number of candidate works a record is compared to per block.
+    """
+
+    def __init__(
+        self,
+        source_priority: list[str] | None = None,
+        fuzzy: bool = True,
+        title_threshold: float = 0.92,
+        max_block_size: int = 50,
+    ):
+        self.source_priority = list(source_priority or [])
+        self.fuzzy = fuzzy
+        self.title_threshold = title_threshold
+        self.max_block_size = max_block_size
+        # per entity type: the records, their source, id and identifiers, and the union-find structure linking them
+        self._records: dict[str, list[Mapping]] = {}
+        self._sources: dict[str, list[str]] = {}
+        self._record_ids: dict[str, list[str]] = {}
+        self._identifiers: dict[str, list[tuple[str, ...]]] = {}
+        self._sets: dict[str, _UnionFind] = {}
+        # per entity type: identifier -> first record with that identifier (the hash join)
+        self._index: dict[str, dict[str, int]] = {}
+        self._fuzzy_matched: dict[str, set[int]] = {}
+
+    def _priority(self, source: str) -> int:
+        if source not in self.source_priority:
+            self.source_priority.append(source)
+        return self.source_priority.index(source)
+
+    def add(self, source: str, entity_key: str, record: Mapping, record_id: str, identifiers: list[str]) -> None:
+        """
+        Add a record, and link it to the records added before that share an identifier.
+        identifiers are namespaced keys such as 'doi:10.1234/abc' (see Harvester._record_keys); identifiers that are only unique
+        within a source (e.g. its internal ids) should be prefixed with the source name instead.
+        """
+        self._priority(source)
+        sets = self._sets.setdefault(entity_key, _UnionFind())
+        index = self._index.setdefault(entity_key, {})
+        node = sets.add()
+        self._records.setdefault(entity_key, []).append(record)
+        self._sources.setdefault(entity_key, []).append(source)
+        self._record_ids.setdefault(entity_key, []).append(record_id)
+        identifiers = tuple(dict.fromkeys((f"{source}:{record_id}", *identifiers)))
+        self._identifiers.setdefault(entity_key, []).append(identifiers)
+        for identifier in identifiers:
+            first = index.setdefault(identifier, node)
+            if first != node:
+                sets.union(first, node)
+
+    def add_harvester(self, name: str, harvester: Harvester) -> None:
+        """Add the results a harvester retrieved so far, with the identifiers it registers for its records in the cache"""
+        id_prefix = f"{QueryValueType.ID.value}:"
+        for entity_key, records in harvester._results.items():
+            for record_id, record in records.items():
+                # 'id' keys are the source's own ids, which can't be compared to the ids of other sources
+                identifiers = [
+                    f"{name}:{key.removeprefix(id_prefix)}" if key.startswith(id_prefix) else key
+                    for key in harvester._record_keys(entity_key, record)
+                ]
+                self.add(name, entity_key, record, record_id, identifiers)
+
+    def _link_fuzzy(self, entity_key: str) -> int:
+        """Link works without a shared identifier type to works of other sources with a similar title. Returns the number of links."""
+        records = self._records[entity_key]
+        sources = self._sources[entity_key]
+        sets = self._sets[entity_key]
+        shared_prefixes = tuple(f"{field.value}:" for field in CANONICAL_FIELDS)
+        titles = [normalize_title(_title(record)) for record in records]
+        years = [_year(record) for record in records]
+        tokens = [frozenset(token for token in title.split() if len(token) > 2 and token not in STOPWORDS) for title in titles]
+        frequency = Counter(token for record_tokens in tokens for token in record_tokens)
+        # block on (year, rarest title word) and (year, second rarest title word)
+        blocks: dict[tuple[int | None, str], list[int]] = {}
+        block_keys = []
+        for node, record_tokens in enumerate(tokens):
+            rarest = sorted(record_tokens, key=lambda token: (frequency[token], token))[:2]
+            block_keys.append(rarest)
+            for token in rarest:
+                blocks.setdefault((years[node], token), []).append(node)
+        links = 0
+        for node, identifiers in enumerate(self._identifiers[entity_key]):
+            if not titles[node] or any(identifier.startswith(shared_prefixes) for identifier in identifiers):
+                continue
+            year = years[node]
+            compared = set()
+            for token in block_keys[node]:
+                for candidate_year in ((year - 1, year, year + 1) if year is not None else (None,)):
+                    for candidate in blocks.get((candidate_year, token), ())[:self.max_block_size]:
+                        if candidate == node or candidate in compared or sources[candidate] == sources[node]:
+                            continue
+                        compared.add(candidate)
+                        if sets.find(candidate) == sets.find(node):
+                            continue
+                        if titles[candidate] != titles[node]:
+                            # cheap check on the title words first, as comparing the titles character by character is much slower
+                            if len(tokens[node] & tokens[candidate]) < len(tokens[node] | tokens[candidate]) * self.title_threshold / 2:
+                                continue
+                            matcher = SequenceMatcher(None, titles[node], titles[candidate], autojunk=False)
+                            if matcher.quick_ratio() < self.title_threshold or matcher.ratio() < self.title_threshold:
+                                continue
+                        sets.union(node, candidate)
+                        self._fuzzy_matched.setdefault(entity_key, set()).update((node, candidate))
+                        links += 1
+        return links
+
+    def _merge_group(self, entity_key: str, nodes: list[int]) -> MergedRecord:
+        sources = self._sources[entity_key]
+        nodes = sorted(nodes, key=lambda node: (self.source_priority.index(sources[node]), node))
+        identifiers = list(dict.fromkeys(identifier for node in nodes for identifier in self._identifiers[entity_key][node]))
+        key = next(
+            (identifier for field in CANONICAL_FIELDS for identifier in identifiers if identifier.startswith(f"{field.value}:")),
+            identifiers[0],
+        )
+        fuzzy_matched = self._fuzzy_matched.get(entity_key, ())
+        merged = MergedRecord(key, entity_key, identifiers=identifiers, match="fuzzy" if any(node in fuzzy_matched for node in nodes) else "identifier")
+        for node in nodes:
+            source = sources[node]
+            merged.sources.setdefault(source, []).append(self._record_ids[entity_key][node])
+            for name, value in self._records[entity_key][node].items():
+                if name not in merged.fields or (_is_empty(merged.fields[name]) and not _is_empty(value)):
+                    merged.fields[name] = value
+                    merged.provenance[name] = source
+        return merged
+
+    def merge(self, entity_key: str) -> Iterator[MergedRecord]:
+        """Yield one MergedRecord per entity of the given type"""
+        if entity_key not in self._records:
+            return
+        if self.fuzzy and entity_key == "works":
+            links = self._link_fuzzy(entity_key)
+            logger.info(f"Linked {links} works without shared identifiers by title.")
+        sets = self._sets[entity_key]
+        groups: dict[int, list[int]] = {}
+        for node in range(len(self._records[entity_key])):
+            groups.setdefault(sets.find(node), []).append(node)
+        logger.info(f"Merged {len(self._records[entity_key])} {entity_key} records into {len(groups)} entities.")
+        for nodes in groups.values():
+            yield self._merge_group(entity_key, nodes)
+
+    def merge_all(self) -> dict[str, dict[str, MergedRecord]]:
+        """Merge all entity types: {entity type: {canonical key: merged record}}"""
+        return {entity_key: {merged.key: merged for merged in self.merge(entity_key)} for entity_key in self._records}
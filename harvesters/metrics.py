@@ -0,0 +1,151 @@
+"""
+Instrumentation for harvesters: counters (requests, pages, records, bytes, retries, rate limit responses, cache hits/misses)
+and timing spans (e.g. per query and per page), with JSON and Prometheus text output.
+
+Each harvester has its own Metrics object (Harvester.metrics), labeled with the name of the source.
+HarvesterManager.metrics combines the metrics of the manager and all its harvesters in a MetricsRegistry.
+All methods are thread-safe, as harvesters record metrics from multiple worker threads.
+"""
+import json
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+@dataclass
+class SpanStats:
+    """Aggregated durations of a timing span"""
+    count: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_seconds": round(self.total_seconds, 6),
+            "mean_seconds": round(self.total_seconds / self.count, 6) if self.count else 0.0,
+            "max_seconds": round(self.max_seconds, 6),
+        }
+
+class Metrics:
+    """Counters and timing spans for a single component, e.g. a harvester"""
+
+    def __init__(self, labels: dict[str, str] | None = None):
+        self.labels = labels or {}
+        self._lock = threading.Lock()
+        self.counters: dict[str, float] = {}
+        self.spans: dict[str, SpanStats] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Add value to a counter"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record a duration for a timing span"""
+        with self._lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = SpanStats()
+            stats.count += 1
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as an occurrence of the span name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    @property
+    def cache_hit_rate(self) -> float | None:
+        """Fraction of cacheable lookups that were found in the cache, or None if there were no lookups"""
+        hits = self.counters.get("cache_hits", 0)
+        lookups = hits + self.counters.get("cache_misses", 0)
+        return hits / lookups if lookups else None
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters = {}
+            self.spans = {}
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "labels": dict(self.labels),
+                "counters": dict(self.counters),
+                "spans": {name: stats.as_dict() for name, stats in self.spans.items()},
+                "cache_hit_rate": self.cache_hit_rate,
+            }
+
+    def to_json(self, indent: int | None = 2) -> str:
+        return json.dumps(self.as_dict(), indent=indent)
+
+    def to_prometheus(self, prefix: str = "harvester") -> str:
+        return MetricsRegistry([self]).to_prometheus(prefix)
+
+    def dump(self, path: str, output_format: str = "json") -> None:
+        MetricsRegistry([self]).dump(path, output_format)
+
+    def __repr__(self) -> str:
+        return f"Metrics({self.labels}, counters={self.counters})"
+
+def _escape(value: object) -> str:
+    """Escape a Prometheus label value"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class MetricsRegistry:
+    """A group of Metrics objects, which can be output together"""
+
+    def __init__(self, metrics: list[Metrics]):
+        self.metrics = metrics
+
+    def as_dict(self) -> list[dict]:
+        return [metrics.as_dict() for metrics in self.metrics]
+
+    def to_json(self, indent: int | None = 2) -> str:
+        return json.dumps(self.as_dict(), indent=indent)
+
+    def to_prometheus(self, prefix: str = "harvester") -> str:
+        """Return the metrics in the Prometheus text exposition format, with the labels of each Metrics object"""
+        # metric family name -> (type, samples)
+        families: dict[str, tuple[str, list[str]]] = {}
+
+        def add(family: str, metric_type: str, name: str, labels: dict[str, str], value: float) -> None:
+            label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            sample = f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}"
+            families.setdefault(family, (metric_type, []))[1].append(sample)
+
+        for metrics in self.metrics:
+            data = metrics.as_dict()
+            labels = data["labels"]
+            for counter, value in data["counters"].items():
+                name = f"{prefix}_{counter}_total"
+                add(name, "counter", name, labels, value)
+            for span, stats in data["spans"].items():
+                family = f"{prefix}_{span}_seconds"
+                add(family, "summary", f"{family}_count", labels, stats["count"])
+                add(family, "summary", f"{family}_sum", labels, stats["total_seconds"])
+                add(f"{family}_max", "gauge", f"{family}_max", labels, stats["max_seconds"])
+            if data["cache_hit_rate"] is not None:
+                add(f"{prefix}_cache_hit_ratio", "gauge", f"{prefix}_cache_hit_ratio", labels, data["cache_hit_rate"])
+        lines = []
+        for family, (metric_type, metric_samples) in families.items():
+            lines.append(f"# TYPE {family} {metric_type}")
+            lines.extend(metric_samples)
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str, output_format: str = "json") -> None:
+        """Write the metrics to path, as 'json' or 'prometheus' text"""
+        if output_format not in ("json", "prometheus"):
+            raise ValueError(f"Unknown metrics format: {output_format}. Use 'json' or 'prometheus'")
+        with open(path, "w") as f:
+            f.write(self.to_json() if output_format == "json" else self.to_prometheus())
+
+    def reset(self) -> None:
+        for metrics in self.metrics:
+            metrics.reset()
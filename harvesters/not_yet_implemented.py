@@ -33,18 +33,6 @@ class DOAJHarvester(Harvester):
     """Class to harvest data from the DOAJ API"""
     ...
 
-class OpenAPCHarvester(Harvester):
-    """
-    Class to harvest data from the OpenAPC dataset
-    https://github.com/OpenAPC/openapc-de
-
-    This dataset contains APC data for ~240.000 articles from 450 institutions. This data can be used both for direct APC information,
-    but also to determine a APC estimate for a given publisher/journal/year.
-
-    The main data is stored as a CSV file. So, retrieve that file, and then extract the data from it.
-    """
-    ...
-
 class COREHarvester(Harvester):
     """Class to harvest data from the CORE API"""
     ...
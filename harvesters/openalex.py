@@ -1,31 +1,80 @@
-import pyalex
+import logging
+from array import array
+import time
 from collections import defaultdict
-from itertools import batched, chain
-from pyalex import (
-    Work,
-    Works,
-    Author,
-    Authors,
-    Source,
-    Sources,
-    Publisher,
-    Publishers,
-    Institution,
-    Institutions,
-    Funder,
-    Funders,
-    Topic,
-    Topics,
-    Subfield,
-    Subfields,
-    Field,
-    Fields,
-    Domain,
-    Domains,
-)
-from pyalex.api import BaseOpenAlex
-from harvesters.generics import Harvester, SearchEntityType, QueryValueType
-from settings import SETTINGS
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import cache, partial
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+from harvesters.checkpoints import HarvestCheckpoint
+from harvesters.citation_graph import CitationGraph
+from harvesters.concurrency import TokenBucket, stream_concurrently
+from harvesters.generics import Harvester, SearchEntityType, SearchValue, QueryValueType
+from harvesters.identifiers import InvalidIdentifierError, canonicalize
+from harvesters.openalex_snapshot import EXTRACTORS, scan_snapshot
+from harvesters.publishers import normalize_record_publishers
+from harvesters.query_planner import PlannedQuery, pack_values
+from harvesters.record_store import RecordStore
+from harvesters.transport import HttpTransport, get_transport
+from settings import get_settings
+
+if TYPE_CHECKING:
+    from pyalex.api import BaseOpenAlex
+
+logger = logging.getLogger(__name__)
+
+class _TransportSession:
+    """Stands in for the requests.Session that pyalex creates for every request, and sends its requests through the shared transport"""
+
+    def __init__(self, transport: HttpTransport):
+        self.transport = transport
+
+    def get(self, url: str, **kwargs):
+        return self.transport.get(url, **kwargs)
+
+@cache
+def _import_pyalex():
+    """
+    Import pyalex on first use, as it pulls in requests and urllib3, which make up most of the import time of this module.
+    Also routes all requests of pyalex through the shared transport (see harvesters.transport) instead of a new session per request,
+    so connections are reused, and retries, backoff and metrics are handled in one place.
+    """
+    import pyalex
+
+    # pyalex has no public hook for its session, so the private factory is replaced; pyproject.toml pins the versions that have it
+    if not callable(getattr(pyalex.api, "_get_requests_session", None)):
+        raise ImportError(
+            f"pyalex {getattr(pyalex, '__version__', '(unknown version)')} is not supported: it has no api._get_requests_session "
+            "to route its requests through the shared transport. Install a supported version with `uv sync` (see pyproject.toml)."
+        )
+    pyalex.api._get_requests_session = lambda: _TransportSession(get_transport())
+    return pyalex
+
+@dataclass
+class CountTable:
+    """
+    Number of records per group, as returned by an OpenAlex group_by request (e.g. the number of works per publication year).
+    counts maps the group keys to their counts; labels maps the keys to their display names, for keys that are IDs (e.g. publishers).
+    """
+    group_by: str
+    counts: dict[str, int] = field(default_factory=dict)
+    labels: dict[str, str] = field(default_factory=dict)
+    # number of records that matched the query; records can be counted in several groups (e.g. works with multiple publishers)
+    total: int = 0
+
+    def add(self, groups: list[dict]) -> None:
+        """Add the groups of a group_by response"""
+        for group in groups:
+            key = str(group["key"])
+            self.counts[key] = self.counts.get(key, 0) + group["count"]
+            if group.get("key_display_name") not in (None, key):
+                self.labels[key] = group["key_display_name"]
+
+    def rows(self) -> list[tuple[str, str, int]]:
+        """Return (key, display name, count) rows, largest count first"""
+        return sorted(((key, self.labels.get(key, key), count) for key, count in self.counts.items()), key=lambda row: -row[2])
 
 class OpenAlexHarvester(Harvester):
     """
@@ -49,21 +98,23 @@ class OpenAlexHarvester(Harvester):
         "domains": {domain_id: {domain_data}},
     }
 
-    the keys are the OpenAlex IDs of the entities, and the values are the retrieved data as dicts.
+    the keys are the OpenAlex IDs of the entities, and the values are the retrieved data.
+    The records of each entity type are kept in a compact RecordStore (see harvesters.record_store), which returns read-only mapping views of the records.
     """
 
-    # maps entity strings to the corresponding pyalex classes used for searching
-    ENTITY_MAPPING: dict[SearchEntityType, BaseOpenAlex] = {
-        SearchEntityType.WORK: Works,
-        SearchEntityType.AUTHOR: Authors,
-        SearchEntityType.SOURCE: Sources,
-        SearchEntityType.PUBLISHER: Publishers,
-        SearchEntityType.INSTITUTION: Institutions,
-        SearchEntityType.FUNDER: Funders,
-        SearchEntityType.TOPIC: Topics,
-        SearchEntityType.SUBFIELD: Subfields,
-        SearchEntityType.FIELD: Fields,
-        SearchEntityType.DOMAIN: Domains,
+    # maps entity strings to the names of the corresponding pyalex classes used for searching (see _query).
+    # Names are used instead of the classes, so pyalex is only imported when the first query is constructed.
+    ENTITY_MAPPING: dict[SearchEntityType, str] = {
+        SearchEntityType.WORK: "Works",
+        SearchEntityType.AUTHOR: "Authors",
+        SearchEntityType.SOURCE: "Sources",
+        SearchEntityType.PUBLISHER: "Publishers",
+        SearchEntityType.INSTITUTION: "Institutions",
+        SearchEntityType.FUNDER: "Funders",
+        SearchEntityType.TOPIC: "Topics",
+        SearchEntityType.SUBFIELD: "Subfields",
+        SearchEntityType.FIELD: "Fields",
+        SearchEntityType.DOMAIN: "Domains",
     }
 
     # field names recognized by this class for searching
@@ -78,158 +129,875 @@ class OpenAlexHarvester(Harvester):
         QueryValueType.PMID,
         ]
 
+    # field projections (the OpenAlex 'select' parameter) for common use cases, per entity type.
+    # Only the listed top-level fields are retrieved, which greatly reduces the size of the responses.
+    # Entities without fields for the chosen preset are retrieved in full.
+    SELECT_PRESETS: dict[str, dict[SearchEntityType, list[str]]] = {
+        "oa-status": {
+            SearchEntityType.WORK: [
+                "id", "doi", "ids", "title", "publication_year", "type", "open_access", "primary_location", "best_oa_location",
+            ],
+            SearchEntityType.SOURCE: [
+                "id", "issn_l", "issn", "display_name", "is_oa", "is_in_doaj", "apc_usd", "host_organization", "host_organization_name",
+            ],
+        },
+        "bibliographic": {
+            SearchEntityType.WORK: [
+                "id", "doi", "ids", "title", "publication_year", "publication_date", "type", "language", "primary_location",
+                "authorships", "biblio", "cited_by_count",
+            ],
+        },
+        "affiliation": {
+            SearchEntityType.WORK: [
+                "id", "doi", "ids", "title", "publication_year", "authorships", "corresponding_author_ids", "corresponding_institution_ids",
+            ],
+            SearchEntityType.AUTHOR: ["id", "orcid", "display_name", "affiliations", "last_known_institutions"],
+            SearchEntityType.INSTITUTION: ["id", "ror", "display_name", "country_code", "type", "lineage"],
+        },
+    }
+
+    # OpenAlex filter / group_by keys of the works fields that can be used in SearchValue.additional_filters and aggregate().
+    # Publishers are filtered and grouped by OpenAlex publisher ID (including parent publishers).
+    FILTER_FIELDS: dict[QueryValueType, str] = {
+        QueryValueType.PUBLICATION_YEAR: "publication_year",
+        QueryValueType.PUBLICATION_DATE: "publication_date",
+        QueryValueType.PUBLISHER: "primary_location.source.publisher_lineage",
+        QueryValueType.OA_STATUS: "open_access.oa_status",
+        QueryValueType.IS_OA: "open_access.is_oa",
+        QueryValueType.TYPE: "type",
+    }
+
+    # (field, entity) combinations that identify exactly one record; only these results are cached
+    CACHEABLE_FIELDS: dict[QueryValueType, set[SearchEntityType] | None] = {
+        QueryValueType.ID: None, # None: any entity
+        QueryValueType.OPENALEX_ID: None,
+        QueryValueType.DOI: {SearchEntityType.WORK},
+        QueryValueType.PMID: {SearchEntityType.WORK},
+        QueryValueType.ORCID: {SearchEntityType.AUTHOR},
+        QueryValueType.ROR: {SearchEntityType.INSTITUTION, SearchEntityType.PUBLISHER, SearchEntityType.FUNDER},
+        QueryValueType.ISSN: {SearchEntityType.SOURCE},
+    }
+
+    # paths of the dehydrated entities embedded in the records of each entity type, used by hydrate().
+    # A path ends at a dehydrated record (a dict with an 'id'), an OpenAlex ID, or a list of these; lists along the path are followed.
+    # The type of a referenced entity is derived from the prefix of its ID (see ID_PREFIXES).
+    DEHYDRATED_FIELDS: dict[SearchEntityType, list[str]] = {
+        SearchEntityType.WORK: [
+            "primary_location.source", "best_oa_location.source", "locations.source", "authorships.author",
+            "authorships.institutions", "primary_topic", "topics", "grants.funder",
+        ],
+        SearchEntityType.AUTHOR: ["affiliations.institution", "last_known_institutions", "topics"],
+        SearchEntityType.SOURCE: ["host_organization", "host_organization_lineage", "topics"],
+        SearchEntityType.INSTITUTION: ["associated_institutions", "lineage", "roles", "topics"],
+        SearchEntityType.PUBLISHER: ["parent_publisher", "lineage", "roles"],
+        SearchEntityType.FUNDER: ["roles"],
+    }
+    # entity type per OpenAlex ID prefix; subfields, fields and domains have numeric IDs and can't be hydrated
+    ID_PREFIXES: dict[str, SearchEntityType] = {
+        "W": SearchEntityType.WORK,
+        "A": SearchEntityType.AUTHOR,
+        "S": SearchEntityType.SOURCE,
+        "I": SearchEntityType.INSTITUTION,
+        "P": SearchEntityType.PUBLISHER,
+        "F": SearchEntityType.FUNDER,
+        "T": SearchEntityType.TOPIC,
+    }
+
     def __init__(self, settings):
         super().__init__(settings)
         self.default_search_field = "id"
         self.default_entity = "work"
         self._setup_pyalex()
-        self._results: dict[str, dict[str, dict]] = {
-            "works": {},
-            "authors": {},
-            "sources": {},
-            "publishers": {},
-            "institutions": {},
-            "funders": {},
-            "topics": {},
-            "subfields": {},
-            "fields": {},
-            "domains": {},
+        # field projection per entity type, see set_projection()
+        self.projection: dict[SearchEntityType, list[str]] = {}
+        self.set_projection(get_settings().openalex_settings.get("select"))
+        self._results: dict[str, RecordStore] = {
+            entity_type.value + 's': RecordStore(entity_type.value + 's') for entity_type in self.ENTITY_MAPPING
         }
 
     def _setup_pyalex(self):
-        pyalex.config.email = SETTINGS.user_email
-        pyalex.config.max_retries = SETTINGS.openalex_settings.get("max_retries", 3)
-        pyalex.config.retry_backoff_factor = SETTINGS.openalex_settings.get("retry_backoff_factor", 0.1)
-        pyalex.config.retry_http_codes = SETTINGS.openalex_settings.get("retry_http_codes", [429, 500, 503])
+        openalex_settings = get_settings().openalex_settings
+        # pyalex itself is configured when it is first used, see _pyalex()
+        self._pyalex_configured = False
         self.max_amount_of_pages = 10
         self.results_per_page = 200
         self.max_results_per_query = self.max_amount_of_pages * self.results_per_page
-    def _validate_search_values(self) -> bool:
+        # limits for packing values into a single OR-filter: the API accepts up to 100 values, and the URL length is limited
+        self.max_or_values = openalex_settings.get("max_or_values", 100)
+        self.max_filter_length = openalex_settings.get("max_filter_length", 4000)
+        # directory for the checkpoints of deep harvests, see deep_harvest()
+        self.checkpoint_dir = openalex_settings.get("checkpoint_dir", ".cache/checkpoints")
+        # local copy of the OpenAlex snapshot; if set, it is searched instead of the API (see harvesters.openalex_snapshot)
+        self.snapshot_dir = openalex_settings.get("snapshot_dir")
+        self.snapshot_workers = openalex_settings.get("snapshot_workers")
+        # default entity types and depth of hydrate()
+        self.hydrate_entities = openalex_settings.get("hydrate_entities") or ["source", "institution", "author", "topic"]
+        self.hydrate_depth = openalex_settings.get("hydrate_depth", 1)
+        # concurrency settings: number of queries run in parallel, and the rate limit (requests per second) shared by all of them
+        self.max_workers = openalex_settings.get("max_workers", 4)
+        self.rate_limiter = TokenBucket(
+            rate=openalex_settings.get("requests_per_second", 10),
+            capacity=openalex_settings.get("burst_size"),
+        )
+
+    def _pyalex(self):
+        """Return the pyalex module, imported on first use and configured with the credentials and retry settings of the app"""
+        pyalex = _import_pyalex()
+        if not self._pyalex_configured:
+            app_settings = get_settings()
+            pyalex.config.email = app_settings.user_email
+            # the from_updated_date filter used by incremental refreshes requires an OpenAlex Premium API key
+            pyalex.config.api_key = app_settings.openalex_settings.get("api_key")
+            # retries are done by the shared transport; the retry settings of the OpenAlex section apply to the OpenAlex host
+            retry_settings = {
+                "max_retries": app_settings.openalex_settings.get("max_retries"),
+                "backoff_factor": app_settings.openalex_settings.get("retry_backoff_factor"),
+                "retry_statuses": app_settings.openalex_settings.get("retry_http_codes"),
+            }
+            self.transport.configure_host(
+                urlsplit(pyalex.config.openalex_url).netloc,
+                **{key: value for key, value in retry_settings.items() if value is not None},
+            )
+            self._pyalex_configured = True
+        return pyalex
+
+    def _query(self, entity_type: SearchEntityType) -> "BaseOpenAlex":
+        """Return a new, empty pyalex query for an entity type"""
+        return getattr(self._pyalex(), self.ENTITY_MAPPING[entity_type])()
+
+    def set_projection(self, projection: str | list[str] | dict[SearchEntityType, list[str]] | None) -> None:
+        """
+        Only retrieve the given fields of each record, instead of the full records.
+        projection is either the name of a preset in SELECT_PRESETS (e.g. 'oa-status'), a list of top-level field names
+        (applied to works), a dict of {entity type: list of field names}, or None to retrieve full records again.
+        The 'id' field is always retrieved. Projected records are not stored in the cache, as they are incomplete.
         """
-        Check if self_search_values is not empty. Then:
-        check if each entry in self._search_values has a value, field, and an entity that's found in ENTITY_MAPPING.
+        if projection is None:
+            self.projection = {}
+        elif isinstance(projection, str):
+            if projection not in self.SELECT_PRESETS:
+                raise ValueError(f"Unknown projection preset: {projection}. Valid presets are {list(self.SELECT_PRESETS)}")
+            self.projection = self.SELECT_PRESETS[projection]
+        elif isinstance(projection, list):
+            self.projection = {SearchEntityType.WORK: projection}
+        else:
+            self.projection = projection
+        self.projection = {
+            entity_type: fields if "id" in fields else ["id", *fields]
+            for entity_type, fields in self.projection.items()
+        }
+
+    def _store_in_cache(self, entity_key: str, records: list[dict]) -> None:
+        # projected records are incomplete, so they should not be returned for later lookups of full records
+        if self.projection:
+            return
+        super()._store_in_cache(entity_key, records)
+
+    def _validate_search_values(self, search_values: list[SearchValue]) -> bool:
+        """
+        Check if search_values is not empty. Then:
+        check if each entry in search_values has a value, field, and an entity that's found in ENTITY_MAPPING.
         If so, return True, otherwise False.
         """
-        if not self._search_values:
-            print("No search values set")
+        if not search_values:
+            logger.warning("No search values set")
             return False
-        for search_value in self._search_values:
+        for search_value in search_values:
             if search_value.entity not in self.ENTITY_MAPPING:
-                print(f'Invalid entity: {search_value.entity}')
+                logger.warning(f'Invalid entity: {search_value.entity}')
                 return False
             if any([not search_value.field, not search_value.value]):
-                print(f"either SearchValue.field or SearchValue.value is empty: {search_value}")
+                logger.warning(f"either SearchValue.field or SearchValue.value is empty: {search_value}")
                 return False
         return True
 
 
 
 
-    def _construct_query(self, idlist:str, field:QueryValueType, entity_type:SearchEntityType) -> BaseOpenAlex:
+    def _construct_query(self, idlist:str, field:QueryValueType, entity_type:SearchEntityType) -> "BaseOpenAlex":
         """
         This function constructs a query based on the given idlist, field, and entity_type.
         This is required to handle nested filter fields & to set the correct filters for a QueryValueType.
         For non-nested query fields that match QueryValueType values, we can construct it directly.
         """
-        print(f'_construct_query called with:\n idlist: {idlist}\n field: {field}\n entity_type: {entity_type}')
+        logger.debug(f'_construct_query called with:\n idlist: {idlist}\n field: {field}\n entity_type: {entity_type}')
 
         match field:
             case QueryValueType.ID | QueryValueType.OPENALEX_ID:
-                return self.ENTITY_MAPPING[entity_type]().filter(openalex_id=idlist)
+                return self._query(entity_type).filter(openalex_id=idlist)
             case QueryValueType.DOI:
-                return self.ENTITY_MAPPING[entity_type]().filter(doi=idlist)
+                return self._query(entity_type).filter(doi=idlist)
             case QueryValueType.PMID:
-                return self.ENTITY_MAPPING[entity_type]().filter(pmid=idlist)
+                return self._query(entity_type).filter(pmid=idlist)
             case QueryValueType.ROR:
                 match entity_type:
                     case SearchEntityType.WORK:
-                        return self.ENTITY_MAPPING[entity_type]().filter(institutions={'ror':idlist})
+                        return self._query(entity_type).filter(institutions={'ror':idlist})
                     case SearchEntityType.AUTHOR:
-                        return self.ENTITY_MAPPING[entity_type]().filter(affiliations={'institution':{'ror':idlist}})
+                        return self._query(entity_type).filter(affiliations={'institution':{'ror':idlist}})
                     case SearchEntityType.PUBLISHER | SearchEntityType.INSTITUTION | SearchEntityType.FUNDER:
-                        return self.ENTITY_MAPPING[entity_type]().filter(ror=idlist)
+                        return self._query(entity_type).filter(ror=idlist)
             case QueryValueType.ORCID:
-                return self.ENTITY_MAPPING[entity_type]().filter(orcid=idlist)
+                return self._query(entity_type).filter(orcid=idlist)
             case QueryValueType.NAME:
-                return self.ENTITY_MAPPING[entity_type]().search(idlist)
+                return self._query(entity_type).search(idlist)
             case QueryValueType.ISSN:
                 match entity_type:
                     case SearchEntityType.WORK:
-                        return self.ENTITY_MAPPING[entity_type]().filter(locations={"source":{"issn":idlist}})
+                        return self._query(entity_type).filter(locations={"source":{"issn":idlist}})
                     case SearchEntityType.SOURCE:
-                        return self.ENTITY_MAPPING[entity_type]().filter(issn=idlist)
+                        return self._query(entity_type).filter(issn=idlist)
             case _:
-                print(f'Did not recognize field: {field} and/or entity_type: {entity_type}. Trying to return default query.')
+                logger.warning(f'Did not recognize field: {field} and/or entity_type: {entity_type}. Trying to return default query.')
                 # use the value for 'field' as the keyword for filter() arg, set to value idlist
                 # e.g. if field='openalex_id', then filter(openalex_id=idlist)
                 try:
-                    query = self.ENTITY_MAPPING[entity_type]().filter(**{field.value:idlist})
+                    query = self._query(entity_type).filter(**{field.value:idlist})
                     return query
                 except Exception as e:
-                    print(f"Error constructing query: {e}")
+                    logger.error(f"Error constructing query: {e}")
                     return None
 
-    def _search(self):
+    def _search(self, search_values: list[SearchValue]):
         """
         This function parses the search values, constructs the queries, and the retrieves the results.
-        It groups the queries by entity and field to be able to batch them into sets of 50 where possible.
         """
+        if self.snapshot_dir:
+            super()._search(search_values)
+            return
+        queries = self._build_queries(search_values)
+        if queries:
+            self._retrieve_queries(queries)
+
+    def _iter_search(self, search_values: list[SearchValue]) -> Iterator[tuple[str, dict]]:
+        """
+        Streaming version of _search: yields (entity type, record) tuples as soon as each page of results is retrieved.
+        Nothing is stored in self._results.
+        If self.snapshot_dir is set, the search values are looked up in the snapshot, and only values that can't be are sent to the API.
+        """
+        if self.snapshot_dir:
+            yield from self._iter_snapshot(search_values)
+            search_values = [value for value in search_values if self._snapshot_field(value) is None]
+            if not search_values:
+                return
+            logger.info(f"{len(search_values)} search values can't be searched in the snapshot, retrieving them from the API.")
+        queries = self._build_queries(search_values)
+        if not queries:
+            return
+        for _, entity_type, page in self._iter_matched_pages(queries):
+            for record in page:
+                yield entity_type, record
 
-        if not self._validate_search_values():
+    def _iter_search_updated(self, search_values: list[SearchValue], since: float) -> Iterator[tuple[str, dict]]:
+        """
+        Yield the records of the search values that were created or updated since the given time, using the from_updated_date filter.
+        The filter is applied to the same packed queries as a full harvest, so unchanged records are not retrieved at all.
+        """
+        since_date = datetime.fromtimestamp(since, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        queries = self._build_queries(search_values)
+        for planned in queries:
+            planned.query.filter(from_updated_date=since_date)
+        self.metrics.increment("incremental_queries", len(queries))
+        for _, entity_type, page in self._iter_matched_pages(queries):
+            for record in page:
+                yield entity_type, record
+
+    @staticmethod
+    def _snapshot_field(search_value: SearchValue) -> str | None:
+        """
+        Return the field used to match this search value in the snapshot,
+        or None if it can't be searched there (e.g. name searches, or searches with additional filters)
+        """
+        if search_value.additional_filters:
+            return None
+        field = search_value.field
+        if field == QueryValueType.OPENALEX_ID:
+            field = QueryValueType.ID
+        if field.value in EXTRACTORS.get(search_value.entity.value + 's', {}):
+            return field.value
+        return None
+
+    def _iter_snapshot(self, search_values: list[SearchValue]) -> Iterator[tuple[str, dict]]:
+        """
+        Scan the snapshot for the given search values, one pass over the partitions per entity type,
+        and yield (entity type, record) tuples. Search values that can't be searched in the snapshot are ignored.
+        """
+        filters: dict[SearchEntityType, dict[str, set[str]]] = defaultdict(lambda: defaultdict(set))
+        for search_value in search_values:
+            field = self._snapshot_field(search_value)
+            if field is not None:
+                filters[search_value.entity][field].add(search_value.value)
+        for entity_type, entity_filters in filters.items():
+            entity_key = entity_type.value + 's'
+            select = self.projection.get(entity_type)
+            start = time.perf_counter()
+            for records in scan_snapshot(self.snapshot_dir, entity_key, dict(entity_filters), self.snapshot_workers, select):
+                self.metrics.increment("snapshot_partitions")
+                self.metrics.increment("records", len(records))
+                for record in records:
+                    yield entity_key, record
+            self.metrics.observe("snapshot_scan", time.perf_counter() - start)
+
+    def _build_queries(self, search_values: list[SearchValue]) -> list[PlannedQuery]:
+        """
+        Plan the queries for the given search values.
+        Values are grouped by entity, field and additional filters (which are added to the query, see _apply_filters).
+        Values of filterable fields are packed into OR-filters,
+        limited by the number of values per filter (self.max_or_values) and the length of the filter in the URL (self.max_filter_length),
+        to keep the number of requests as low as possible. Name searches can't be combined, and result in one query per value.
+        """
+
+        if not self._validate_search_values(search_values):
             raise ValueError("Search values are not valid")
 
-        searches:dict[SearchEntityType, dict[QueryValueType, list]] = defaultdict(lambda: defaultdict(set))
-        for search_value in self._search_values:
-            searches[search_value.entity][search_value.field].add(search_value.value)
-        queries = defaultdict(list)
+        searches: dict[tuple[SearchEntityType, QueryValueType, tuple[SearchValue, ...]], dict[str, None]] = defaultdict(dict)
+        for search_value in search_values:
+            searches[(search_value.entity, search_value.field, search_value.additional_filters)][search_value.value] = None
+        queries: list[PlannedQuery] = []
         num_items = 0
-        for entity_type, fields in searches.items():
-            if not fields:
+        for (entity_type, value_type, filters), values in searches.items():
+            values = list(values)
+            if value_type not in self.VALID_FIELDNAMES:
+                logger.warning(
+                    f"Invalid field name: {value_type}. {entity_type} query will not be run for value(s): {values}. "
+                    f"Valid field names are {self.VALID_FIELDNAMES}"
+                )
                 continue
-            for field, values in fields.items():
-                values = list(values)
-                if field not in self.VALID_FIELDNAMES:
-                    print(f"Invalid field name: {field}")
-                    print(f'{entity_type} query will not be run for field {field} with value(s): {values}')
-                    print(f'Note: valid field names are {self.VALID_FIELDNAMES}')
+            if value_type is QueryValueType.NAME:
+                batches = [(value,) for value in values]
+            else:
+                batches = pack_values(values, max_values=self.max_or_values, max_bytes=self.max_filter_length)
+            for batch in batches:
+                query = self._construct_query("|".join(batch), value_type, entity_type)
+                if query is None:
+                    logger.warning(f'Cannot construct a {entity_type} query for field {value_type}, skipping value(s): {batch}')
                     continue
-                if len(values) > 1:
-                    if field in [QueryValueType.ID, QueryValueType.OPENALEX_ID, QueryValueType.DOI, QueryValueType.ORCID, QueryValueType.ROR]:
-                        if len(values) > 50:
-                            for batch in batched(values, 50):
-                                num_items += len(batch)
-                                idlist = "|".join(batch)
-                                constructed_query = self._construct_query(idlist, field, entity_type)
-                                queries[entity_type.value+'s'].append(constructed_query)
-                        else:
-                            num_items += len(values)
-                            idlist = "|".join(values)
-                            constructed_query = self._construct_query(idlist, field, entity_type)
-                            queries[entity_type.value+'s'].append(constructed_query)
-                    else:
-                        for value in values:
-                            num_items += 1
-                            queries[entity_type.value+'s'].append(self._construct_query(value, field, entity_type))
-                else:
-                    num_items += 1
-                    queries[entity_type.value+'s'].append(self._construct_query(values[0], field, entity_type))
+                if filters:
+                    query = self._apply_filters(query, filters)
+                query = self._project(query, entity_type)
+                num_items += len(batch)
+                per_page, n_max = self._plan_pagination(entity_type, value_type, len(batch))
+                queries.append(PlannedQuery(entity_type.value+'s', value_type, batch, query, per_page, n_max))
 
         if not queries:
-            print("No queries to run.")
-            return
+            logger.info("No queries to run.")
+            return queries
+
+        logger.info(f'Running {len(queries)} {"queries" if len(queries) > 1 else 'query'} for {num_items} requested items.')
+        return queries
+
+    def _apply_filters(self, query: "BaseOpenAlex", filters: tuple[SearchValue, ...]) -> "BaseOpenAlex":
+        """
+        Add the additional filters of a search value to a query, as server-side filters (see FILTER_FIELDS).
+        Multiple filters on the same field are combined with OR, e.g. two PUBLICATION_YEAR filters give 'publication_year:2020|2021'.
+        Values are passed as-is, so OpenAlex ranges and negations (e.g. '2015-2020', '>2019', '!closed') can be used.
+        """
+        values: dict[str, list[str]] = defaultdict(list)
+        for search_filter in filters:
+            key = self.FILTER_FIELDS.get(search_filter.field)
+            if key is None:
+                logger.warning(f"Cannot filter by {search_filter.field}, ignoring filter. Valid filter fields are {list(self.FILTER_FIELDS)}")
+                continue
+            values[key].append(search_filter.value)
+        for key, key_values in values.items():
+            # pyalex builds nested filter keys (e.g. open_access.oa_status) from nested dicts
+            *parents, name = key.split(".")
+            value: str | dict = {name: "|".join(key_values)}
+            for parent in reversed(parents):
+                value = {parent: value}
+            query = query.filter(**value)
+        return query
+
+    def _plan_pagination(self, entity_type: SearchEntityType, field: QueryValueType, num_values: int) -> tuple[int, int | None]:
+        """
+        Choose per_page and n_max for a query, based on the expected number of results.
+        Identifier lookups (see CACHEABLE_FIELDS) return about one record per value, so they fit in a single page of that size.
+        Other queries (e.g. all works of an institution) can return many records: use full pages, limited to self.max_results_per_query.
+        """
+        if self._is_lookup(entity_type, field):
+            return min(self.results_per_page, max(num_values, 1)), None
+        return self.results_per_page, self.max_results_per_query
+
+    def _is_lookup(self, entity_type: SearchEntityType, field: QueryValueType) -> bool:
+        """Return True if searching an entity type by field is an identifier lookup, which finds a single record per value"""
+        entities = self.CACHEABLE_FIELDS.get(field, set())
+        return field in self.CACHEABLE_FIELDS and (entities is None or entity_type in entities)
+
+    def _retrieve_queries(self, queries: list[PlannedQuery]) -> None:
+        """
+        Run all queries and store the results in self._results.
+        Results are merged in the order the queries were given, regardless of the order in which they finish.
+        Until then, the records of each query are kept in a compact RecordStore, so the retrieved pages don't pile up in memory.
+        """
+        buffers: dict[int, RecordStore] = {}
+        for index, entity_type, page in self._iter_matched_pages(queries):
+            buffer = buffers.get(index)
+            if buffer is None:
+                buffer = buffers[index] = RecordStore(entity_type)
+            for record in page:
+                buffer[self._record_id(record)] = record
+        for index in sorted(buffers):
+            entity_type = queries[index].entity_key
+            if entity_type not in self._results:
+                self._results[entity_type] = RecordStore(entity_type)
+            self._results[entity_type].merge(buffers.pop(index))
+
+    def _iter_pages(self, queries: list[PlannedQuery]) -> Iterator[tuple[int, str, list[dict]]]:
+        """
+        Run all queries in parallel using a thread pool of self.max_workers threads,
+        and yield (query index, entity type, page of records) tuples as soon as each page is retrieved.
+        Each page request takes a token from self.rate_limiter, so the combined request rate stays within the polite pool limit.
+        Retrieved pages are also stored in the cache.
+        """
+        logger.info(f'Retrieving {len(queries)} queries using {self.max_workers} workers.')
+        producers = [partial(self._paginate, planned.query, planned.per_page, planned.n_max) for planned in queries]
+        for index, page in stream_concurrently(producers, max_workers=self.max_workers):
+            entity_type = queries[index].entity_key
+            self._store_in_cache(entity_type, page)
+            yield index, entity_type, page
+
+    def _iter_matched_pages(self, queries: list[PlannedQuery]) -> Iterator[tuple[int, str, list[dict]]]:
+        """
+        Like _iter_pages, but also remember which records each search value matched, to store in the harvest log (see _add_matches).
+        Records of identifier lookups are matched to the value they were found by; other records to all values of their query.
+        """
+        keys = [self._query_keys(planned) for planned in queries]
+        for query_keys in keys:
+            self._start_matches(list(query_keys.values()))
+        for index, entity_type, page in self._iter_pages(queries):
+            query_keys = keys[index]
+            planned = queries[index]
+            if self._is_lookup(SearchEntityType(entity_type[:-1]), planned.field):
+                for record in page:
+                    self._add_matches([query_keys[key] for key in self._record_keys(entity_type, record) if key in query_keys], [record])
+            else:
+                self._add_matches(list(query_keys.values()), page)
+            yield index, entity_type, page
 
-        print(f'Running {len(queries)} {"queries" if len(queries) > 1 else 'query'} for {num_items} requested items.')
-        self._retrieve_queries(queries)
+    def _query_keys(self, planned: PlannedQuery) -> dict[str, str]:
+        """Return {'field:value': harvest key} for the search values a planned query was built from"""
+        entity_type = SearchEntityType(planned.entity_key[:-1])
+        # ID and OPENALEX_ID are the same field in OpenAlex, see _record_keys
+        field = QueryValueType.ID if planned.field is QueryValueType.OPENALEX_ID else planned.field
+        return {
+            f"{field.value}:{value}": self._harvest_key(SearchValue(value, planned.field, entity_type))
+            for value in planned.values
+        }
+
+    def _paginate(
+        self,
+        query: "BaseOpenAlex",
+        per_page: int,
+        n_max: int | None,
+        cursor: str = "*",
+        retrieved: int = 0,
+        on_page: Callable[[list[dict], str | None], None] | None = None,
+    ) -> Iterator[list[dict]]:
+        """
+        Cursor-paginate through the results of a query, yielding a list of records per page.
+        Works like pyalex's Paginator, but takes a token from self.rate_limiter before each request,
+        and stops as soon as all results are retrieved (instead of requesting an empty last page).
+        Stops after n_max records (no limit if n_max is None).
+
+        To resume an earlier pagination, pass the cursor of the next page and the number of records retrieved so far.
+        on_page is called with each page of records and the cursor of the next page, before the page is yielded.
+        """
+        count = None
+        # time spent on this query, excluding the time the consumer spends between pages
+        query_seconds = 0.0
+        self.metrics.increment("queries")
+        try:
+            while cursor is not None and (n_max is None or retrieved < n_max):
+                start = time.perf_counter()
+                self.rate_limiter.acquire()
+                self.metrics.observe("rate_limit_wait", time.perf_counter() - start)
+                with self.metrics.span("page"), self.transport.bind_metrics(self.metrics):
+                    page, meta = query.get(return_meta=True, per_page=per_page, cursor=cursor)
+                query_seconds += time.perf_counter() - start
+                cursor = meta.get("next_cursor")
+                count = meta.get("count") or 0
+                retrieved += len(page)
+                self.metrics.increment("pages")
+                self.metrics.increment("records", len(page))
+                for record in page:
+                    normalize_record_publishers(record)
+                if on_page is not None:
+                    on_page(page, cursor)
+                if not page:
+                    break
+                yield page
+                if len(page) < per_page or retrieved >= count:
+                    return
+            if count is not None and retrieved < count:
+                self.metrics.increment("truncated_queries")
+                logger.warning(f"Query was limited to {retrieved} of {count} results. Use deep_harvest() to retrieve all results.")
+        finally:
+            self.metrics.observe("query", query_seconds)
+
+    def deep_harvest(self, search_values: list[SearchValue] | None = None, checkpoint_dir: str | None = None) -> dict[str, dict[str, dict]]:
+        """
+        Retrieve all results for the given search values (default: all search values), without the max_results_per_query limit.
+        Meant for large harvests, e.g. all works of a large institution by ROR or all works in a journal by ISSN.
 
-    def _retrieve_queries(self, queries: dict[str,list[BaseOpenAlex]]) -> None:
-        for entity_type, querylist in queries.items():
-            print(f'Retrieving {len(querylist)} {entity_type} queries.')
-            for num, query in enumerate(querylist, start=1):
-                print(f'Running query {num}/{len(querylist)} for {entity_type}.')
-                if isinstance(query, dict):
-                    self._results[entity_type][query['id']] = query
+        After every page, the cursor and the records retrieved so far are checkpointed to checkpoint_dir (default: self.checkpoint_dir).
+        If the harvest is interrupted, calling deep_harvest again with the same search values resumes where it stopped.
+        Checkpoints are removed when a query is complete.
+        Returns self._results.
+        """
+        search_values = list(search_values or self._search_values)
+        checkpoint_dir = checkpoint_dir or self.checkpoint_dir
+        started = time.time()
+        queries = self._build_queries(search_values)
+        producers = []
+        for planned in queries:
+            # the url identifies the query, so it must be determined before pagination adds a cursor to it
+            checkpoint = HarvestCheckpoint(checkpoint_dir, planned.query.url)
+            if checkpoint.retrieved:
+                logger.info(f"Resuming {planned.entity_key} query from checkpoint, {checkpoint.retrieved} records retrieved before.")
+            producers.append(partial(self._deep_paginate, planned.query, checkpoint))
+        for index, page in stream_concurrently(producers, max_workers=self.max_workers):
+            entity_type = queries[index].entity_key
+            for record in page:
+                self._add_result(entity_type, record)
+            self._store_in_cache(entity_type, page)
+        self._log_harvest(search_values, started)
+        self._search_values.mark_harvested(search_values)
+        return self._results
+
+    def _deep_paginate(self, query: "BaseOpenAlex", checkpoint: HarvestCheckpoint) -> Iterator[list[dict]]:
+        """Yield the pages stored in the checkpoint, then continue the pagination from the checkpointed cursor"""
+        yield from checkpoint.iter_pages(self.results_per_page)
+        if not checkpoint.is_complete:
+            yield from self._paginate(
+                query,
+                per_page=self.results_per_page,
+                n_max=None,
+                cursor=checkpoint.cursor,
+                retrieved=checkpoint.retrieved,
+                on_page=checkpoint.save_page,
+            )
+        checkpoint.remove()
+
+    def aggregate(
+        self,
+        group_by: QueryValueType | str,
+        search_values: list[SearchValue] | None = None,
+    ) -> dict[tuple[SearchValue, ...], CountTable]:
+        """
+        Count the records matching the search values (default: all search values) per group, using OpenAlex group_by requests,
+        instead of retrieving the records. The additional filters of the search values are applied as server-side filters.
+        group_by is a field in FILTER_FIELDS (e.g. QueryValueType.PUBLICATION_YEAR or OA_STATUS), or any OpenAlex group_by key.
+
+        Searches that match many records (e.g. works by ROR or ISSN) get a table per search value.
+        Identifier lookups (e.g. works by DOI) are packed into OR-filters like regular queries, and get a single table for all values
+        with the same field and filters, e.g. the OA status distribution of a list of DOIs.
+        Returns {search values counted in the table: CountTable}. Nothing is added to the results.
+        """
+        group_key = self.FILTER_FIELDS.get(group_by, group_by) if isinstance(group_by, QueryValueType) else group_by
+        if isinstance(group_key, QueryValueType):
+            raise ValueError(f"Cannot group by {group_by}. Valid fields are {list(self.FILTER_FIELDS)}")
+        search_values = list(search_values or self._search_values)
+        if not self._validate_search_values(search_values):
+            raise ValueError("Search values are not valid")
+        searches: dict[tuple[SearchEntityType, QueryValueType, tuple[SearchValue, ...]], list[SearchValue]] = defaultdict(list)
+        for search_value in dict.fromkeys(search_values):
+            searches[(search_value.entity, search_value.field, search_value.additional_filters)].append(search_value)
+        # (table key, query) per request chain
+        queries: list[tuple[tuple[SearchValue, ...], "BaseOpenAlex"]] = []
+        for (entity_type, value_type, filters), values in searches.items():
+            entities = self.CACHEABLE_FIELDS.get(value_type, set())
+            if value_type in self.CACHEABLE_FIELDS and (entities is None or entity_type in entities):
+                batches = list(pack_values([value.value for value in values], max_values=self.max_or_values, max_bytes=self.max_filter_length))
+                table_keys = [tuple(values)] * len(batches)
+            else:
+                batches = [(value.value,) for value in values]
+                table_keys = [(value,) for value in values]
+            for table_key, batch in zip(table_keys, batches):
+                query = self._construct_query("|".join(batch), value_type, entity_type)
+                if query is None:
+                    logger.warning(f'Cannot construct a {entity_type} query for field {value_type}, skipping value(s): {batch}')
                     continue
+                if filters:
+                    query = self._apply_filters(query, filters)
+                queries.append((table_key, query.group_by(group_key)))
+        logger.info(f"Running {len(queries)} group_by queries for {len(search_values)} search values.")
+        tables: dict[tuple[SearchValue, ...], CountTable] = {}
+        producers = [partial(self._paginate_groups, query) for _, query in queries]
+        for index, (groups, count) in stream_concurrently(producers, max_workers=self.max_workers):
+            table_key = queries[index][0]
+            table = tables.get(table_key)
+            if table is None:
+                table = tables[table_key] = CountTable(group_key)
+            table.add(groups)
+            table.total += count
+        return tables
+
+    def _paginate_groups(self, query: "BaseOpenAlex") -> Iterator[tuple[list[dict], int]]:
+        """
+        Cursor-paginate through the groups of a group_by query, yielding (page of groups, number of matching records).
+        The number of matching records is only given for the first page, and 0 for the others.
+        """
+        cursor = "*"
+        first = True
+        while cursor is not None:
+            start = time.perf_counter()
+            self.rate_limiter.acquire()
+            self.metrics.observe("rate_limit_wait", time.perf_counter() - start)
+            with self.metrics.span("page"), self.transport.bind_metrics(self.metrics):
+                groups, meta = query.get(return_meta=True, per_page=self.results_per_page, cursor=cursor)
+            self.metrics.increment("group_pages")
+            yield groups, (meta.get("count") or 0) if first else 0
+            first = False
+            cursor = meta.get("next_cursor") if groups else None
+
+    def expand_citations(
+        self,
+        seeds: list[str] | None = None,
+        depth: int = 1,
+        direction: str = "references",
+        batch_size: int = 50,
+        max_works: int | None = None,
+    ) -> CitationGraph:
+        """
+        Build the citation network around seed works, by expanding it breadth-first for depth steps.
+        seeds are OpenAlex work IDs (default: the IDs of all works in the results). direction is one of:
+            'references': follow the referenced_works of each work (the works it cites)
+            'citations':  find the works that cite each work, using the 'cites' filter
+            'both':       both of the above
+        Every work is visited once. The works of each step are fetched in OR-filters of batch_size IDs,
+        and works that are already in the results or the cache, or were found as citing works, are not fetched again.
+        The works found in the last step are the leaves of the network: only their IDs are needed, so they are not fetched.
+        Expansion stops when max_works works are visited.
+        All fetched works are added to the results. Returns the network as a CitationGraph, with edges from citing to cited work.
+        """
+        if direction not in ("references", "citations", "both"):
+            raise ValueError(f"Invalid direction: {direction}. Use 'references', 'citations' or 'both'")
+        if seeds is None:
+            seeds = list(self._results.get("works", {}))
+        ids: list[str] = []
+        nodes: dict[str, int] = {}
+
+        def node(work_id: str) -> int:
+            number = nodes.get(work_id)
+            if number is None:
+                number = nodes[work_id] = len(ids)
+                ids.append(work_id)
+            return number
+
+        sources = array("i")
+        targets = array("i")
+        frontier = list(dict.fromkeys(canonicalize(QueryValueType.OPENALEX_ID.value, seed) for seed in seeds))
+        for work_id in frontier:
+            node(work_id)
+        # records of the citing works found in the previous step, which don't have to be fetched again
+        in_hand: dict[str, dict] = {}
+        for step in range(depth):
+            next_frontier: list[str] = []
+            if direction in ("references", "both"):
+                records = {work_id: in_hand[work_id] for work_id in frontier if work_id in in_hand}
+                records.update(self._fetch_records(
+                    SearchEntityType.WORK, [work_id for work_id in frontier if work_id not in in_hand], batch_size, self._work_query
+                ))
+                for work_id in frontier:
+                    record = records.get(work_id)
+                    if record is None:
+                        continue
+                    for reference in record.get("referenced_works") or []:
+                        reference = canonicalize(QueryValueType.OPENALEX_ID.value, reference)
+                        if reference not in nodes:
+                            if max_works is not None and len(ids) >= max_works:
+                                continue
+                            next_frontier.append(reference)
+                        sources.append(nodes[work_id])
+                        targets.append(node(reference))
+            in_hand = {}
+            if direction in ("citations", "both"):
+                for citing_id, record, cited_ids in self._fetch_citing_works(frontier, batch_size):
+                    if citing_id not in nodes:
+                        if max_works is not None and len(ids) >= max_works:
+                            continue
+                        next_frontier.append(citing_id)
+                        in_hand[citing_id] = record
+                    for cited_id in cited_ids:
+                        sources.append(node(citing_id))
+                        targets.append(nodes[cited_id])
+            logger.info(f"Citation expansion step {step}: {len(frontier)} works, {len(next_frontier)} new works found.")
+            frontier = next_frontier
+            if not frontier:
+                break
+        return CitationGraph.from_edges(ids, sources, targets)
+
+    def _fetch_records(
+        self,
+        entity_type: SearchEntityType,
+        openalex_ids: list[str],
+        batch_size: int,
+        prepare: Callable[["BaseOpenAlex"], "BaseOpenAlex"] | None = None,
+    ) -> dict[str, dict]:
+        """
+        Return the records of the given entities (short OpenAlex IDs) by ID, taken from the results if present,
+        else from the cache, else fetched from the API in OR-filters of batch_size IDs. Fetched records are added to the results.
+        prepare is applied to each query, e.g. to select fields; by default, the projection of the entity type is used.
+        """
+        entity_key = entity_type.value + 's'
+        stored = self._results.get(entity_key, {})
+        records: dict[str, dict] = {}
+        missing = []
+        for openalex_id in openalex_ids:
+            record = stored.get(f"https://openalex.org/{openalex_id}")
+            if record is not None:
+                records[openalex_id] = record
+            else:
+                missing.append(SearchValue(openalex_id, QueryValueType.OPENALEX_ID, entity_type))
+        if not missing:
+            return records
+        if prepare is None:
+            prepare = partial(self._project, entity_type=entity_type)
+        cached, remaining = self._load_from_cache(missing)
+        fetched = list(record for _, record in cached)
+        if remaining:
+            queries = [
+                PlannedQuery(entity_key, QueryValueType.OPENALEX_ID, batch, prepare(self._query(entity_type).filter(openalex_id="|".join(batch))), len(batch), None)
+                for batch in pack_values([value.value for value in remaining], batch_size, self.max_filter_length)
+            ]
+            for _, _, page in self._iter_pages(queries):
+                fetched.extend(page)
+        for record in fetched:
+            self._add_result(entity_key, record)
+            records[canonicalize(QueryValueType.OPENALEX_ID.value, record["id"])] = record
+        return records
+
+    def _fetch_citing_works(self, work_ids: list[str], batch_size: int) -> Iterator[tuple[str, list[str]]]:
+        """
+        Find the works that cite any of the given works, using OR-filters on 'cites' of batch_size IDs.
+        Yields (citing work ID, citing work, IDs of the given works it cites). The citing works are added to the results.
+        """
+        cited = set(work_ids)
+        queries = [
+            PlannedQuery("works", QueryValueType.OPENALEX_ID, batch, self._work_query(self._query(SearchEntityType.WORK).filter(cites="|".join(batch))), self.results_per_page, self.max_results_per_query)
+            for batch in pack_values(work_ids, batch_size, self.max_filter_length)
+        ]
+        for _, _, page in self._iter_pages(queries):
+            for record in page:
+                self._add_result("works", record)
+                references = (canonicalize(QueryValueType.OPENALEX_ID.value, reference) for reference in record.get("referenced_works") or [])
+                yield canonicalize(QueryValueType.OPENALEX_ID.value, record["id"]), record, [reference for reference in references if reference in cited]
+
+    def _work_query(self, query: "BaseOpenAlex") -> "BaseOpenAlex":
+        """Apply the projection for works (if any) to a query used for citation expansion, which always needs referenced_works"""
+        fields = self.projection.get(SearchEntityType.WORK)
+        if fields:
+            query = query.select(fields if "referenced_works" in fields else [*fields, "referenced_works"])
+        return query
+
+    def _project(self, query: "BaseOpenAlex", entity_type: SearchEntityType) -> "BaseOpenAlex":
+        """Apply the projection of an entity type (if any) to a query"""
+        if entity_type in self.projection:
+            query = query.select(self.projection[entity_type])
+        return query
+
+    def hydrate(
+        self,
+        entities: list[SearchEntityType | str] | None = None,
+        depth: int | None = None,
+        batch_size: int | None = None,
+    ) -> dict[str, int]:
+        """
+        Retrieve the full records of the entities that the harvested records refer to in dehydrated form
+        (e.g. the sources, authors, institutions and topics of works, see DEHYDRATED_FIELDS), and add them to the results.
+        entities is a whitelist of the entity types to hydrate (default: self.hydrate_entities, set in the settings).
+        With depth > 1, the entities referred to by the hydrated records are hydrated too (e.g. the institutions of the authors of works),
+        up to depth steps (default: self.hydrate_depth).
+
+        In each step, the referenced IDs of all records are collected and deduplicated per entity type, so every entity is requested once,
+        no matter how many records refer to it. Entities that are already in the results or the cache are not requested,
+        and the rest is fetched in OR-filters of batch_size IDs (default: self.max_or_values).
+        Returns the number of hydrated records per entity type.
+        """
+        entities = self.hydrate_entities if entities is None else entities
+        whitelist = {entity if isinstance(entity, SearchEntityType) else SearchEntityType[entity.upper()] for entity in entities}
+        depth = self.hydrate_depth if depth is None else depth
+        batch_size = batch_size or self.max_or_values
+        # step 0 starts from all harvested records; later steps only from the records hydrated in the step before
+        parents: dict[SearchEntityType, Iterable[Mapping]] = {
+            entity_type: self._results[entity_type.value + 's'].values()
+            for entity_type in self.DEHYDRATED_FIELDS if self._results.get(entity_type.value + 's')
+        }
+        visited: set[str] = set()
+        hydrated: dict[str, int] = defaultdict(int)
+        for step in range(depth):
+            referenced: dict[SearchEntityType, dict[str, None]] = defaultdict(dict)
+            for entity_type, records in parents.items():
+                paths = [path.split(".") for path in self.DEHYDRATED_FIELDS[entity_type]]
+                for record in records:
+                    for path in paths:
+                        for openalex_id in _referenced_ids(record, path):
+                            if openalex_id in visited:
+                                continue
+                            visited.add(openalex_id)
+                            referenced_type = self.ID_PREFIXES.get(openalex_id[0])
+                            if referenced_type in whitelist:
+                                referenced[referenced_type][openalex_id] = None
+            if not referenced:
+                break
+            logger.info(
+                f"Hydration step {step}: {sum(len(ids) for ids in referenced.values())} referenced entities "
+                f"({', '.join(f'{len(ids)} {entity_type.value}s' for entity_type, ids in referenced.items())})."
+            )
+            parents = {}
+            for entity_type, openalex_ids in referenced.items():
+                records = self._fetch_records(entity_type, list(openalex_ids), batch_size)
+                hydrated[entity_type.value + 's'] += len(records)
+                self.metrics.increment("hydrated", len(records))
+                if entity_type in self.DEHYDRATED_FIELDS:
+                    parents[entity_type] = list(records.values())
+        return dict(hydrated)
+
+    def _cache_key(self, search_value: SearchValue) -> str | None:
+        # a cached record may not pass the additional filters, so filtered searches always go to the API
+        if search_value.field not in self.CACHEABLE_FIELDS or search_value.additional_filters:
+            return None
+        entities = self.CACHEABLE_FIELDS[search_value.field]
+        if entities is not None and search_value.entity not in entities:
+            return None
+        # ID and OPENALEX_ID are the same field in OpenAlex
+        field = QueryValueType.ID if search_value.field is QueryValueType.OPENALEX_ID else search_value.field
+        return f"{field.value}:{search_value.value}"
+
+    def _record_keys(self, entity_key: str, record: dict) -> list[str]:
+        ids = record.get('ids') or {}
+        identifiers = [
+            (QueryValueType.ID, record['id']),
+            (QueryValueType.DOI, record.get('doi')),
+            (QueryValueType.PMID, ids.get('pmid')),
+            (QueryValueType.ORCID, record.get('orcid')),
+            (QueryValueType.ROR, record.get('ror') or ids.get('ror')),
+            *((QueryValueType.ISSN, issn) for issn in record.get('issn') or []),
+        ]
+        keys = []
+        for value_type, value in identifiers:
+            if not value:
+                continue
+            try:
+                keys.append(f"{value_type.value}:{canonicalize(value_type.value, value)}")
+            except InvalidIdentifierError:
+                continue
+        return keys
 
-                print(f'Retrieving multiple {entity_type}. Limited to {self.max_results_per_query}.')
-                for record in chain(*query.paginate(per_page=self.results_per_page, n_max=self.max_results_per_query)):
-                    self._results[entity_type][record['id']] = record
+def _referenced_ids(value, path: list[str]) -> Iterator[str]:
+    """Yield the short OpenAlex IDs of the dehydrated entities found at path in a record, see OpenAlexHarvester.DEHYDRATED_FIELDS"""
+    if isinstance(value, list):
+        for item in value:
+            yield from _referenced_ids(item, path)
+        return
+    if path:
+        if isinstance(value, Mapping):
+            yield from _referenced_ids(value.get(path[0]), path[1:])
+        return
+    if isinstance(value, Mapping):
+        value = value.get("id")
+    if isinstance(value, str):
+        try:
+            yield canonicalize(QueryValueType.OPENALEX_ID.value, value)
+        except InvalidIdentifierError:
+            pass
@@ -0,0 +1,148 @@
+"""
+Offline backend for the OpenAlex harvester: scans a local copy of the OpenAlex snapshot instead of querying the API.
+See https://docs.openalex.org/download-all-data/openalex-snapshot for how to download it.
+
+The snapshot consists of gzipped JSON-lines partitions per entity type: <snapshot_dir>/data/<entity type>/updated_date=<date>/part_<n>.gz
+Partitions are parsed in a process pool, and each record is matched against hash sets of the requested identifiers,
+so only matching records are sent back to the main process. Throughput is limited by the number of CPU cores instead of by rate limits.
+"""
+import logging
+import glob
+import gzip
+import json
+import os
+from collections.abc import Callable, Iterator
+from harvesters.publishers import normalize_record_publishers
+
+logger = logging.getLogger(__name__)
+
+# prefixes of the identifiers as stored in the snapshot, which are removed to get the canonical (bare) form
+_PREFIXES = ("https://openalex.org/", "https://doi.org/", "https://orcid.org/", "https://ror.org/", "https://pubmed.ncbi.nlm.nih.gov/")
+
+def _bare(value: str | None) -> str | None:
+    """Return the bare form of an identifier URL from the snapshot. Cheaper than canonicalize(), which matters for millions of records."""
+    if not value:
+        return None
+    for prefix in _PREFIXES:
+        if value.startswith(prefix):
+            return value[len(prefix):]
+    return value
+
+def _work_orcids(record: dict) -> Iterator[str | None]:
+    for authorship in record.get("authorships") or ():
+        yield _bare((authorship.get("author") or {}).get("orcid"))
+
+def _work_rors(record: dict) -> Iterator[str | None]:
+    for authorship in record.get("authorships") or ():
+        for institution in authorship.get("institutions") or ():
+            yield _bare(institution.get("ror"))
+
+def _work_issns(record: dict) -> Iterator[str | None]:
+    for location in record.get("locations") or ():
+        yield from (location.get("source") or {}).get("issn") or ()
+
+def _author_rors(record: dict) -> Iterator[str | None]:
+    for affiliation in record.get("affiliations") or ():
+        yield _bare((affiliation.get("institution") or {}).get("ror"))
+    for institution in record.get("last_known_institutions") or ():
+        yield _bare(institution.get("ror"))
+
+# for each entity type and search field (QueryValueType value): a function that returns the canonical identifiers of a record.
+# mirrors the filters used by OpenAlexHarvester._construct_query, e.g. works by ROR are the works with an author affiliated with that institution
+EXTRACTORS: dict[str, dict[str, Callable[[dict], Iterator[str | None]]]] = {
+    "works": {
+        "id": lambda record: (_bare(record.get("id")),),
+        "doi": lambda record: ((_bare(record.get("doi")) or "").lower() or None,),
+        "pmid": lambda record: (_bare((record.get("ids") or {}).get("pmid")),),
+        "orcid": _work_orcids,
+        "ror": _work_rors,
+        "issn": _work_issns,
+    },
+    "authors": {
+        "id": lambda record: (_bare(record.get("id")),),
+        "orcid": lambda record: (_bare(record.get("orcid")),),
+        "ror": _author_rors,
+    },
+    "sources": {
+        "id": lambda record: (_bare(record.get("id")),),
+        "issn": lambda record: (record.get("issn_l"), *(record.get("issn") or ())),
+    },
+    "institutions": {
+        "id": lambda record: (_bare(record.get("id")),),
+        "ror": lambda record: (_bare(record.get("ror")),),
+    },
+    "publishers": {
+        "id": lambda record: (_bare(record.get("id")),),
+        "ror": lambda record: (_bare((record.get("ids") or {}).get("ror")),),
+    },
+    "funders": {
+        "id": lambda record: (_bare(record.get("id")),),
+        "ror": lambda record: (_bare((record.get("ids") or {}).get("ror")),),
+    },
+}
+for _entity_key in ("topics", "subfields", "fields", "domains"):
+    EXTRACTORS[_entity_key] = {"id": EXTRACTORS["works"]["id"]}
+
+# set in each worker process by _init_worker, so the (potentially large) sets are sent once per process instead of once per partition
+_worker_filters: dict[str, set[str]] = {}
+_worker_select: list[str] | None = None
+
+def _init_worker(filters: dict[str, set[str]], select: list[str] | None) -> None:
+    global _worker_filters, _worker_select
+    _worker_filters = filters
+    _worker_select = select
+
+def _scan_partition(path: str, entity_key: str) -> list[dict]:
+    """Parse a single partition, and return the records that match any of the worker's filters"""
+    extractors = [(EXTRACTORS[entity_key][field], values) for field, values in _worker_filters.items()]
+    matches = []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if any(value in values for extract, values in extractors for value in extract(record) if value):
+                normalize_record_publishers(record)
+                if _worker_select:
+                    record = {key: record.get(key) for key in _worker_select}
+                matches.append(record)
+    return matches
+
+def find_partitions(snapshot_dir: str, entity_key: str) -> list[str]:
+    """Return the paths of all partitions for an entity type. snapshot_dir can be the snapshot root or its 'data' directory."""
+    for data_dir in (os.path.join(snapshot_dir, "data"), snapshot_dir):
+        entity_dir = os.path.join(data_dir, entity_key)
+        if os.path.isdir(entity_dir):
+            return sorted(glob.glob(os.path.join(entity_dir, "**", "*.gz"), recursive=True))
+    return []
+
+def scan_snapshot(
+    snapshot_dir: str,
+    entity_key: str,
+    filters: dict[str, set[str]],
+    max_workers: int | None = None,
+    select: list[str] | None = None,
+) -> Iterator[list[dict]]:
+    """
+    Scan all partitions of an entity type in a process pool of max_workers processes (default: number of CPUs),
+    and yield a list of matching records per partition, as soon as each partition is done.
+    filters maps search fields (see EXTRACTORS) to sets of canonical identifiers; a record matches if any field matches.
+    If select is given, only these top-level fields of the matching records are returned.
+    """
+    unsupported = set(filters) - set(EXTRACTORS.get(entity_key, {}))
+    if unsupported:
+        raise ValueError(f"Cannot search {entity_key} in the snapshot by {', '.join(sorted(unsupported))}")
+    partitions = find_partitions(snapshot_dir, entity_key)
+    if not partitions:
+        logger.warning(f"No snapshot partitions found for {entity_key} in {snapshot_dir}")
+        return
+    logger.info(f"Scanning {len(partitions)} snapshot partitions for {entity_key}.")
+    # imported here, as the process pool pulls in multiprocessing, which is only needed when a snapshot is used
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(filters, select)) as executor:
+        futures = [executor.submit(_scan_partition, path, entity_key) for path in partitions]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # stop scanning if the consumer stops early or a partition fails
+            for future in futures:
+                future.cancel()
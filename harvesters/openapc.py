@@ -0,0 +1,362 @@
+"""
+Harvester for the OpenAPC dataset (https://github.com/OpenAPC/openapc-de), which runs entirely on a local copy of the data.
+
+The dataset is published as a single CSV file of ~240.000 articles. It is downloaded once (only if it is not present),
+and converted once into a compact columnar format in the data directory:
+    <column>.bin:  one binary array per numeric column (APC in euro, year, hybrid flag, and codes for the string columns)
+    strings.json:  the distinct values of the string columns, the DOI of each row, and metadata about the source CSV
+The binary columns are memory-mapped, so loading the dataset does not copy or parse them.
+Hash indexes (DOI, ISSN, publisher/year, journal/year) are built on first use, and medians per group are memoized,
+so thousands of works can be looked up or estimated in milliseconds without rescanning the CSV.
+"""
+import logging
+import csv
+import json
+import mmap
+import os
+import shutil
+import statistics
+import urllib.request
+from array import array
+from collections.abc import Iterator
+from harvesters.generics import Harvester, SearchEntityType, SearchValue, QueryValueType
+from harvesters.identifiers import InvalidIdentifierError, canonicalize
+from harvesters.publishers import normalize_publisher
+from settings import Source, get_settings
+
+logger = logging.getLogger(__name__)
+
+OPENAPC_CSV_URL = "https://raw.githubusercontent.com/OpenAPC/openapc-de/master/data/apc_de.csv"
+
+# bump when the layout of the converted files changes, so existing conversions are rebuilt
+FORMAT_VERSION = 1
+
+# numeric columns and their array typecodes. String columns are stored as codes into the lists in strings.json
+COLUMNS: dict[str, str] = {
+    "euro": "d",
+    "period": "h",
+    "is_hybrid": "b",
+    "institution": "i",
+    "publisher": "i",
+    "journal": "i",
+}
+
+def _canonical_or_none(field: str, value: str) -> str | None:
+    """Return the canonical form of an identifier, or None if it is missing or invalid"""
+    if not value or value == "NA":
+        return None
+    try:
+        return canonicalize(field, value)
+    except InvalidIdentifierError:
+        return None
+
+class OpenAPCDataset:
+    """
+    Columnar, memory-mapped copy of the OpenAPC dataset with hash indexes for lookups and memoized APC medians.
+    Use OpenAPCDataset.open() to get a dataset, which downloads and converts the CSV only when needed.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, "strings.json")) as f:
+            strings = json.load(f)
+        self.rows: int = strings["rows"]
+        self.institutions: list[str] = strings["institutions"]
+        self.publishers: list[str] = strings["publishers"]
+        # [journal_full_title, issn, issn_print, issn_electronic, issn_l] per journal code
+        self.journals: list[list[str | None]] = strings["journals"]
+        self._dois: list[str | None] = strings["dois"]
+        self._columns: dict[str, memoryview] = {name: self._map_column(name, typecode) for name, typecode in COLUMNS.items()}
+        self._doi_index: dict[str, int] | None = None
+        self._issn_index: dict[str, list[int]] | None = None
+        self._group_index: dict[str, dict[tuple[int, int | None], array]] = {}
+        # normalized publisher name -> publisher group code, set when the publisher index is built
+        self._publisher_codes: dict[str, int] = {}
+        self._medians: dict[tuple[str, int, int | None], tuple[float, int] | None] = {}
+
+    def _map_column(self, name: str, typecode: str) -> memoryview | array:
+        path = os.path.join(self.directory, f"{name}.bin")
+        if not os.path.getsize(path):
+            # empty files can't be memory-mapped
+            return array(typecode)
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(mapped).cast(typecode)
+
+    @classmethod
+    def open(cls, directory: str, csv_path: str | None = None, url: str = OPENAPC_CSV_URL) -> "OpenAPCDataset":
+        """
+        Open the converted dataset in directory.
+        If it does not exist, or the CSV has changed since the conversion, the CSV is converted first.
+        The CSV (default: <directory>/apc_de.csv) is only downloaded from url if it is not present.
+        """
+        csv_path = csv_path or os.path.join(directory, "apc_de.csv")
+        if not os.path.exists(csv_path):
+            cls.download(url, csv_path)
+        if not cls._is_converted(directory, csv_path):
+            cls.convert(csv_path, directory)
+        return cls(directory)
+
+    @staticmethod
+    def download(url: str, csv_path: str) -> None:
+        """Download the CSV file to csv_path"""
+        logger.info(f"Downloading OpenAPC dataset from {url}")
+        os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+        temp_path = csv_path + ".tmp"
+        with urllib.request.urlopen(url) as response, open(temp_path, "wb") as f:
+            shutil.copyfileobj(response, f)
+        os.replace(temp_path, csv_path)
+
+    @staticmethod
+    def _csv_signature(csv_path: str) -> list[int]:
+        stat = os.stat(csv_path)
+        return [stat.st_size, int(stat.st_mtime)]
+
+    @classmethod
+    def _is_converted(cls, directory: str, csv_path: str) -> bool:
+        strings_path = os.path.join(directory, "strings.json")
+        if not os.path.exists(strings_path):
+            return False
+        with open(strings_path) as f:
+            strings = json.load(f)
+        return strings.get("version") == FORMAT_VERSION and strings.get("source") == cls._csv_signature(csv_path)
+
+    @classmethod
+    def convert(cls, csv_path: str, directory: str) -> None:
+        """Convert the OpenAPC CSV file into the columnar format. Reads the CSV once."""
+        logger.info(f"Converting OpenAPC dataset {csv_path}")
+        os.makedirs(directory, exist_ok=True)
+        columns = {name: array(typecode) for name, typecode in COLUMNS.items()}
+        codes: dict[str, dict] = {"institutions": {}, "publishers": {}, "journals": {}}
+        dois: list[str | None] = []
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    euro = float(row["euro"])
+                    period = int(row["period"])
+                except (KeyError, ValueError):
+                    continue
+                journal = (
+                    row.get("journal_full_title") or None,
+                    *(_canonical_or_none("issn", row.get(key, "")) for key in ("issn", "issn_print", "issn_electronic", "issn_l")),
+                )
+                columns["euro"].append(euro)
+                columns["period"].append(period)
+                columns["is_hybrid"].append(row.get("is_hybrid", "").upper() == "TRUE")
+                columns["institution"].append(codes["institutions"].setdefault(row.get("institution", ""), len(codes["institutions"])))
+                columns["publisher"].append(codes["publishers"].setdefault(row.get("publisher", ""), len(codes["publishers"])))
+                columns["journal"].append(codes["journals"].setdefault(journal, len(codes["journals"])))
+                dois.append(_canonical_or_none("doi", row.get("doi", "")))
+        for name, values in columns.items():
+            with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+                values.tofile(f)
+        strings = {
+            "version": FORMAT_VERSION,
+            "source": cls._csv_signature(csv_path),
+            "rows": len(dois),
+            **{name: list(values) for name, values in codes.items()},
+            "dois": dois,
+        }
+        # written last, so an interrupted conversion is detected and redone
+        temp_path = os.path.join(directory, "strings.json.tmp")
+        with open(temp_path, "w") as f:
+            json.dump(strings, f, separators=(",", ":"))
+        os.replace(temp_path, os.path.join(directory, "strings.json"))
+        logger.info(f"Converted {len(dois)} OpenAPC records")
+
+    @property
+    def doi_index(self) -> dict[str, int]:
+        """DOI -> row number"""
+        if self._doi_index is None:
+            self._doi_index = {doi: row for row, doi in enumerate(self._dois) if doi}
+        return self._doi_index
+
+    @property
+    def issn_index(self) -> dict[str, list[int]]:
+        """ISSN (any of issn, issn_print, issn_electronic, issn_l) -> journal codes"""
+        if self._issn_index is None:
+            self._issn_index = {}
+            for code, journal in enumerate(self.journals):
+                for issn in dict.fromkeys(journal[1:]):
+                    if issn:
+                        self._issn_index.setdefault(issn, []).append(code)
+        return self._issn_index
+
+    def _groups(self, column: str) -> dict[tuple[int, int | None], array]:
+        """
+        Index of the rows per (code, year) and per (code, None) for a string column (publisher or journal).
+        Publishers are grouped by their normalized name, so e.g. 'Elsevier BV' and 'Elsevier' end up in one group.
+        """
+        if column not in self._group_index:
+            if column == "publisher":
+                normalized: dict[str, int] = {}
+                code_map = [normalized.setdefault(normalize_publisher(name), len(normalized)) for name in self.publishers]
+            else:
+                code_map = range(len(self.journals))
+            index: dict[tuple[int, int | None], array] = {}
+            codes, periods = self._columns[column], self._columns["period"]
+            for row in range(self.rows):
+                code = code_map[codes[row]]
+                for key in ((code, periods[row]), (code, None)):
+                    rows = index.get(key)
+                    if rows is None:
+                        rows = index[key] = array("i")
+                    rows.append(row)
+            self._group_index[column] = index
+            if column == "publisher":
+                self._publisher_codes = normalized
+        return self._group_index[column]
+
+    def _median(self, column: str, code: int, year: int | None) -> tuple[float, int] | None:
+        """(median APC, number of articles) of a group, memoized"""
+        key = (column, code, year)
+        if key not in self._medians:
+            rows = self._groups(column).get((code, year))
+            euro = self._columns["euro"]
+            self._medians[key] = (statistics.median(euro[row] for row in rows), len(rows)) if rows else None
+        return self._medians[key]
+
+    def record(self, row: int) -> dict:
+        """Return a row as a dict"""
+        journal = self.journals[self._columns["journal"][row]]
+        return {
+            "id": self._dois[row],
+            "doi": self._dois[row],
+            "apc_eur": self._columns["euro"][row],
+            "period": self._columns["period"][row],
+            "is_hybrid": bool(self._columns["is_hybrid"][row]),
+            "institution": self.institutions[self._columns["institution"][row]],
+            "publisher": self.publishers[self._columns["publisher"][row]],
+            "journal_full_title": journal[0],
+            "issn": journal[1],
+            "issn_print": journal[2],
+            "issn_electronic": journal[3],
+            "issn_l": journal[4],
+        }
+
+    def lookup_dois(self, dois: list[str]) -> dict[str, dict]:
+        """Return the records for the given (canonical) DOIs that are in the dataset, by DOI"""
+        index = self.doi_index
+        return {doi: self.record(index[doi]) for doi in dois if doi in index}
+
+    def journal_median(self, issn: str, year: int | None = None) -> tuple[float, int] | None:
+        """(median APC, number of articles) for the journal with this ISSN, optionally for a single year"""
+        for code in self.issn_index.get(issn, ()):
+            result = self._median("journal", code, year)
+            if result:
+                return result
+        return None
+
+    def publisher_median(self, publisher: str, year: int | None = None) -> tuple[float, int] | None:
+        """(median APC, number of articles) for the publisher with this name (normalized), optionally for a single year"""
+        self._groups("publisher")
+        code = self._publisher_codes.get(normalize_publisher(publisher))
+        return None if code is None else self._median("publisher", code, year)
+
+    def estimate_apcs(self, works: list[dict]) -> list[dict | None]:
+        """
+        Estimate the APC for a batch of works, each a dict with optional keys 'doi', 'issn', 'publisher' and 'year'.
+        Uses the actual APC if the DOI is in the dataset, else the first available median of:
+        journal and year, journal, publisher and year, publisher.
+        Returns a dict with 'apc_eur', 'basis' and 'n' (number of articles the estimate is based on) per work, or None.
+        Medians are memoized, so large batches of works from the same journals/publishers cost a few dict lookups per work.
+        """
+        index = self.doi_index
+        euro = self._columns["euro"]
+        estimates = []
+        for work in works:
+            doi, issn, publisher, year = work.get("doi"), work.get("issn"), work.get("publisher"), work.get("year")
+            if doi and doi in index:
+                estimates.append({"apc_eur": euro[index[doi]], "basis": "doi", "n": 1})
+                continue
+            estimate = None
+            candidates = []
+            if issn:
+                candidates += [("journal_year", self.journal_median, issn, year), ("journal", self.journal_median, issn, None)]
+            if publisher:
+                candidates += [("publisher_year", self.publisher_median, publisher, year), ("publisher", self.publisher_median, publisher, None)]
+            for basis, median, key, group_year in candidates:
+                if basis.endswith("_year") and year is None:
+                    continue
+                result = median(key, group_year)
+                if result:
+                    estimate = {"apc_eur": result[0], "basis": basis, "n": result[1]}
+                    break
+            estimates.append(estimate)
+        return estimates
+
+    def journal_summary(self, issn: str) -> dict | None:
+        """Return the APC statistics of the journal with this ISSN: overall and per year"""
+        codes = [code for code in self.issn_index.get(issn, ()) if self._median("journal", code, None)]
+        if not codes:
+            return None
+        code = codes[0]
+        journal = self.journals[code]
+        median, count = self._median("journal", code, None)
+        years = sorted(year for group_code, year in self._groups("journal") if group_code == code and year is not None)
+        return {
+            "id": issn,
+            "issn": journal[1],
+            "issn_l": journal[4],
+            "journal_full_title": journal[0],
+            "apc_eur_median": median,
+            "n": count,
+            "apc_eur_median_by_year": {year: self._median("journal", code, year)[0] for year in years},
+        }
+
+class OpenAPCHarvester(Harvester):
+    """
+    Class to harvest data from the OpenAPC dataset
+    https://github.com/OpenAPC/openapc-de
+
+    This dataset contains APC data for ~240.000 articles from 450 institutions. This data can be used both for direct APC information,
+    but also to determine a APC estimate for a given publisher/journal/year.
+
+    The dataset is used locally, see OpenAPCDataset: works are looked up by DOI (the actual APC paid),
+    and sources by ISSN (the median APC of the journal, overall and per year). Use estimate_apcs() for estimates of works that are not in the dataset.
+    """
+    ENTITY_MAPPING = {
+        SearchEntityType.WORK: "works",
+        SearchEntityType.SOURCE: "sources",
+    }
+    VALID_FIELDNAMES = [QueryValueType.DOI, QueryValueType.ISSN]
+    default_search_field: str = "doi"
+
+    def __init__(self, settings: Source):
+        super().__init__(settings)
+        openapc_settings = getattr(get_settings(), "openapc_settings", None) or {}
+        self.data_dir = openapc_settings.get("data_dir", ".cache/openapc")
+        self.csv_path = openapc_settings.get("csv_path")
+        self.data_url = settings.api_url or openapc_settings.get("data_url", OPENAPC_CSV_URL)
+        self._dataset: OpenAPCDataset | None = None
+
+    @property
+    def dataset(self) -> OpenAPCDataset:
+        """The local dataset, downloaded and converted on first use if needed"""
+        if self._dataset is None:
+            self._dataset = OpenAPCDataset.open(self.data_dir, self.csv_path, self.data_url)
+        return self._dataset
+
+    def _iter_search(self, search_values: list[SearchValue]) -> Iterator[tuple[str, dict]]:
+        dois = [value.value for value in search_values if value.field == QueryValueType.DOI and value.entity == SearchEntityType.WORK]
+        issns = [value.value for value in search_values if value.field == QueryValueType.ISSN and value.entity == SearchEntityType.SOURCE]
+        unsupported = len(search_values) - len(dois) - len(issns)
+        if unsupported:
+            logger.warning(f"Skipping {unsupported} search values: OpenAPC only supports works by DOI and sources by ISSN.")
+        for record in self.dataset.lookup_dois(dois).values():
+            yield "works", record
+        for issn in dict.fromkeys(issns):
+            summary = self.dataset.journal_summary(issn)
+            if summary:
+                yield "sources", summary
+
+    def estimate_apcs(self, works: list[dict]) -> list[dict | None]:
+        """See OpenAPCDataset.estimate_apcs"""
+        return self.dataset.estimate_apcs(works)
+
+    def _record_keys(self, entity_key: str, record: dict) -> list[str]:
+        if entity_key == "works":
+            return [f"{QueryValueType.DOI.value}:{record['doi']}"]
+        if entity_key == "sources":
+            return [f"{QueryValueType.ISSN.value}:{issn}" for issn in dict.fromkeys((record["id"], record["issn"], record["issn_l"])) if issn]
+        return []
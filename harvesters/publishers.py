@@ -0,0 +1,64 @@
+"""
+Normalization of publisher names, so that e.g. 'Elsevier BV', 'Elsevier B.V.' and 'Cell Press' are all grouped as 'elsevier'.
+
+Uses constants.PUBLISHER_NAME_MAPPING and constants.COMPANY_ABBREVIATIONS, compiled into single regexes once,
+so normalizing a name is one regex search plus a memoized lookup, instead of a substring check per mapping key.
+"""
+import re
+from functools import lru_cache
+
+from constants import COMPANY_ABBREVIATIONS, PUBLISHER_NAME_MAPPING
+
+PUNCTUATION_PATTERN = re.compile(r"[.,()\"']+")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+# single letters separated by spaces, e.g. 'b v' (from 'b.v.') or 's a'
+INITIALS_PATTERN = re.compile(r"\b(\w) (?=\w\b)")
+# company suffixes such as 'ltd' or 'gmbh' as separate words, i.e. bounded by whitespace or the ends of the name,
+# so e.g. the 'co' in 'co-action publishing' is kept
+ABBREVIATION_PATTERN = re.compile(
+    r"(?<!\S)(?:" + "|".join(sorted({re.escape(abbreviation.strip()) for abbreviation in COMPANY_ABBREVIATIONS}, key=len, reverse=True)) + r")(?!\S)"
+)
+# all publisher name variants in a single alternation, longest first so e.g. 'biomed central' is preferred over shorter variants.
+# Variants must be whole words, so e.g. 'sagebrush press' doesn't match 'sage'.
+PUBLISHER_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(name) for name in sorted(PUBLISHER_NAME_MAPPING, key=len, reverse=True)) + r")\b"
+)
+
+def _clean(name: str) -> str:
+    """Lowercase name and remove punctuation, company suffixes and redundant whitespace"""
+    name = PUNCTUATION_PATTERN.sub(" ", name.lower())
+    # 'b.v.' becomes 'b v ' above, so rejoin single letters before removing the suffixes
+    name = INITIALS_PATTERN.sub(r"\1", name)
+    name = ABBREVIATION_PATTERN.sub(" ", name)
+    return WHITESPACE_PATTERN.sub(" ", name).strip()
+
+@lru_cache(maxsize=2**16)
+def normalize_publisher(name: str) -> str:
+    """
+    Return the normalized name of a publisher: the mapped name from PUBLISHER_NAME_MAPPING if any variant occurs in the name,
+    else the lowercased name without punctuation and company suffixes.
+    """
+    cleaned = _clean(name)
+    match = PUBLISHER_PATTERN.search(cleaned)
+    if match:
+        return PUBLISHER_NAME_MAPPING[match.group(1)]
+    return cleaned
+
+def normalize_record_publishers(record: dict) -> None:
+    """
+    Add the normalized publisher name to an OpenAlex record in place, so records can be grouped by publisher.
+    Handles sources, and the sources in the locations of works: the normalized form of their host_organization_name
+    (or publisher) is stored in the publisher_normalized key, and the original names are kept for display.
+    """
+    sources = [record]
+    for key in ("primary_location", "best_oa_location"):
+        location = record.get(key)
+        if location and location.get("source"):
+            sources.append(location["source"])
+    for location in record.get("locations") or []:
+        if location.get("source"):
+            sources.append(location["source"])
+    for source in sources:
+        name = source.get("host_organization_name") or source.get("publisher")
+        if name and isinstance(name, str):
+            source["publisher_normalized"] = normalize_publisher(name)
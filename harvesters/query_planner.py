@@ -0,0 +1,41 @@
+"""
+Helpers for planning API queries: packing many identifiers into as few OR-filter requests as possible.
+"""
+from collections.abc import Iterator
+from dataclasses import dataclass
+from urllib.parse import quote_plus
+
+@dataclass
+class PlannedQuery:
+    """
+    A query ready to be run, together with the values it was built from and the pagination settings chosen for it.
+    per_page is the page size to request, and n_max the maximum number of records to retrieve (None: no limit).
+    """
+    entity_key: str
+    field: object
+    values: tuple[str, ...]
+    query: object
+    per_page: int
+    n_max: int | None
+
+def pack_values(values: list[str], max_values: int, max_bytes: int, separator: str = "|") -> Iterator[tuple[str, ...]]:
+    """
+    Greedily pack values into batches for an OR-filter (values joined by separator).
+    Each batch contains at most max_values values, and its URL-encoded length stays below max_bytes,
+    so long values (e.g. DOIs) get smaller batches and short values (e.g. PMIDs) get larger ones.
+    A single value that is longer than max_bytes is put in a batch of its own.
+    """
+    separator_length = len(quote_plus(separator))
+    batch: list[str] = []
+    batch_length = 0
+    for value in values:
+        length = len(quote_plus(value)) + (separator_length if batch else 0)
+        if batch and (len(batch) >= max_values or batch_length + length > max_bytes):
+            yield tuple(batch)
+            batch = []
+            batch_length = 0
+            length -= separator_length
+        batch.append(value)
+        batch_length += length
+    if batch:
+        yield tuple(batch)
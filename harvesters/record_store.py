@@ -0,0 +1,246 @@
+"""
+Compact in-memory storage of harvested records.
+
+Records from APIs such as OpenAlex are large nested dicts: as Python objects, a single work easily takes tens of kilobytes,
+mostly because of the many small objects and the key strings repeated in every record.
+A RecordStore keeps the records of one entity type in a much more compact form:
+    - record ids (the keys of the store) are interned
+    - frequently used scalar fields ('hot' fields, e.g. publication_year or doi) are stored in columns:
+      numbers and booleans in typed arrays, strings in lists (low-cardinality strings such as 'type' are interned)
+    - all other fields, including the nested parts (authorships, locations, ...), are stored as zlib-compressed JSON bytes,
+      which are only decoded when such a field is accessed.
+
+Reading a record returns a StoredRecord: a read-only mapping view that behaves like the original dict.
+To change a record, store a new dict under the same key.
+"""
+import json
+import sys
+import zlib
+from array import array
+from collections.abc import Iterator, Mapping, MutableMapping
+
+# hot fields per entity type, with their column type:
+# 'b', 'h', 'i', 'q': integers (booleans are stored as 'b') in an array of that typecode
+# 's': strings, 'k': low-cardinality strings, which are interned
+HOT_FIELDS: dict[str, dict[str, str]] = {
+    "works": {
+        "doi": "s",
+        "title": "s",
+        "publication_year": "h",
+        "publication_date": "k",
+        "type": "k",
+        "language": "k",
+        "cited_by_count": "i",
+        "is_retracted": "b",
+        "is_paratext": "b",
+    },
+    "authors": {"display_name": "s", "orcid": "s", "works_count": "i", "cited_by_count": "i"},
+    "sources": {
+        "display_name": "s",
+        "issn_l": "s",
+        "type": "k",
+        "host_organization_name": "k",
+        "is_oa": "b",
+        "is_in_doaj": "b",
+        "works_count": "i",
+        "cited_by_count": "i",
+    },
+    "institutions": {"display_name": "s", "ror": "s", "country_code": "k", "type": "k", "works_count": "i", "cited_by_count": "i"},
+}
+DEFAULT_HOT_FIELDS: dict[str, str] = {"display_name": "s", "works_count": "i", "cited_by_count": "i"}
+
+# value stored in integer columns for None; the smallest value of each typecode
+_NULLS = {typecode: -(2 ** (array(typecode).itemsize * 8 - 1)) for typecode in "bhiq"}
+_EMPTY = b""
+
+class StoredRecord(Mapping):
+    """Read-only view of a record in a RecordStore. The compressed part of the record is decoded on first access, and kept for the lifetime of the view."""
+    __slots__ = ("_store", "_row", "_rest")
+
+    def __init__(self, store: "RecordStore", row: int):
+        self._store = store
+        self._row = row
+        self._rest: dict | None = None
+
+    def _decoded(self) -> dict:
+        if self._rest is None:
+            self._rest = self._store._decode(self._row)
+        return self._rest
+
+    def __getitem__(self, key: str):
+        store = self._store
+        position = store._positions.get(key)
+        if position is not None and not store._absent[self._row] >> position & 1:
+            return store._column_value(key, self._row)
+        return self._decoded()[key]
+
+    def __contains__(self, key: object) -> bool:
+        position = self._store._positions.get(key)
+        if position is not None and not self._store._absent[self._row] >> position & 1:
+            return True
+        return key in self._decoded()
+
+    def __iter__(self) -> Iterator[str]:
+        absent = self._store._absent[self._row]
+        for position, field in enumerate(self._store._fields):
+            if not absent >> position & 1:
+                yield field
+        yield from self._decoded()
+
+    def __len__(self) -> int:
+        absent = self._store._absent[self._row]
+        return sum(1 for position in range(len(self._store._fields)) if not absent >> position & 1) + len(self._decoded())
+
+    def to_dict(self) -> dict:
+        """Return the record as a regular dict"""
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return f"StoredRecord({self.to_dict()!r})"
+
+class RecordStore(MutableMapping):
+    """
+    Compact mapping of record id -> record for a single entity type. See the module docstring for the storage layout.
+    hot_fields overrides the columns used for the entity type (see HOT_FIELDS); up to 32 hot fields are supported.
+    """
+
+    def __init__(self, entity_key: str = "", hot_fields: dict[str, str] | None = None, compress_level: int = 1):
+        self.entity_key = entity_key
+        self.hot_fields = hot_fields if hot_fields is not None else HOT_FIELDS.get(entity_key, DEFAULT_HOT_FIELDS)
+        if len(self.hot_fields) > 32:
+            raise ValueError("A RecordStore supports up to 32 hot fields")
+        self.compress_level = compress_level
+        self._fields = list(self.hot_fields)
+        self._positions = {field: position for position, field in enumerate(self._fields)}
+        self._columns: dict[str, array | list] = {
+            field: [] if typecode in "sk" else array(typecode) for field, typecode in self.hot_fields.items()
+        }
+        # per row: bit n is set if hot field n is not stored in its column (the record doesn't have it, or its value doesn't fit)
+        self._absent = array("L")
+        self._blobs: list[bytes | None] = []
+        self._index: dict[str, int] = {}
+        # rows of deleted records, reused for new records
+        self._free: list[int] = []
+
+    def _column_value(self, field: str, row: int):
+        value = self._columns[field][row]
+        typecode = self.hot_fields[field]
+        if typecode in "sk":
+            return value
+        if value == _NULLS[typecode]:
+            return None
+        return bool(value) if typecode == "b" else value
+
+    def _fits(self, typecode: str, value) -> bool:
+        if typecode in "sk":
+            return value is None or isinstance(value, str)
+        if value is None:
+            return True
+        if typecode == "b":
+            return isinstance(value, bool)
+        return isinstance(value, int) and not isinstance(value, bool) and _NULLS[typecode] < value <= -_NULLS[typecode] - 1
+
+    def _encode(self, record: Mapping, row: int) -> None:
+        """Write record to row, which already exists in all columns"""
+        absent = 0
+        rest = {}
+        for key, value in record.items():
+            if key not in self._positions:
+                rest[key] = value
+        for position, field in enumerate(self._fields):
+            typecode = self.hot_fields[field]
+            column = self._columns[field]
+            if field in record and self._fits(typecode, record[field]):
+                value = record[field]
+                if typecode == "k" and value is not None:
+                    value = sys.intern(value)
+                elif typecode not in "sk":
+                    value = _NULLS[typecode] if value is None else int(value)
+                column[row] = value
+            else:
+                absent |= 1 << position
+                column[row] = None if typecode in "sk" else _NULLS[typecode]
+                if field in record:
+                    rest[field] = record[field]
+        self._absent[row] = absent
+        self._blobs[row] = zlib.compress(json.dumps(rest, separators=(",", ":")).encode(), self.compress_level) if rest else _EMPTY
+
+    def _decode(self, row: int) -> dict:
+        blob = self._blobs[row]
+        return json.loads(zlib.decompress(blob)) if blob else {}
+
+    def _new_row(self) -> int:
+        if self._free:
+            return self._free.pop()
+        for field, typecode in self.hot_fields.items():
+            self._columns[field].append(None if typecode in "sk" else _NULLS[typecode])
+        self._absent.append(0)
+        self._blobs.append(None)
+        return len(self._blobs) - 1
+
+    def __setitem__(self, key: str, record: Mapping) -> None:
+        if isinstance(record, StoredRecord):
+            record = record.to_dict()
+        row = self._index.get(key)
+        if row is None:
+            row = self._new_row()
+            self._index[sys.intern(key)] = row
+        self._encode(record, row)
+
+    def __getitem__(self, key: str) -> StoredRecord:
+        return StoredRecord(self, self._index[key])
+
+    def __delitem__(self, key: str) -> None:
+        row = self._index.pop(key)
+        self._blobs[row] = None
+        self._free.append(row)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def merge(self, other: "RecordStore") -> None:
+        """
+        Add all records of other to this store, replacing records with the same id.
+        If both stores use the same hot fields, the encoded records are copied without decoding them.
+        """
+        if other.hot_fields != self.hot_fields:
+            for key in other:
+                self[key] = other[key]
+            return
+        for key, other_row in other._index.items():
+            row = self._index.get(key)
+            if row is None:
+                row = self._new_row()
+                self._index[key] = row
+            for field, column in self._columns.items():
+                column[row] = other._columns[field][other_row]
+            self._absent[row] = other._absent[other_row]
+            self._blobs[row] = other._blobs[other_row]
+
+    def column(self, field: str) -> Iterator[tuple[str, object]]:
+        """Yield (record id, value) for a hot field of all records, without decoding the records"""
+        if field not in self._positions:
+            raise KeyError(f"{field} is not a hot field of this store: {self._fields}")
+        position = self._positions[field]
+        for key, row in self._index.items():
+            if not self._absent[row] >> position & 1:
+                yield key, self._column_value(field, row)
+
+    def memory_usage(self) -> int:
+        """Approximate number of bytes used by the store, excluding the interned strings shared with other objects"""
+        size = sys.getsizeof(self._index) + sys.getsizeof(self._blobs) + sys.getsizeof(self._absent)
+        size += sum(len(blob) + 33 for blob in self._blobs if blob)
+        for field, column in self._columns.items():
+            size += sys.getsizeof(column)
+            if self.hot_fields[field] == "s":
+                size += sum(sys.getsizeof(value) for value in column if value is not None)
+        return size
+
+    def __repr__(self) -> str:
+        return f"RecordStore({self.entity_key!r}, {len(self)} records)"
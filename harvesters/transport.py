@@ -0,0 +1,287 @@
+"""
+Shared HTTP transport for all harvesters.
+
+All requests to a host go through one requests.Session with a connection pool, so connections are kept alive and
+the TCP/TLS setup is paid once per host instead of once per request. Per host, the transport also provides:
+    - a limit on the number of concurrent requests (HostPolicy.max_connections)
+    - retries with exponential backoff and jitter for connection errors and retryable status codes (429, 5xx).
+      The Retry-After header, and rate limit headers (X-RateLimit-Remaining / X-RateLimit-Reset) are honored:
+      the whole host is paused until then, so parallel workers don't keep hitting the rate limit.
+    - a circuit breaker: after failure_threshold consecutive failures (5xx or connection errors), requests to the host
+      wait for reset_timeout seconds, after which a single request is sent to probe whether the host has recovered.
+
+Responses are requested gzip-compressed. requests is imported when the first session is created, so importing this module is cheap.
+Harvesters use the transport through Harvester.transport and Harvester._get; pyalex is routed through it by OpenAlexHarvester.
+"""
+import email.utils
+import logging
+import random
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import cache
+from urllib.parse import urlsplit
+from harvesters.metrics import Metrics
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """Raised when a host keeps failing and its circuit breaker stays open"""
+
+@dataclass
+class HostPolicy:
+    """Transport settings for a single host"""
+    max_connections: int = 8
+    max_retries: int = 5
+    backoff_factor: float = 0.5
+    # maximum number of seconds to wait before a retry
+    max_backoff: float = 60.0
+    retry_statuses: frozenset[int] = frozenset({429, 500, 502, 503, 504})
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+    timeout: float = 60.0
+
+class CircuitBreaker:
+    """
+    Circuit breaker for a single host. Closed: requests are sent. Open: requests wait until reset_timeout has passed.
+    Half-open: one request is sent as a probe; if it succeeds the circuit closes, otherwise it opens again.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def wait_time(self) -> float:
+        """Return the seconds to wait before a request may be sent; 0 if it can be sent now"""
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                return remaining
+            if self._probing:
+                # another request is probing the host, check again shortly
+                return min(1.0, self.reset_timeout)
+            self._probing = True
+            return 0.0
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> bool:
+        """Record a failed request. Returns True if this opened the circuit."""
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self._probing = False
+                return True
+            return False
+
+@dataclass
+class _Host:
+    """Shared state of a host: its session, concurrency limit, circuit breaker and the time until which it is paused"""
+    policy: HostPolicy
+    session: object
+    semaphore: threading.BoundedSemaphore
+    breaker: CircuitBreaker
+    paused_until: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+def retry_after(headers: dict, now: float | None = None) -> float | None:
+    """
+    Return the number of seconds to wait according to the Retry-After header (seconds or an HTTP date),
+    or the rate limit headers if the limit is exhausted. Returns None if the headers don't say.
+    """
+    now = time.time() if now is None else now
+    value = headers.get("Retry-After")
+    if value:
+        value = value.strip()
+        if value.replace(".", "", 1).isdigit():
+            return float(value)
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - now)
+        except (TypeError, ValueError):
+            pass
+    remaining = headers.get("X-RateLimit-Remaining") or headers.get("RateLimit-Remaining")
+    reset = headers.get("X-RateLimit-Reset") or headers.get("RateLimit-Reset")
+    if remaining is not None and reset and remaining.strip() == "0":
+        try:
+            reset = float(reset)
+        except ValueError:
+            return None
+        # the reset is either a number of seconds, or a unix timestamp
+        return max(0.0, reset - now) if reset > 1e9 else reset
+    return None
+
+class HttpTransport:
+    """Pooled HTTP transport shared by all harvesters; see the module docstring"""
+
+    def __init__(self, default_policy: HostPolicy | None = None, host_policies: dict[str, HostPolicy] | None = None):
+        self.default_policy = default_policy or HostPolicy()
+        self.host_policies = host_policies or {}
+        self._hosts: dict[str, _Host] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @classmethod
+    def from_settings(cls, transport_settings: dict) -> "HttpTransport":
+        """Create a transport from the transport_settings section of the settings file"""
+        hosts = transport_settings.get("hosts") or {}
+        defaults = {key: value for key, value in transport_settings.items() if key != "hosts"}
+        return cls(
+            default_policy=_policy(defaults),
+            host_policies={host: _policy({**defaults, **overrides}) for host, overrides in hosts.items()},
+        )
+
+    def configure_host(self, host: str, **settings) -> None:
+        """Change the policy of a host, e.g. configure_host('api.openalex.org', max_connections=10). Applies to sessions created afterwards."""
+        current = self.host_policies.get(host, self.default_policy)
+        self.host_policies[host] = _policy({**current.__dict__, **settings})
+
+    def _host(self, host: str) -> _Host:
+        state = self._hosts.get(host)
+        if state is not None:
+            return state
+        with self._lock:
+            if host not in self._hosts:
+                import requests
+
+                policy = self.host_policies.get(host, self.default_policy)
+                session = requests.Session()
+                # retries are handled by the transport, so the adapter doesn't retry itself
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=policy.max_connections, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers["Accept-Encoding"] = "gzip, deflate"
+                self._hosts[host] = _Host(
+                    policy,
+                    session,
+                    threading.BoundedSemaphore(policy.max_connections),
+                    CircuitBreaker(policy.failure_threshold, policy.reset_timeout),
+                )
+            return self._hosts[host]
+
+    @contextmanager
+    def bind_metrics(self, metrics: Metrics | None) -> Iterator[None]:
+        """Record the requests sent by the current thread in metrics, for callers that don't pass metrics themselves (e.g. pyalex)"""
+        previous = getattr(self._local, "metrics", None)
+        self._local.metrics = metrics
+        try:
+            yield
+        finally:
+            self._local.metrics = previous
+
+    def _pause(self, state: _Host, seconds: float) -> None:
+        with state.lock:
+            state.paused_until = max(state.paused_until, time.monotonic() + seconds)
+
+    def _backoff(self, policy: HostPolicy, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(policy.max_backoff, policy.backoff_factor * 2 ** attempt))
+
+    def request(self, method: str, url: str, metrics: Metrics | None = None, **kwargs):
+        """
+        Send a request, retrying connection errors and retryable status codes. Returns the requests.Response.
+        The response of the last attempt is returned if all retries fail with a status code; raise_for_status() is up to the caller.
+        Raises CircuitOpenError if the host's circuit breaker is still open after all retries, or the last connection error.
+        """
+        import requests
+
+        metrics = metrics if metrics is not None else getattr(self._local, "metrics", None)
+        host = urlsplit(url).netloc
+        state = self._host(host)
+        policy = state.policy
+        kwargs.setdefault("timeout", policy.timeout)
+        attempt = 0
+        while True:
+            paused = state.paused_until - time.monotonic()
+            if paused > 0:
+                if metrics is not None:
+                    metrics.observe("backoff", paused)
+                time.sleep(paused)
+                continue
+            wait = state.breaker.wait_time()
+            if wait > 0:
+                if attempt >= policy.max_retries:
+                    raise CircuitOpenError(f"Circuit breaker for {host} is open after repeated failures")
+                if metrics is not None:
+                    metrics.observe("backoff", wait)
+                time.sleep(min(wait, policy.max_backoff))
+                attempt += 1
+                continue
+            try:
+                with state.semaphore:
+                    response = state.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if metrics is not None:
+                    metrics.increment("connection_errors")
+                if state.breaker.record_failure():
+                    logger.warning(f"Opened the circuit breaker for {host} after repeated failures: {e}")
+                if attempt >= policy.max_retries:
+                    raise
+                self._pause(state, self._backoff(policy, attempt))
+                attempt += 1
+                if metrics is not None:
+                    metrics.increment("retries")
+                continue
+
+            status = response.status_code
+            if metrics is not None:
+                metrics.increment("requests")
+                metrics.increment("bytes", len(response.content))
+                if status == 429:
+                    metrics.increment("rate_limited")
+                if status >= 400:
+                    metrics.increment("http_errors")
+            delay = retry_after(response.headers)
+            # rate limit responses are handled by the backoff; the host itself is working
+            if status >= 500:
+                if state.breaker.record_failure():
+                    logger.warning(f"Opened the circuit breaker for {host} after repeated {status} responses")
+            else:
+                state.breaker.record_success()
+            if status not in policy.retry_statuses or attempt >= policy.max_retries:
+                if delay is not None and status < 400:
+                    # the rate limit is exhausted: pause the host until it resets
+                    self._pause(state, min(delay, policy.max_backoff))
+                return response
+            self._pause(state, min(delay if delay is not None else self._backoff(policy, attempt), policy.max_backoff))
+            attempt += 1
+            if metrics is not None:
+                metrics.increment("retries")
+
+    def get(self, url: str, metrics: Metrics | None = None, **kwargs):
+        return self.request("GET", url, metrics=metrics, **kwargs)
+
+    def close(self) -> None:
+        """Close all sessions and their pooled connections"""
+        with self._lock:
+            for state in self._hosts.values():
+                state.session.close()
+            self._hosts = {}
+
+def _policy(settings: dict) -> HostPolicy:
+    settings = dict(settings)
+    if "retry_statuses" in settings:
+        settings["retry_statuses"] = frozenset(settings["retry_statuses"])
+    return HostPolicy(**settings)
+
+@cache
+def get_transport() -> HttpTransport:
+    """Return the transport shared by all harvesters, created from the transport_settings of the app settings on first use."""
+    return HttpTransport.from_settings(getattr(get_settings(), "transport_settings", None) or {})
@@ -6,18 +6,25 @@ app = marimo.App(width="medium")
 
 @app.cell
 def imports():
+    import logging
     import marimo as mo
     import constants
-    from settings import SETTINGS
+    from settings import get_settings
     from harvester_manager import HarvesterManager
     from harvesters.generics import SearchValue, SearchEntityType, QueryValueType
+    from results_view import MISSING, ResultsView
+    SETTINGS = get_settings()
+    logging.basicConfig(level=SETTINGS.log_level, format="%(asctime)s %(name)s %(levelname)s: %(message)s")
     return (
         HarvesterManager,
+        MISSING,
         QueryValueType,
+        ResultsView,
         SETTINGS,
         SearchEntityType,
         SearchValue,
         constants,
+        logging,
         mo,
     )
 
@@ -33,23 +40,87 @@ def _(HarvesterManager, QueryValueType, SearchEntityType, SearchValue):
         SearchValue("https://orcid.org/0000-0002-4769-5239", QueryValueType.ORCID, SearchEntityType.AUTHOR),
         SearchValue("https://ror.org/006hf6230", QueryValueType.ROR, SearchEntityType.WORK),
     ])
-    print(manager.harvesters['openalex'].search_values)
-    print(len(manager.harvesters['openalex'].search_values))
     return (manager,)
 
 
-@app.cell(disabled=True)
-def _(manager):
-    results = manager.harvesters['openalex'].get_results(True)
-    print(results.keys())
-    return (results,)
+@app.cell
+def _(mo):
+    # harvesting only starts when this button is clicked; changing the views below never starts a new harvest
+    run_button = mo.ui.run_button(label="Harvest")
+    run_button
+    return (run_button,)
+
+
+@app.cell
+def _(ResultsView, manager, mo, run_button):
+    mo.stop(not run_button.value, mo.md("Click **Harvest** to retrieve the results."))
+    view = ResultsView()
+    # records are added to the view as they are streamed in, with a running summary every 500 streamed records
+    # (counted separately, as records that were already in the view don't increase view.count())
+    _streamed = 0
+    for _source, _entity_key, _record in manager.iter_results(store=False):
+        view.add(_source, _entity_key, _record)
+        _streamed += 1
+        if _streamed % 500 == 0:
+            mo.output.replace(mo.md(f"Retrieved {_streamed} records, {view.count()} unique, {view.count('works')} works..."))
+    mo.output.replace(mo.md(", ".join(f"{view.count(_entity)} {_entity}" for _entity in view.entity_types) or "No results"))
+    return (view,)
 
 
 @app.cell
-def _(results):
-    for itemtype, items in results.items():
-        print(f"got {len(items)} {itemtype}")
-    return items, itemtype
+def _(mo, view):
+    entity_select = mo.ui.dropdown(options=view.entity_types, value=view.entity_types[0] if view.entity_types else None, label="Entity type")
+    entity_select
+    return (entity_select,)
+
+
+@app.cell
+def _(MISSING, entity_select, mo, view):
+    # summary tables of the precomputed counts, and a filter per summary dimension
+    filter_selects = mo.ui.dictionary({
+        _dimension: mo.ui.dropdown(
+            options={"all": None, **{str(_value): _value for _value, _ in view.summary(entity_select.value, _dimension)}},
+            value="all",
+            label=_dimension,
+        )
+        for _dimension in view.dimensions(entity_select.value)
+    })
+    search_text = mo.ui.text(label="Title contains")
+    page_size = mo.ui.dropdown(options={"25": 25, "50": 50, "100": 100}, value="50", label="Rows per page")
+    mo.vstack([
+        mo.hstack([
+            mo.ui.table(
+                [{_dimension: str(_value) if _value is MISSING else _value, "records": _count} for _value, _count in view.summary(entity_select.value, _dimension, top=20)],
+                selection=None,
+                label=_dimension,
+            )
+            for _dimension in view.dimensions(entity_select.value)
+        ]),
+        mo.hstack([filter_selects, search_text, page_size]),
+    ])
+    return filter_selects, page_size, search_text
+
+
+@app.cell
+def _(entity_select, filter_selects, mo, page_size, search_text, view):
+    total = view.count(entity_select.value, filters=filter_selects.value, search=search_text.value)
+    page_number = mo.ui.number(start=1, stop=max(1, -(-total // page_size.value)), value=1, label=f"Page (of {total} records)")
+    page_number
+    return page_number, total
+
+
+@app.cell
+def _(entity_select, filter_selects, mo, page_number, page_size, search_text, view):
+    # only the rows of the current page are sent to the browser
+    rows, _ = view.page(
+        entity_select.value,
+        page=page_number.value - 1,
+        page_size=page_size.value,
+        filters=filter_selects.value,
+        search=search_text.value,
+    )
+    mo.ui.table(rows, pagination=False, selection=None)
+    return (rows,)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,299 @@
+"""
+Indexed, in-memory view of harvested records, used by the results explorer in interface.py.
+
+Rendering tens of thousands of records at once would freeze the browser, so the view does the paging and filtering in Python,
+and only the rows of the requested page are turned into dicts for display:
+    - records are kept in a compact RecordStore per entity type (see harvesters.record_store), in the order they arrived
+    - for each summary dimension (e.g. publication year, OA status and publisher of works), the view keeps the count per value,
+      and an index of value -> rows with that value, so filtering on a dimension doesn't have to look at the other records
+    - counts and indexes are updated as each record is added or removed, so summaries can be shown while records are still streaming in
+    - records without a value for a dimension are counted and indexed under MISSING, so they can be selected or excluded like other values
+    - index entries only grow: a row that is removed or gets another value is left behind in its old entry, and skipped (and the entry
+      compacted) when the entry is next read, so removing a record takes constant time
+
+Usage:
+    view = ResultsView()
+    for source, entity_key, record in manager.iter_results(store=False):
+        view.add(source, entity_key, record)
+    view.summary("works", "year")
+    rows, total = view.page("works", page=0, page_size=50, filters={"oa_status": "gold"}, search="climate")
+    rows, total = view.page("works", filters={"publisher": MISSING}, exclude={"type": "article"})
+"""
+import logging
+from array import array
+from collections import Counter
+from collections.abc import Iterable, Sequence
+from harvesters.record_store import RecordStore
+
+logger = logging.getLogger(__name__)
+
+# summary dimensions per entity type: name -> path of the value in the records.
+# Publishers are grouped by their normalized name (see harvesters.publishers); the table shows the original name.
+DIMENSIONS: dict[str, dict[str, tuple[str, ...]]] = {
+    "works": {
+        "year": ("publication_year",),
+        "oa_status": ("open_access", "oa_status"),
+        "publisher": ("primary_location", "source", "publisher_normalized"),
+        "type": ("type",),
+    },
+    "sources": {"publisher": ("publisher_normalized",), "type": ("type",)},
+    "institutions": {"country": ("country_code",), "type": ("type",)},
+}
+DEFAULT_DIMENSIONS: dict[str, tuple[str, ...]] = {}
+
+class _Missing:
+    def __repr__(self) -> str:
+        return "(missing)"
+
+# dimension value of records that don't have a value for the dimension; use it in filters to select (or exclude) these records
+MISSING = _Missing()
+# dimension value of removed rows, which doesn't match any filter
+_REMOVED = _Missing()
+
+# columns shown in the table per entity type: name -> path of the value in the records
+COLUMNS: dict[str, dict[str, tuple[str, ...]]] = {
+    "works": {
+        "id": ("id",),
+        "doi": ("doi",),
+        "title": ("title",),
+        "year": ("publication_year",),
+        "type": ("type",),
+        "oa_status": ("open_access", "oa_status"),
+        "publisher": ("primary_location", "source", "host_organization_name"),
+        "cited_by_count": ("cited_by_count",),
+    },
+}
+DEFAULT_COLUMNS: dict[str, tuple[str, ...]] = {
+    "id": ("id",),
+    "display_name": ("display_name",),
+    "works_count": ("works_count",),
+    "cited_by_count": ("cited_by_count",),
+}
+
+def _get(record, path: tuple[str, ...]):
+    """Get a nested value from a record, returning None if any part of the path is missing"""
+    for key in path:
+        if not record:
+            return None
+        record = record.get(key)
+    return record
+
+class _EntityIndex:
+    """Records, source names, dimension values, counts and value indexes of a single entity type"""
+
+    def __init__(self, entity_key: str):
+        self.store = RecordStore(entity_key)
+        self.dimensions = DIMENSIONS.get(entity_key, DEFAULT_DIMENSIONS)
+        self.columns = COLUMNS.get(entity_key, DEFAULT_COLUMNS)
+        # record ids and source names by row number, in the order the records arrived (None for removed records)
+        self.keys: list[str | None] = []
+        self.sources: list[str | None] = []
+        self.rows: dict[str, int] = {}
+        # per dimension: the value of each row, the number of rows per value, and the rows per value
+        self.values: dict[str, list] = {dimension: [] for dimension in self.dimensions}
+        self.counts: dict[str, Counter] = {dimension: Counter() for dimension in self.dimensions}
+        self.index: dict[str, dict[object, array]] = {dimension: {} for dimension in self.dimensions}
+        # (dimension, value) of the index entries that may contain rows that no longer have the value, or rows out of order
+        self.stale: set[tuple[str, object]] = set()
+
+    def _count(self, dimension: str, value, change: int) -> None:
+        counts = self.counts[dimension]
+        counts[value] += change
+        if not counts[value]:
+            del counts[value]
+
+    def add(self, source: str, record_id: str, record: dict) -> None:
+        row = self.rows.get(record_id)
+        if row is None:
+            row = self.rows[record_id] = len(self.keys)
+            self.keys.append(record_id)
+            self.sources.append(source)
+            for dimension, path in self.dimensions.items():
+                value = _get(record, path)
+                value = MISSING if value is None else value
+                self.values[dimension].append(value)
+                self._count(dimension, value, 1)
+                self.index[dimension].setdefault(value, array("i")).append(row)
+        else:
+            # a newer version of a record: add it to the index entries of its new values, and leave the old entries to be compacted
+            self.sources[row] = source
+            for dimension, path in self.dimensions.items():
+                old, value = self.values[dimension][row], _get(record, path)
+                value = MISSING if value is None else value
+                if old == value:
+                    continue
+                self.values[dimension][row] = value
+                self._count(dimension, old, -1)
+                self._count(dimension, value, 1)
+                self.stale.add((dimension, old))
+                rows = self.index[dimension].setdefault(value, array("i"))
+                if rows and rows[-1] >= row:
+                    self.stale.add((dimension, value))
+                rows.append(row)
+        self.store[record_id] = record
+
+    def remove(self, record_id: str) -> None:
+        row = self.rows.pop(record_id)
+        self.keys[row] = None
+        self.sources[row] = None
+        for dimension in self.dimensions:
+            old = self.values[dimension][row]
+            self.values[dimension][row] = _REMOVED
+            self._count(dimension, old, -1)
+            self.stale.add((dimension, old))
+        del self.store[record_id]
+
+    def rows_with(self, dimension: str, value) -> array:
+        """Return the rows with the given value for a dimension, in row order"""
+        rows = self.index[dimension].get(value)
+        if rows is None:
+            return array("i")
+        if (dimension, value) in self.stale:
+            values = self.values[dimension]
+            rows = array("i", sorted({row for row in rows if values[row] == value}))
+            if rows:
+                self.index[dimension][value] = rows
+            else:
+                del self.index[dimension][value]
+            self.stale.discard((dimension, value))
+        return rows
+
+class ResultsView:
+    """
+    Indexed view of harvested records from any number of sources, with paging, filtering and incrementally updated summaries.
+    See the module docstring. Records are identified by their id within an entity type; a record that is added again replaces the earlier one.
+    """
+
+    def __init__(self):
+        self._entities: dict[str, _EntityIndex] = {}
+
+    def add(self, source: str, entity_key: str, record: dict) -> None:
+        """Add a record retrieved by the given source (harvester name), and update the summaries"""
+        entity = self._entities.get(entity_key)
+        if entity is None:
+            entity = self._entities[entity_key] = _EntityIndex(entity_key)
+        entity.add(source, record["id"], record)
+
+    def extend(self, results: Iterable[tuple[str, str, dict]]) -> int:
+        """Add (source, entity type, record) tuples, e.g. from HarvesterManager.iter_results(). Returns the number of records added."""
+        added = 0
+        for source, entity_key, record in results:
+            self.add(source, entity_key, record)
+            added += 1
+        return added
+
+    def remove(self, entity_key: str, record_id: str) -> None:
+        """Remove a record, and update the summaries. Raises a KeyError if the record is not in the view."""
+        entity = self._entities.get(entity_key)
+        if entity is None:
+            raise KeyError(record_id)
+        entity.remove(record_id)
+
+    @property
+    def entity_types(self) -> list[str]:
+        return list(self._entities)
+
+    def count(
+        self,
+        entity_key: str | None = None,
+        filters: dict[str, object] | None = None,
+        search: str | None = None,
+        exclude: dict[str, object] | None = None,
+    ) -> int:
+        """Number of records of an entity type (or of all entity types) that match the filters and search, see page()"""
+        if entity_key is None:
+            return sum(len(entity.rows) for entity in self._entities.values())
+        entity = self._entities.get(entity_key)
+        if entity is None:
+            return 0
+        if not filters and not search and not exclude:
+            return len(entity.rows)
+        return self.page(entity_key, page_size=0, filters=filters, search=search, exclude=exclude)[1]
+
+    def dimensions(self, entity_key: str) -> list[str]:
+        """Names of the summary dimensions of an entity type, which can be used in summary() and as filters"""
+        return list(DIMENSIONS.get(entity_key, DEFAULT_DIMENSIONS))
+
+    def summary(self, entity_key: str, dimension: str, top: int | None = None) -> list[tuple[object, int]]:
+        """Return (value, number of records) for a dimension of an entity type, largest count first (at most top values)"""
+        entity = self._entities.get(entity_key)
+        if entity is None:
+            return []
+        return entity.counts[dimension].most_common(top)
+
+    def _matching_rows(
+        self,
+        entity: _EntityIndex,
+        filters: dict[str, object] | None,
+        search: str | None,
+        exclude: dict[str, object] | None = None,
+    ) -> Iterable[int]:
+        """
+        Return the row numbers matching all filters (dimension -> value), none of the exclude filters, and containing search in their title,
+        in row order. Returns a sequence if the rows are known without checking each record (no filter, or a single filter without
+        exclude filters and search, and no removed records), else an iterator.
+        """
+        filters = {dimension: value for dimension, value in (filters or {}).items() if value is not None}
+        exclude = {dimension: value for dimension, value in (exclude or {}).items() if value is not None}
+        unknown = (set(filters) | set(exclude)) - set(entity.dimensions)
+        if unknown:
+            raise ValueError(f"Cannot filter on {sorted(unknown)}. Valid filters are {list(entity.dimensions)}")
+        if filters:
+            # start from the smallest index entry, and check the other filters on the value columns
+            first = min(filters, key=lambda dimension: entity.counts[dimension].get(filters[dimension], 0))
+            rows = entity.rows_with(first, filters[first])
+            others = [(entity.values[dimension], value) for dimension, value in filters.items() if dimension != first]
+            if others:
+                rows = (row for row in rows if all(values[row] == value for values, value in others))
+        elif len(entity.rows) == len(entity.keys):
+            rows = range(len(entity.keys))
+        else:
+            keys = entity.keys
+            rows = (row for row in range(len(keys)) if keys[row] is not None)
+        if exclude:
+            excluded = [(entity.values[dimension], value) for dimension, value in exclude.items()]
+            rows = (row for row in rows if not any(values[row] == value for values, value in excluded))
+        if search:
+            search = search.casefold()
+            title_field = "title" if "title" in entity.store.hot_fields else "display_name"
+            store = entity.store
+            rows = (row for row in rows if search in (_get(store[entity.keys[row]], (title_field,)) or "").casefold())
+        return rows
+
+    def page(
+        self,
+        entity_key: str,
+        page: int = 0,
+        page_size: int = 50,
+        filters: dict[str, object] | None = None,
+        search: str | None = None,
+        exclude: dict[str, object] | None = None,
+    ) -> tuple[list[dict], int]:
+        """
+        Return the rows of a page (numbered from 0) of the records of an entity type, and the total number of matching records.
+        filters maps summary dimensions to the value to select (None: all values, MISSING: records without a value);
+        exclude maps summary dimensions to a value to leave out; search selects records with the text in their title.
+        Only the records on the page are read from the store and flattened into rows with the COLUMNS of the entity type.
+        """
+        entity = self._entities.get(entity_key)
+        if entity is None:
+            return [], 0
+        start = page * page_size
+        matching = self._matching_rows(entity, filters, search, exclude)
+        if isinstance(matching, Sequence | array):
+            selected, total = matching[start:start + page_size], len(matching)
+        else:
+            selected, total = [], 0
+            for row in matching:
+                if start <= total < start + page_size:
+                    selected.append(row)
+                total += 1
+        rows = []
+        for row in selected:
+            record = entity.store[entity.keys[row]]
+            rows.append({"source": entity.sources[row], **{name: _get(record, path) for name, path in entity.columns.items()}})
+        return rows, total
+
+    def record(self, entity_key: str, record_id: str) -> dict:
+        """Return the full record with the given id"""
+        return self._entities[entity_key].store[record_id].to_dict()
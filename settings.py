@@ -1,9 +1,15 @@
 """
 This module manages the settings for the app.
 Change them in the app or directly in the settings.yaml file.
+
+The settings are loaded on first use, with get_settings() (or the module attribute SETTINGS, which calls it),
+so importing this module does not read or parse the settings file.
 """
-import yaml
+import logging
 from dataclasses import dataclass, field
+from functools import cache
+
+logger = logging.getLogger(__name__)
 
 @dataclass
 class Source:
@@ -11,6 +17,9 @@ class Source:
     name: str
     enabled: bool
     api_url: str | None = None
+    # concurrency budget for this source: number of parallel requests, and the maximum request rate (requests per second)
+    max_workers: int = 4
+    requests_per_second: float = 5
 
     def __repr__(self) -> str:
         return f"{' [enabled]' if self.enabled else '[disabled]'} {self.name.replace('_',' ').capitalize()}"
@@ -24,7 +33,12 @@ class Settings:
 
     file_path: str = "settings.yaml"
     user_email: str = "user@example.com"
+    # level of the log messages of the harvesters, e.g. 'DEBUG', 'INFO' or 'WARNING'
+    log_level: str = "INFO"
     openalex_settings: dict = field(default_factory=dict, init=False)
+    cache_settings: dict = field(default_factory=dict, init=False)
+    openapc_settings: dict = field(default_factory=dict, init=False)
+    transport_settings: dict = field(default_factory=dict, init=False)
     raw_settings: dict = field(default_factory=dict, init=False, repr=False)
     sources: list[Source] = field(default_factory=list, init=False)
     def __post_init__(self):
@@ -34,11 +48,15 @@ class Settings:
 
     def load(self) -> None:
         """Load the settings from the settings.yaml file"""
+        # imported here, so modules that only need the dataclasses don't pay for importing yaml
+        import yaml
+        # the C implementation of the loader (part of PyYAML if libyaml is available) is several times faster
+        loader = getattr(yaml, "CFullLoader", yaml.FullLoader)
         try:
             with open(self.file_path) as f:
-                self.raw_settings = yaml.load(f, Loader=yaml.FullLoader)
+                self.raw_settings = yaml.load(f, Loader=loader)
         except Exception as e:
-            print(f"Error while loading settings from {self.file_path}: {e}")
+            logger.error(f"Error while loading settings from {self.file_path}: {e}")
             self.raw_settings = {}
 
     def parse_settings(self) -> None:
@@ -59,4 +77,13 @@ User email:    {self.user_email}
 Sources:       {'\n               '.join(map(str, self.sources))}
         """
 
-SETTINGS = Settings()
+@cache
+def get_settings() -> Settings:
+    """Return the app settings, loaded from settings.yaml on first use"""
+    return Settings()
+
+def __getattr__(name: str):
+    # SETTINGS is kept as a module attribute for backwards compatibility, but it is only created when accessed
+    if name == "SETTINGS":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
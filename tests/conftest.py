@@ -0,0 +1,33 @@
+import pyalex
+import pytest
+from benchmarks.run_benchmarks import MockServer
+from harvesters.transport import get_transport
+
+@pytest.fixture(autouse=True)
+def no_shared_cache(monkeypatch):
+    """Harvesters in the tests don't use the cache of the app (in .cache/), unless a test sets one"""
+    monkeypatch.setattr("harvesters.generics.get_cache", lambda: None)
+
+@pytest.fixture(scope="session")
+def mock_server():
+    """The mock OpenAlex API of the benchmarks (see benchmarks/mock_openalex.py), used by pyalex for the whole session"""
+    server = MockServer(["--works-per-value", "120", "--changed-rate", "0.1"])
+    previous_url = pyalex.config.openalex_url
+    pyalex.config.openalex_url = server.url
+    yield server
+    pyalex.config.openalex_url = previous_url
+    server.stop()
+
+@pytest.fixture
+def mock_api(mock_server, monkeypatch):
+    """The mock OpenAlex API, with its counts reset. Requests to any other host fail right away, instead of retrying against the real API."""
+    transport = get_transport()
+    send = transport.get
+
+    def get(url: str, *args, **kwargs):
+        assert url.startswith(mock_server.url), f"request outside the mock API: {url}"
+        return send(url, *args, **kwargs)
+
+    monkeypatch.setattr(transport, "get", get)
+    mock_server.reset()
+    return mock_server
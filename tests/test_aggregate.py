@@ -0,0 +1,40 @@
+import pytest
+from harvesters.generics import QueryValueType, SearchValue
+from harvesters.openalex import CountTable, OpenAlexHarvester
+from settings import Source
+
+@pytest.fixture
+def harvester(mock_api) -> OpenAlexHarvester:
+    harvester = OpenAlexHarvester(Source("openalex", True))
+    harvester.cache = None
+    return harvester
+
+def test_count_table():
+    table = CountTable("open_access.oa_status")
+    table.add([{"key": "gold", "key_display_name": "gold", "count": 2}, {"key": "closed", "count": 5}])
+    table.add([{"key": "https://openalex.org/P1", "key_display_name": "Elsevier", "count": 3}, {"key": "gold", "count": 2}])
+    assert table.rows() == [("closed", "closed", 5), ("gold", "gold", 4), ("https://openalex.org/P1", "Elsevier", 3)]
+
+def test_aggregate_per_search_value(harvester, mock_api):
+    rors = [SearchValue("006hf6230", "ror", "work"), SearchValue("04pp8hn57", "ror", "work")]
+    tables = harvester.aggregate(QueryValueType.OA_STATUS, rors)
+    assert set(tables) == {(rors[0],), (rors[1],)}
+    for table in tables.values():
+        assert table.group_by == "open_access.oa_status"
+        assert table.total == 120
+        assert sum(table.counts.values()) == 120
+        assert set(table.counts) <= {"gold", "green", "hybrid", "bronze", "closed"}
+    # only the counts are retrieved, not the records
+    assert mock_api.stats()["requests"] == 2
+    assert not harvester._results["works"]
+
+def test_aggregate_packs_identifier_lookups(harvester, mock_api):
+    dois = [SearchValue(f"10.5555/aggregate.{i}", "doi", "work") for i in range(30)]
+    tables = harvester.aggregate("publication_year", dois)
+    assert list(tables) == [tuple(dois)]
+    assert tables[tuple(dois)].total == 30
+    assert mock_api.stats()["requests"] == 1
+
+def test_aggregate_invalid_field(harvester):
+    with pytest.raises(ValueError):
+        harvester.aggregate(QueryValueType.DOI, [SearchValue("10.5555/1", "doi", "work")])
@@ -0,0 +1,71 @@
+import pytest
+from bulk_import import BulkImporter, detect_type
+from harvesters.generics import QueryValueType, SearchEntityType, SearchValue
+
+@pytest.mark.parametrize(("value", "expected"), [
+    ("https://doi.org/10.1234/ABC", QueryValueType.DOI),
+    ("doi:10.1234/abc", QueryValueType.DOI),
+    ("0000-0002-4769-5239", QueryValueType.ORCID),
+    ("https://ror.org/006hf6230", QueryValueType.ROR),
+    ("W2741809807", QueryValueType.OPENALEX_ID),
+    ("0317-8471", QueryValueType.ISSN),
+    ("12345678", QueryValueType.PMID),
+    ("pmid: 123", QueryValueType.PMID),
+    ("not an identifier", None),
+])
+def test_detect_type(value, expected):
+    assert detect_type(value) == expected
+
+def _write_csv(tmp_path, lines: list[str]) -> str:
+    path = tmp_path / "export.csv"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+def _import(path: str, columns=None, **options) -> tuple[BulkImporter, list[SearchValue]]:
+    importer = BulkImporter(**options)
+    return importer, [value for batch in importer.iter_batches(path, columns) for value in batch]
+
+def test_all_cells_ignore_bare_numbers(tmp_path):
+    path = _write_csv(tmp_path, [
+        "row,year,volume,doi,pubmed",
+        "1,2021,12,10.1234/abc,pmid:555",
+        "2,2022,13,https://doi.org/10.1234/ABC,https://pubmed.ncbi.nlm.nih.gov/556",
+    ])
+    importer, values = _import(path)
+    assert values == [
+        SearchValue("10.1234/abc", "doi", "work"),
+        SearchValue("555", "pmid", "work"),
+        SearchValue("556", "pmid", "work"),
+    ]
+    assert importer.stats.rows == 2
+    assert importer.stats.duplicates == 1
+    assert importer.stats.unrecognized == 6
+
+def test_all_cells_without_header_row(tmp_path):
+    path = _write_csv(tmp_path, ["10.1234/abc,0000-0002-4769-5239", "10.1234/def,006hf6230"])
+    importer, values = _import(path)
+    assert importer.stats.rows == 2
+    assert [value.field for value in values] == [QueryValueType.DOI, QueryValueType.ORCID, QueryValueType.DOI, QueryValueType.ROR]
+
+def test_named_columns_read_bare_numbers_as_pmids(tmp_path):
+    path = _write_csv(tmp_path, ["id,PMID,Title", "1,123,A title", "2,124,Another title"])
+    importer, values = _import(path, columns=["pmid"])
+    assert values == [SearchValue("123", "pmid", "work"), SearchValue("124", "pmid", "work")]
+    assert importer.stats.rows == 2
+    assert importer.stats.cells == 2
+
+def test_missing_column(tmp_path):
+    path = _write_csv(tmp_path, ["id,doi", "1,10.1234/abc"])
+    with pytest.raises(ValueError):
+        _import(path, columns=["orcid"])
+
+def test_entity_types_and_batches(tmp_path):
+    path = _write_csv(tmp_path, ["ror", "006hf6230", "https://ror.org/006hf6230", "W2741809807", "A5023888391", "0000-0002-4769-5239"])
+    importer, values = _import(path, columns=[0], entity_types={QueryValueType.ROR: SearchEntityType.WORK}, batch_size=2)
+    assert [value.entity for value in values] == [SearchEntityType.WORK, SearchEntityType.WORK, SearchEntityType.AUTHOR, SearchEntityType.AUTHOR]
+    assert importer.stats.duplicates == 1
+    # the header row is read as a cell when columns are given by index
+    assert importer.stats.unrecognized == 1
+    # identifiers are deduplicated across all imports of an importer
+    assert list(importer.iter_batches(path, [0])) == []
+    assert [len(batch) for batch in BulkImporter(batch_size=2).iter_batches(path, [0])] == [2, 2]
@@ -0,0 +1,96 @@
+import types
+import pytest
+from harvesters.cache import HOUR, ResponseCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr("harvesters.cache.time", types.SimpleNamespace(time=clock.time))
+    return clock
+
+@pytest.fixture
+def cache(tmp_path, clock) -> ResponseCache:
+    return ResponseCache(str(tmp_path / "cache.sqlite"), max_bytes=10**6, default_ttl=HOUR, ttls={"short": 60})
+
+def _work(number: int, size: int = 0) -> tuple[str, list[str], dict]:
+    record_id = f"https://openalex.org/W{number}"
+    # random-looking padding, so the compressed size grows with size
+    padding = "".join(chr(33 + (number * 7919 + i * 104729) % 90) for i in range(size))
+    return record_id, [f"doi:10.1/{number}", f"id:W{number}"], {"id": record_id, "padding": padding}
+
+def test_lookup_by_any_alias(cache):
+    cache.put_many("openalex", "works", [_work(1), _work(2)])
+    found = cache.get_many("openalex", "works", ["doi:10.1/1", "id:W2", "https://openalex.org/W1", "doi:10.1/3"])
+    assert set(found) == {"doi:10.1/1", "id:W2", "https://openalex.org/W1"}
+    assert found["doi:10.1/1"]["id"] == "https://openalex.org/W1"
+    assert cache.contains_many("openalex", "works", ["id:W1", "id:W3"]) == {"id:W1"}
+    # records are separated by source and entity type
+    assert cache.get_many("openalex", "authors", ["id:W1"]) == {}
+    assert cache.get_many("other", "works", ["id:W1"]) == {}
+
+def test_records_expire_after_the_ttl_of_their_source(cache, clock):
+    cache.put_many("openalex", "works", [_work(1)])
+    cache.put_many("short", "works", [_work(1)])
+    clock.now += 61
+    assert cache.contains_many("openalex", "works", ["id:W1"]) == {"id:W1"}
+    assert cache.contains_many("short", "works", ["id:W1"]) == set()
+    # touching marks records as fresh again
+    cache.touch_many("short", "works", ["doi:10.1/1"])
+    assert cache.contains_many("short", "works", ["id:W1"]) == {"id:W1"}
+    clock.now += HOUR
+    assert cache.contains_many("openalex", "works", ["id:W1"]) == set()
+
+def test_least_recently_used_records_are_evicted(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_bytes=10**6, default_ttl=HOUR)
+    cache.put_many("openalex", "works", [_work(0, size=3000)])
+    # room for 3.5 records
+    cache.max_bytes = cache.total_bytes * 7 // 2
+    for number in range(3):
+        cache.put_many("openalex", "works", [_work(number, size=3000)])
+        clock.now += 1
+    # reading W0 makes W1 the least recently used record
+    cache.get_many("openalex", "works", ["id:W0"])
+    clock.now += 1
+    cache.put_many("openalex", "works", [_work(3, size=3000)])
+    assert cache.total_bytes <= cache.max_bytes
+    assert cache.contains_many("openalex", "works", ["id:W0", "id:W1", "id:W2", "id:W3"]) == {"id:W0", "id:W2", "id:W3"}
+
+def test_replacing_a_record_updates_the_total_size(cache):
+    cache.put_many("openalex", "works", [_work(1, size=1000)])
+    size = cache.total_bytes
+    cache.put_many("openalex", "works", [_work(1, size=1000)])
+    assert cache.total_bytes == size
+    cache.put_many("openalex", "works", [_work(1)])
+    assert cache.total_bytes < size
+
+def test_harvest_log_and_clear(cache):
+    cache.set_harvest_times("openalex", ["work:ror:006hf6230"], 123.0)
+    cache.set_harvest_records("openalex", {"work:ror:006hf6230": ["https://openalex.org/W1"], "work:doi:10.1/2": []})
+    cache.put_many("openalex", "works", [_work(1)])
+    cache.put_many("other", "works", [_work(1)])
+    assert cache.get_harvest_times("openalex", ["work:ror:006hf6230", "work:doi:10.1/3"]) == {"work:ror:006hf6230": 123.0}
+    assert cache.get_harvest_records("openalex", ["work:ror:006hf6230", "work:doi:10.1/2"]) == {
+        "work:ror:006hf6230": ["https://openalex.org/W1"], "work:doi:10.1/2": [],
+    }
+    cache.set_harvest_records("openalex", {"work:doi:10.1/2": None})
+    assert cache.get_harvest_records("openalex", ["work:doi:10.1/2"]) == {}
+
+    cache.clear("openalex")
+    assert cache.get_harvest_times("openalex", ["work:ror:006hf6230"]) == {}
+    assert cache.contains_many("openalex", "works", ["id:W1"]) == set()
+    assert cache.contains_many("other", "works", ["id:W1"]) == {"id:W1"}
+    assert cache.total_bytes > 0
+
+def test_from_settings(tmp_path):
+    assert ResponseCache.from_settings({"enabled": False}) is None
+    cache = ResponseCache.from_settings({"path": str(tmp_path / "cache.sqlite"), "max_size_mb": 1, "ttl_hours": {"openalex": 2}})
+    assert cache.max_bytes == 2**20
+    assert cache.ttl("openalex") == 2 * HOUR
+    assert cache.ttl("crossref") == 168 * HOUR
@@ -0,0 +1,53 @@
+from array import array
+import pytest
+from harvesters.citation_graph import CitationGraph
+from harvesters.openalex import OpenAlexHarvester
+from settings import Source
+
+def test_graph_from_edges():
+    # W1 cites W2 and W3 (once twice), W3 cites W2
+    graph = CitationGraph.from_edges(["W1", "W2", "W3"], array("i", [0, 0, 0, 2]), array("i", [1, 2, 2, 1]))
+    assert graph.num_nodes == 3
+    assert graph.num_edges == 3
+    assert list(graph.indptr) == [0, 2, 2, 3]
+    assert graph.references("W1") == ["W2", "W3"]
+    assert graph.references("W2") == []
+    assert list(graph.out_degree()) == [2, 0, 1]
+    assert list(graph.in_degree()) == [0, 2, 1]
+    assert sorted(graph.edges()) == [("W1", "W2"), ("W1", "W3"), ("W3", "W2")]
+    assert sorted(graph.reverse().edges()) == [("W2", "W1"), ("W2", "W3"), ("W3", "W1")]
+    assert "W3" in graph and "W4" not in graph
+
+def test_empty_graph():
+    graph = CitationGraph.from_edges(["W1"], array("i"), array("i"))
+    assert graph.num_edges == 0
+    assert graph.references("W1") == []
+
+@pytest.fixture
+def harvester(mock_api) -> OpenAlexHarvester:
+    harvester = OpenAlexHarvester(Source("openalex", True))
+    harvester.cache = None
+    return harvester
+
+def test_expand_references_doesnt_fetch_the_leaves(harvester, mock_api):
+    graph = harvester.expand_citations(["https://openalex.org/W1"], depth=1, direction="references")
+    seed = harvester._results["works"]["https://openalex.org/W1"]
+    assert sorted(graph.references("W1")) == sorted({reference.rsplit("/", 1)[1] for reference in seed["referenced_works"]})
+    assert graph.num_nodes == 1 + graph.num_edges
+    # only the seed is fetched
+    assert mock_api.stats()["requests"] == 1
+
+def test_expand_citations_doesnt_fetch_citing_works_again(harvester, mock_api):
+    graph = harvester.expand_citations(["W1"], depth=2, direction="citations")
+    # one 'cites' query for the seed, and 3 for the 120 works citing it, in batches of 50
+    assert harvester.metrics.counters["queries"] == 4
+    assert graph.num_nodes > 121
+    assert all(graph.references(work_id) == ["W1"] for work_id in graph.reverse().references("W1"))
+
+def test_expand_citations_max_works(harvester):
+    graph = harvester.expand_citations(["W1"], depth=2, direction="citations", max_works=50)
+    assert graph.num_nodes == 50
+
+def test_expand_citations_invalid_direction(harvester):
+    with pytest.raises(ValueError):
+        harvester.expand_citations(["W1"], direction="sideways")
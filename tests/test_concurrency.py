@@ -0,0 +1,57 @@
+import threading
+import time
+import pytest
+from harvesters.concurrency import TokenBucket, stream_concurrently
+
+def test_token_bucket_burst_then_rate():
+    bucket = TokenBucket(rate=50, capacity=5)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.05
+    # the next 5 tokens are refilled at 50 per second
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+
+def test_token_bucket_without_rate_limit():
+    bucket = TokenBucket(rate=0)
+    start = time.monotonic()
+    for _ in range(10_000):
+        bucket.acquire()
+    assert time.monotonic() - start < 1
+
+def test_stream_concurrently_yields_all_items_per_producer():
+    producers = [lambda index=index: (index * 10 + item for item in range(5)) for index in range(4)]
+    items = list(stream_concurrently(producers, max_workers=2))
+    assert len(items) == 20
+    for index in range(4):
+        # the items of each producer arrive in order
+        assert [item for producer, item in items if producer == index] == [index * 10 + item for item in range(5)]
+
+def test_stream_concurrently_reraises_producer_errors():
+    def failing():
+        yield 1
+        raise RuntimeError("page failed")
+
+    with pytest.raises(RuntimeError, match="page failed"):
+        list(stream_concurrently([failing, lambda: range(3)], max_workers=2))
+
+def test_stream_concurrently_buffer_is_bounded():
+    produced = []
+    lock = threading.Lock()
+
+    def producer():
+        for item in range(100):
+            with lock:
+                produced.append(item)
+            yield item
+
+    stream = stream_concurrently([producer], max_workers=1, max_buffered=4)
+    assert next(stream) == (0, 0)
+    time.sleep(0.2)
+    # the producer is blocked on the full queue instead of running ahead
+    assert len(produced) <= 1 + 4 + 1
+    # stopping early stops the producer
+    stream.close()
+    assert len(produced) < 100
@@ -0,0 +1,65 @@
+import os
+import pytest
+from harvesters.checkpoints import HarvestCheckpoint
+from harvesters.generics import SearchValue
+from harvesters.openalex import OpenAlexHarvester
+from settings import Source
+
+SEARCH_VALUES = [SearchValue("006hf6230", "ror", "work")]
+
+class _Interrupted(Exception):
+    pass
+
+def _harvester(per_page: int = 50) -> OpenAlexHarvester:
+    harvester = OpenAlexHarvester(Source("openalex", True))
+    harvester.cache = None
+    harvester.results_per_page = per_page
+    return harvester
+
+def test_checkpoint_discards_records_after_saved_state(tmp_path):
+    checkpoint = HarvestCheckpoint(str(tmp_path), "https://api.openalex.org/works?filter=a")
+    checkpoint.save_page([{"id": "W1"}, {"id": "W2"}], "cursor-2")
+    # a page that was written, but not followed by a saved state
+    with open(checkpoint.records_path, "ab") as f:
+        f.write(b'{"id": "W3"}\n{"id": ')
+
+    resumed = HarvestCheckpoint(str(tmp_path), "https://api.openalex.org/works?filter=a")
+    assert resumed.cursor == "cursor-2"
+    assert resumed.retrieved == 2
+    assert list(resumed.iter_pages(page_size=1)) == [[{"id": "W1"}], [{"id": "W2"}]]
+    assert not resumed.is_complete
+
+    other = HarvestCheckpoint(str(tmp_path), "https://api.openalex.org/works?filter=b")
+    assert other.cursor == "*"
+    assert list(other.iter_pages()) == []
+
+    resumed.remove()
+    assert not os.listdir(tmp_path)
+
+def test_deep_harvest_resumes_from_checkpoint(mock_api, tmp_path, monkeypatch):
+    save_page = HarvestCheckpoint.save_page
+    interrupted = []
+
+    def interrupt_after_two_pages(checkpoint, records, next_cursor):
+        save_page(checkpoint, records, next_cursor)
+        if checkpoint.retrieved >= 100 and not interrupted:
+            interrupted.append(checkpoint.cursor)
+            raise _Interrupted
+
+    monkeypatch.setattr(HarvestCheckpoint, "save_page", interrupt_after_two_pages)
+    with pytest.raises(_Interrupted):
+        _harvester().deep_harvest(SEARCH_VALUES, checkpoint_dir=str(tmp_path))
+    assert mock_api.stats()["requests"] == 2
+
+    mock_api.reset()
+    results = _harvester().deep_harvest(SEARCH_VALUES, checkpoint_dir=str(tmp_path))
+    assert len(results["works"]) == 120
+    # only the last page is requested again, and the checkpoint is removed when the query is complete
+    assert mock_api.stats()["requests"] == 1
+    assert not os.listdir(tmp_path)
+
+def test_deep_harvest_ignores_the_result_limit(mock_api, tmp_path):
+    harvester = _harvester(per_page=20)
+    harvester.max_results_per_query = 40
+    assert len(harvester.deep_harvest(SEARCH_VALUES, checkpoint_dir=str(tmp_path))["works"]) == 120
+    assert mock_api.stats()["requests"] == 6
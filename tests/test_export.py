@@ -0,0 +1,72 @@
+import datetime
+import pytest
+from export import ColumnarExporter, export_results
+
+pa = pytest.importorskip("pyarrow")
+
+def _work(number: int, authorships: list | None = None) -> dict:
+    return {
+        "id": f"https://openalex.org/W{number}",
+        "doi": f"https://doi.org/10.1234/{number}",
+        "title": f"Work {number}",
+        "publication_year": 2021,
+        "publication_date": "2021-03-04",
+        "open_access": {"is_oa": True, "oa_status": "gold"},
+        "primary_location": {"source": {"id": "https://openalex.org/S1", "display_name": "Journal", "host_organization": "https://openalex.org/P1"}},
+        "authorships": authorships or [],
+        "referenced_works": [f"https://openalex.org/W{number + 1000}"],
+    }
+
+AUTHORSHIP = {
+    "author_position": "first",
+    "author": {"id": "https://openalex.org/A1", "display_name": "Author", "orcid": "https://orcid.org/0000-0002-4769-5239"},
+    "institutions": [
+        {"id": "https://openalex.org/I1", "display_name": "University", "ror": "https://ror.org/006hf6230", "country_code": "NL"},
+        {"id": "https://openalex.org/I2", "display_name": "Hospital"},
+    ],
+}
+
+def _read(path: str):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet
+        return pyarrow.parquet.read_table(path)
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_all()
+
+@pytest.mark.parametrize("file_format", ColumnarExporter.FILE_FORMATS)
+def test_export_flattens_works(tmp_path, file_format):
+    records = [("works", _work(1, [AUTHORSHIP, {"author": {"id": "https://openalex.org/A2"}}])), ("works", _work(2))]
+    paths = export_results(records, str(tmp_path), file_format=file_format)
+    assert set(paths) == {"works", "authorships", "work_references"}
+
+    works = _read(paths["works"])
+    assert works.column("id").to_pylist() == ["W1", "W2"]
+    assert works.column("doi").to_pylist() == ["10.1234/1", "10.1234/2"]
+    assert works.column("publication_date").to_pylist() == [datetime.date(2021, 3, 4)] * 2
+    assert works.column("source_id").to_pylist() == ["S1", "S1"]
+    assert works.column("authors_count").to_pylist() == [2, 0]
+    assert works.column("language").to_pylist() == [None, None]
+
+    # one row per (author, institution), and one row for an author without institutions
+    authorships = _read(paths["authorships"])
+    assert authorships.column("institution_id").to_pylist() == ["I1", "I2", None]
+    assert authorships.column("institution_ror").to_pylist() == ["006hf6230", None, None]
+    assert authorships.column("orcid").to_pylist() == ["0000-0002-4769-5239", "0000-0002-4769-5239", None]
+    assert _read(paths["work_references"]).column("referenced_work_id").to_pylist() == ["W1001", "W1002"]
+
+def test_export_in_batches_from_results_dict(tmp_path):
+    results = {
+        "works": {f"W{number}": _work(number) for number in range(25)},
+        "institutions": {"I1": {"id": "https://openalex.org/I1", "ror": "https://ror.org/006hf6230", "geo": {"city": "Utrecht"}}},
+        "unknown": {"X1": {"id": "X1"}},
+    }
+    paths = export_results(results, str(tmp_path), batch_size=10)
+    assert "unknown" not in paths
+    assert _read(paths["works"]).num_rows == 25
+    institutions = _read(paths["institutions"]).to_pylist()
+    assert institutions[0]["ror"] == "006hf6230"
+    assert institutions[0]["city"] == "Utrecht"
+
+def test_invalid_file_format(tmp_path):
+    with pytest.raises(ValueError):
+        ColumnarExporter(str(tmp_path), file_format="csv")
@@ -0,0 +1,55 @@
+import pytest
+from harvesters.generics import SearchValue
+from harvesters.openalex import OpenAlexHarvester, _referenced_ids
+from settings import Source
+
+DOIS = [f"10.5555/hydrate.{i}" for i in range(10)]
+
+@pytest.fixture
+def harvester(mock_api) -> OpenAlexHarvester:
+    harvester = OpenAlexHarvester(Source("openalex", True))
+    harvester.cache = None
+    harvester.search_values = [SearchValue(doi, "doi", "work") for doi in DOIS]
+    harvester.get_results()
+    mock_api.reset()
+    return harvester
+
+def _short_ids(records, path: str) -> set[str]:
+    return {openalex_id for record in records for openalex_id in _referenced_ids(record, path.split("."))}
+
+def _result_ids(harvester: OpenAlexHarvester, entity_key: str) -> set[str]:
+    return {record_id.rsplit("/", 1)[1] for record_id in harvester._results[entity_key]}
+
+def test_hydrate_requests_each_entity_once(harvester, mock_api):
+    works = list(harvester._results["works"].values())
+    authors = _short_ids(works, "authorships.author")
+    sources = _short_ids(works, "primary_location.source")
+    hydrated = harvester.hydrate(["author", "source"], depth=1)
+    assert hydrated == {"authors": len(authors), "sources": len(sources)}
+    assert _result_ids(harvester, "authors") == authors
+    assert _result_ids(harvester, "sources") == sources
+    # the IDs of each entity type are packed into a single OR-filter
+    assert mock_api.stats()["requests"] == 2
+    assert harvester.metrics.counters["hydrated"] == len(authors) + len(sources)
+
+    # entities that are already in the results are not requested again
+    mock_api.reset()
+    harvester.hydrate(["author", "source"], depth=1)
+    assert mock_api.stats()["requests"] == 0
+
+def test_hydrate_whitelist_and_depth(harvester):
+    assert harvester.hydrate(["author"], depth=1).keys() == {"authors"}
+    assert not harvester._results["institutions"]
+
+    # the institutions of the authors' affiliations are only hydrated in the second step
+    authors = list(harvester._results["authors"].values())
+    institutions = _short_ids(authors, "affiliations.institution") - _short_ids(harvester._results["works"].values(), "authorships.institutions")
+    harvester.hydrate(["author", "institution"], depth=2)
+    assert institutions
+    assert institutions <= _result_ids(harvester, "institutions")
+
+def test_hydrate_without_results(mock_api):
+    harvester = OpenAlexHarvester(Source("openalex", True))
+    harvester.cache = None
+    assert harvester.hydrate() == {}
+    assert mock_api.stats()["requests"] == 0
@@ -0,0 +1,46 @@
+import pytest
+from harvesters.generics import QueryValueType, SearchEntityType, SearchValue
+from harvesters.identifiers import InvalidIdentifierError, canonicalize, issn_checksum, orcid_checksum, ror_checksum
+
+@pytest.mark.parametrize(("field", "value", "expected"), [
+    ("doi", "https://doi.org/10.1234/ABC", "10.1234/abc"),
+    ("doi", "doi: 10.1234/abc", "10.1234/abc"),
+    ("doi", "http://dx.doi.org/10.1234/abc", "10.1234/abc"),
+    ("orcid", "https://orcid.org/0000-0002-4769-5239", "0000-0002-4769-5239"),
+    ("orcid", "0000000247695239", "0000-0002-4769-5239"),
+    ("ror", "https://ror.org/006hf6230", "006hf6230"),
+    ("ror", "006HF6230", "006hf6230"),
+    ("issn", "0317-8471", "0317-8471"),
+    ("issn", "issn 03178471", "0317-8471"),
+    ("pmid", "https://pubmed.ncbi.nlm.nih.gov/00123456/", "123456"),
+    ("pmid", "pmid:123456", "123456"),
+    ("openalex_id", "https://openalex.org/works/w2741809807", "W2741809807"),
+    ("openalex_id", "https://api.openalex.org/A5023888391", "A5023888391"),
+    ("id", "not-an-openalex-id", "not-an-openalex-id"),
+    ("name", "  Some   name ", "Some name"),
+])
+def test_canonicalize(field, value, expected):
+    assert canonicalize(field, value) == expected
+
+@pytest.mark.parametrize(("field", "value"), [
+    ("doi", "11.1234/abc"),
+    ("orcid", "0000-0002-4769-5238"),
+    ("ror", "006hf6231"),
+    ("issn", "0317-8472"),
+    ("pmid", "abc"),
+    ("openalex_id", "X123"),
+])
+def test_canonicalize_rejects_invalid_identifiers(field, value):
+    with pytest.raises(InvalidIdentifierError):
+        canonicalize(field, value)
+
+def test_checksums():
+    assert orcid_checksum("000000024769523") == "9"
+    assert ror_checksum("006hf62") == "30"
+    assert issn_checksum("0317847") == "1"
+
+def test_search_values_with_equal_identifiers_are_equal():
+    first = SearchValue("https://doi.org/10.1/ABC", "doi", "work")
+    second = SearchValue("doi:10.1/abc", QueryValueType.DOI, SearchEntityType.WORK)
+    assert first == second
+    assert len({first, second}) == 1
@@ -0,0 +1,78 @@
+import os
+import pytest
+from harvesters.cache import HOUR, ResponseCache
+from harvesters.generics import SearchValue
+from harvesters.openalex import OpenAlexHarvester
+from settings import Source
+
+ROR = "006hf6230"
+DOIS = [f"10.5555/refresh.{i}" for i in range(20)]
+
+@pytest.fixture
+def server(mock_api):
+    return mock_api
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return os.path.join(tmp_path, "cache.sqlite")
+
+def _harvester(cache_path: str, search_values: list[SearchValue]) -> OpenAlexHarvester:
+    """A new harvester on the cache at cache_path, like one of a new run of the app"""
+    harvester = OpenAlexHarvester(Source("openalex", True, requests_per_second=0))
+    harvester.cache = ResponseCache(cache_path, max_bytes=2**30, default_ttl=HOUR)
+    harvester.max_results_per_query = None
+    harvester.search_values = search_values
+    return harvester
+
+def _ids(results) -> set[str]:
+    return set(results.get("works", {}))
+
+def test_refresh_in_new_harvester_keeps_unchanged_records(server, cache_path):
+    search_values = [SearchValue(ROR, "ror", "work"), *(SearchValue(doi, "doi", "work") for doi in DOIS)]
+    full = _ids(_harvester(cache_path, search_values).get_results())
+    assert len(full) == 120 + len(DOIS)
+
+    server.reset()
+    refreshed = _ids(_harvester(cache_path, search_values).incremental_refresh())
+    assert refreshed == full
+    # only the changed records are retrieved: one page of the ROR works, and one of the DOIs
+    assert server.stats()["records"] < len(full) / 2
+
+def test_refresh_in_new_harvester_twice(server, cache_path):
+    search_values = [SearchValue(ROR, "ror", "work")]
+    full = _ids(_harvester(cache_path, search_values).get_results())
+    _harvester(cache_path, search_values).incremental_refresh()
+    assert _ids(_harvester(cache_path, search_values).incremental_refresh()) == full
+
+def test_refresh_without_known_records_retrieves_in_full(server, cache_path):
+    search_values = [SearchValue(ROR, "ror", "work")]
+    harvester = _harvester(cache_path, search_values)
+    full = _ids(harvester.get_results())
+    # a harvest log without record ids, e.g. written before these were stored
+    harvester.cache.set_harvest_records("openalex", {harvester._harvest_key(search_values[0]): None})
+
+    server.reset()
+    assert _ids(_harvester(cache_path, search_values).incremental_refresh()) == full
+    assert server.stats()["records"] >= len(full)
+
+def test_refresh_of_evicted_records_retrieves_in_full(server, cache_path):
+    search_values = [SearchValue(ROR, "ror", "work")]
+    harvester = _harvester(cache_path, search_values)
+    full = _ids(harvester.get_results())
+    harvester.cache.clear()
+    harvester.cache.set_harvest_times("openalex", [harvester._harvest_key(search_values[0])], 0)
+    harvester.cache.set_harvest_records("openalex", {harvester._harvest_key(search_values[0]): sorted(full)})
+
+    assert _ids(_harvester(cache_path, search_values).incremental_refresh()) == full
+
+def test_manager_reports_only_refreshed_records(server, cache_path):
+    from harvester_manager import HarvesterManager
+
+    search_values = [SearchValue(ROR, "ror", "work")]
+    full = _ids(_harvester(cache_path, search_values).get_results())
+    manager = HarvesterManager()
+    manager.harvesters = {"openalex": _harvester(cache_path, search_values)}
+    reported = {}
+    results = manager.harvest(progress=lambda name, status, retrieved: reported.update({status: retrieved}), incremental=True)
+    assert len(results["works"]) == len(full)
+    assert 0 < reported["done"] < len(full) / 2
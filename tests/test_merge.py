@@ -0,0 +1,72 @@
+import pytest
+from harvesters.merge import RecordMerger, _UnionFind, normalize_title
+
+def test_union_find_chains():
+    sets = _UnionFind()
+    nodes = [sets.add() for _ in range(5)]
+    assert sets.union(nodes[0], nodes[1])
+    assert sets.union(nodes[2], nodes[1])
+    assert not sets.union(nodes[0], nodes[2])
+    assert sets.find(nodes[0]) == sets.find(nodes[2])
+    assert sets.find(nodes[3]) != sets.find(nodes[0])
+    assert sets.find(nodes[4]) == nodes[4]
+
+@pytest.mark.parametrize(("title", "expected"), [
+    ("The Café: a Study!", "the cafe a study"),
+    ("  Spaces -- and   dashes ", "spaces and dashes"),
+    (None, ""),
+])
+def test_normalize_title(title, expected):
+    assert normalize_title(title) == expected
+
+def _merged(merger: RecordMerger, entity_key: str = "works") -> list:
+    return sorted(merger.merge(entity_key), key=lambda merged: merged.key)
+
+def test_identifier_chain_is_merged_with_priority_and_provenance():
+    merger = RecordMerger(source_priority=["openalex", "crossref"])
+    merger.add("crossref", "works", {"title": "From Crossref", "volume": "12", "abstract": ""}, "c1", ["doi:10.1234/abc"])
+    merger.add("openalex", "works", {"title": "From OpenAlex", "abstract": None}, "W1", ["doi:10.1234/abc", "pmid:555"])
+    merger.add("pubmed", "works", {"title": "From PubMed", "abstract": "Text"}, "p1", ["pmid:555"])
+    merger.add("crossref", "works", {"title": "Unrelated"}, "c2", ["doi:10.1234/other"])
+
+    merged, unrelated = _merged(merger)
+    assert unrelated.key == "doi:10.1234/other"
+    assert merged.key == "doi:10.1234/abc"
+    assert merged.match == "identifier"
+    assert merged.sources == {"openalex": ["W1"], "crossref": ["c1"], "pubmed": ["p1"]}
+    assert merged.fields == {"title": "From OpenAlex", "abstract": "Text", "volume": "12"}
+    # empty values are filled in from the next source that has a value
+    assert merged.provenance == {"title": "openalex", "abstract": "pubmed", "volume": "crossref"}
+
+def test_source_ids_are_not_shared_across_sources():
+    merger = RecordMerger(fuzzy=False)
+    merger.add("openalex", "authors", {"display_name": "A"}, "1", [])
+    merger.add("crossref", "authors", {"display_name": "B"}, "1", [])
+    assert len(_merged(merger, "authors")) == 2
+
+def _title_merger(**options) -> RecordMerger:
+    merger = RecordMerger(**options)
+    merger.add("openalex", "works", {"title": "Deep harvesting of bibliographic metadata", "publication_year": 2020}, "W1", [])
+    merger.add("crossref", "works", {"title": ["Deep Harvesting of Bibliographic Metadata."], "publication_year": 2021}, "c1", [])
+    merger.add("crossref", "works", {"title": "Deep harvesting of bibliographic metadata", "publication_year": 2023}, "c2", [])
+    merger.add("crossref", "works", {"title": "Shallow parsing of unrelated metadata", "publication_year": 2020}, "c3", [])
+    return merger
+
+def test_fuzzy_title_match_within_one_year():
+    groups = {tuple(sorted(sum(merged.sources.values(), []))): merged.match for merged in _title_merger().merge("works")}
+    assert groups == {("W1", "c1"): "fuzzy", ("c2",): "identifier", ("c3",): "identifier"}
+
+def test_fuzzy_matching_can_be_disabled():
+    assert len(list(_title_merger(fuzzy=False).merge("works"))) == 4
+
+def test_fuzzy_matching_skips_records_with_shared_identifier_types():
+    merger = RecordMerger()
+    merger.add("openalex", "works", {"title": "Same title", "publication_year": 2020}, "W1", ["doi:10.1234/a"])
+    merger.add("crossref", "works", {"title": "Same title", "publication_year": 2020}, "c1", ["doi:10.1234/b"])
+    assert len(list(merger.merge("works"))) == 2
+
+def test_merge_all_and_unknown_entity():
+    merger = RecordMerger()
+    merger.add("openalex", "institutions", {"display_name": "Utrecht University"}, "I1", ["ror:04pp8hn57"])
+    assert list(merger.merge_all()) == ["institutions"]
+    assert list(merger.merge("works")) == []
@@ -0,0 +1,69 @@
+import json
+import threading
+import pytest
+from harvesters.metrics import Metrics, MetricsRegistry
+
+def _metrics() -> Metrics:
+    metrics = Metrics({"source": "openalex"})
+    metrics.increment("requests", 3)
+    metrics.increment("cache_hits")
+    metrics.increment("cache_misses", 3)
+    metrics.observe("page", 0.5)
+    metrics.observe("page", 1.5)
+    return metrics
+
+def test_counters_and_spans():
+    metrics = _metrics()
+    with metrics.span("query"):
+        pass
+    data = metrics.as_dict()
+    assert data["labels"] == {"source": "openalex"}
+    assert data["counters"] == {"requests": 3, "cache_hits": 1, "cache_misses": 3}
+    assert data["spans"]["page"] == {"count": 2, "total_seconds": 2.0, "mean_seconds": 1.0, "max_seconds": 1.5}
+    assert data["spans"]["query"]["count"] == 1
+    assert data["cache_hit_rate"] == 0.25
+    assert json.loads(metrics.to_json()) == data
+
+    metrics.reset()
+    assert metrics.as_dict() == {"labels": {"source": "openalex"}, "counters": {}, "spans": {}, "cache_hit_rate": None}
+
+def test_increment_from_threads():
+    metrics = Metrics()
+    threads = [threading.Thread(target=lambda: [metrics.increment("records") for _ in range(1000)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert metrics.counters["records"] == 8000
+
+def test_prometheus_output_groups_families():
+    other = Metrics({"source": 'cross"ref'})
+    other.increment("requests")
+    text = MetricsRegistry([_metrics(), other]).to_prometheus()
+    lines = text.splitlines()
+    assert text.endswith("\n")
+    # one TYPE line per family, followed by the samples of all components
+    assert lines.count("# TYPE harvester_requests_total counter") == 1
+    start = lines.index("# TYPE harvester_requests_total counter")
+    assert lines[start + 1:start + 3] == ['harvester_requests_total{source="openalex"} 3', 'harvester_requests_total{source="cross\\"ref"} 1']
+    assert "# TYPE harvester_page_seconds summary" in lines
+    assert 'harvester_page_seconds_count{source="openalex"} 2' in lines
+    assert 'harvester_page_seconds_sum{source="openalex"} 2.0' in lines
+    assert 'harvester_page_seconds_max{source="openalex"} 1.5' in lines
+    assert 'harvester_cache_hit_ratio{source="openalex"} 0.25' in lines
+    # no cache lookups: no hit ratio
+    assert 'harvester_cache_hit_ratio{source="cross\\"ref"}' not in text
+
+def test_prometheus_without_labels():
+    metrics = Metrics()
+    metrics.increment("pages")
+    assert metrics.to_prometheus(prefix="app") == "# TYPE app_pages_total counter\napp_pages_total 1\n"
+
+def test_dump(tmp_path):
+    registry = MetricsRegistry([_metrics()])
+    registry.dump(str(tmp_path / "metrics.json"))
+    assert json.loads((tmp_path / "metrics.json").read_text()) == registry.as_dict()
+    registry.dump(str(tmp_path / "metrics.prom"), "prometheus")
+    assert (tmp_path / "metrics.prom").read_text() == registry.to_prometheus()
+    with pytest.raises(ValueError):
+        registry.dump(str(tmp_path / "metrics.csv"), "csv")
@@ -0,0 +1,53 @@
+import gzip
+import json
+import os
+from harvesters.openalex_snapshot import EXTRACTORS, _init_worker, _scan_partition, scan_snapshot
+
+WORK_WITH_DOI = {
+    "id": "https://openalex.org/W1",
+    "doi": "https://doi.org/10.1234/ABC",
+    "ids": {"pmid": "https://pubmed.ncbi.nlm.nih.gov/123"},
+    "authorships": [{"author": {"orcid": "https://orcid.org/0000-0002-4769-5239"}, "institutions": [{"ror": "https://ror.org/006hf6230"}]}],
+    "locations": [{"source": {"issn": ["0317-8471"]}}],
+}
+WORK_WITHOUT_DOI = {"id": "https://openalex.org/W2", "doi": None, "authorships": [{"author": {}, "institutions": []}]}
+
+def _write_partition(snapshot_dir, records: list[dict]) -> str:
+    partition_dir = os.path.join(snapshot_dir, "data", "works", "updated_date=2024-01-01")
+    os.makedirs(partition_dir)
+    path = os.path.join(partition_dir, "part_000.gz")
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    return path
+
+def test_work_extractors():
+    extractors = EXTRACTORS["works"]
+    assert tuple(extractors["id"](WORK_WITH_DOI)) == ("W1",)
+    assert tuple(extractors["doi"](WORK_WITH_DOI)) == ("10.1234/abc",)
+    assert tuple(extractors["pmid"](WORK_WITH_DOI)) == ("123",)
+    assert tuple(extractors["orcid"](WORK_WITH_DOI)) == ("0000-0002-4769-5239",)
+    assert tuple(extractors["ror"](WORK_WITH_DOI)) == ("006hf6230",)
+    assert tuple(extractors["issn"](WORK_WITH_DOI)) == ("0317-8471",)
+
+def test_work_extractors_without_identifiers():
+    extractors = EXTRACTORS["works"]
+    assert tuple(extractors["doi"](WORK_WITHOUT_DOI)) == (None,)
+    assert tuple(extractors["doi"]({"id": "https://openalex.org/W3"})) == (None,)
+    assert tuple(extractors["pmid"](WORK_WITHOUT_DOI)) == (None,)
+    assert tuple(extractors["orcid"](WORK_WITHOUT_DOI)) == (None,)
+    assert tuple(extractors["ror"](WORK_WITHOUT_DOI)) == ()
+
+def test_scan_partition_with_doi_less_record(tmp_path):
+    path = _write_partition(tmp_path, [WORK_WITHOUT_DOI, WORK_WITH_DOI])
+    _init_worker({"doi": {"10.1234/abc"}}, ["id", "doi"])
+    try:
+        matches = _scan_partition(path, "works")
+    finally:
+        _init_worker({}, None)
+    assert matches == [{"id": "https://openalex.org/W1", "doi": "https://doi.org/10.1234/ABC"}]
+
+def test_scan_snapshot(tmp_path):
+    _write_partition(tmp_path, [WORK_WITHOUT_DOI, WORK_WITH_DOI])
+    pages = list(scan_snapshot(str(tmp_path), "works", {"doi": {"10.1234/abc"}, "id": {"W2"}}, max_workers=1))
+    assert sorted(record["id"] for page in pages for record in page) == ["https://openalex.org/W1", "https://openalex.org/W2"]
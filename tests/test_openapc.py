@@ -0,0 +1,77 @@
+import os
+import pytest
+from harvesters.openapc import OpenAPCDataset
+
+HEADER = "institution,period,euro,doi,is_hybrid,publisher,journal_full_title,issn,issn_print,issn_electronic,issn_l"
+ROWS = [
+    "Utrecht University,2020,1000,10.1234/a,FALSE,Elsevier BV,Journal A,0317-8471,0317-8471,NA,0317-8471",
+    "Utrecht University,2020,2000,https://doi.org/10.1234/B,FALSE,Elsevier,Journal A,0317-8471,0317-8471,NA,0317-8471",
+    "Leiden University,2021,3000.5,10.1234/c,TRUE,Elsevier,Journal A,0317-8471,0317-8471,NA,0317-8471",
+    "Leiden University,2021,1500,NA,FALSE,Springer Nature,Journal B,1476-4687,NA,1476-4687,1476-4687",
+    "Leiden University,not a year,999,10.1234/skipped,FALSE,Springer Nature,Journal B,1476-4687,NA,1476-4687,1476-4687",
+]
+
+@pytest.fixture
+def dataset(tmp_path) -> OpenAPCDataset:
+    csv_path = tmp_path / "apc_de.csv"
+    csv_path.write_text("\n".join([HEADER, *ROWS]) + "\n", encoding="utf-8")
+    return OpenAPCDataset.open(str(tmp_path / "converted"), str(csv_path), url="http://invalid")
+
+def test_convert_to_mapped_columns(dataset):
+    assert dataset.rows == 4
+    assert all(os.path.exists(os.path.join(dataset.directory, f"{name}.bin")) for name in ("euro", "period", "journal"))
+    assert isinstance(dataset._columns["euro"], memoryview)
+    assert list(dataset._columns["euro"]) == [1000, 2000, 3000.5, 1500]
+    assert dataset.record(2) == {
+        "id": "10.1234/c",
+        "doi": "10.1234/c",
+        "apc_eur": 3000.5,
+        "period": 2021,
+        "is_hybrid": True,
+        "institution": "Leiden University",
+        "publisher": "Elsevier",
+        "journal_full_title": "Journal A",
+        "issn": "0317-8471",
+        "issn_print": "0317-8471",
+        "issn_electronic": None,
+        "issn_l": "0317-8471",
+    }
+
+def test_open_reuses_conversion(dataset, tmp_path, monkeypatch):
+    def convert(*args):
+        raise AssertionError("converted again")
+
+    monkeypatch.setattr(OpenAPCDataset, "convert", convert)
+    assert OpenAPCDataset.open(dataset.directory, str(tmp_path / "apc_de.csv")).rows == 4
+
+def test_lookups_and_medians(dataset):
+    assert set(dataset.lookup_dois(["10.1234/a", "10.1234/b", "10.1234/missing"])) == {"10.1234/a", "10.1234/b"}
+    assert dataset.journal_median("0317-8471") == (2000, 3)
+    assert dataset.journal_median("0317-8471", 2020) == (1500, 2)
+    assert dataset.journal_median("1476-4687", 2019) is None
+    # publishers are grouped by their normalized name
+    assert dataset.publisher_median("Elsevier B.V.") == (2000, 3)
+    assert dataset.publisher_median("Unknown publisher") is None
+
+def test_estimate_apcs(dataset):
+    estimates = dataset.estimate_apcs([
+        {"doi": "10.1234/c"},
+        {"issn": "0317-8471", "year": 2021},
+        {"issn": "1476-4687", "year": 2019},
+        {"issn": "0000-0000", "publisher": "Elsevier", "year": 2020},
+        {"publisher": "Unknown publisher"},
+    ])
+    assert estimates == [
+        {"apc_eur": 3000.5, "basis": "doi", "n": 1},
+        {"apc_eur": 3000.5, "basis": "journal_year", "n": 1},
+        {"apc_eur": 1500, "basis": "journal", "n": 1},
+        {"apc_eur": 1500, "basis": "publisher_year", "n": 2},
+        None,
+    ]
+
+def test_journal_summary(dataset):
+    summary = dataset.journal_summary("0317-8471")
+    assert summary["apc_eur_median"] == 2000
+    assert summary["apc_eur_median_by_year"] == {2020: 1500, 2021: 3000.5}
+    assert dataset.journal_summary("1476-4687")["n"] == 1
+    assert dataset.journal_summary("0000-0000") is None
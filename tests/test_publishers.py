@@ -0,0 +1,34 @@
+import pytest
+from harvesters.publishers import normalize_publisher, normalize_record_publishers
+
+@pytest.mark.parametrize(("name", "expected"), [
+    ("Elsevier BV", "elsevier"),
+    ("Elsevier B.V.", "elsevier"),
+    ("Cell Press", "elsevier"),
+    ("Springer Science and Business Media LLC", "springer nature"),
+    ("Wiley-Blackwell", "wiley"),
+    ("SAGE Publications", "sage publications"),
+])
+def test_normalize_publisher_variants(name, expected):
+    assert normalize_publisher(name) == expected
+
+def test_company_suffixes_are_only_removed_as_separate_words():
+    assert normalize_publisher("Co-Action Publishing") == "co-action publishing"
+    assert normalize_publisher("Acme Publishing Co.") == "acme publishing"
+    assert normalize_publisher("Inca Press Ltd") == "inca press"
+
+def test_publisher_variants_must_be_whole_words():
+    assert normalize_publisher("Sagebrush Press") == "sagebrush press"
+    assert normalize_publisher("Wileyville University Press") == "wileyville university press"
+
+def test_normalize_record_publishers_keeps_original_names():
+    record = {
+        "host_organization_name": "Elsevier BV",
+        "primary_location": {"source": {"host_organization_name": "Springer Nature"}},
+        "locations": [{"source": {"publisher": "Wiley"}}, {"source": None}],
+    }
+    normalize_record_publishers(record)
+    assert record["host_organization_name"] == "Elsevier BV"
+    assert record["publisher_normalized"] == "elsevier"
+    assert record["primary_location"]["source"] == {"host_organization_name": "Springer Nature", "publisher_normalized": "springer nature"}
+    assert record["locations"][0]["source"] == {"publisher": "Wiley", "publisher_normalized": "wiley"}
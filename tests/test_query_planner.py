@@ -0,0 +1,40 @@
+from urllib.parse import quote_plus
+import pytest
+from harvesters.generics import SearchValue
+from harvesters.openalex import OpenAlexHarvester
+from harvesters.query_planner import pack_values
+from settings import Source
+
+def _length(batch: tuple[str, ...]) -> int:
+    return len(quote_plus("|".join(batch)))
+
+def test_pack_values_by_count():
+    values = [str(number) for number in range(250)]
+    batches = list(pack_values(values, max_values=100, max_bytes=4000))
+    assert [len(batch) for batch in batches] == [100, 100, 50]
+    assert [value for batch in batches for value in batch] == values
+
+def test_pack_values_by_encoded_length():
+    dois = [f"10.1234/a long doi with spaces {number}" for number in range(40)]
+    batches = list(pack_values(dois, max_values=100, max_bytes=300))
+    assert len(batches) > 1
+    assert all(_length(batch) <= 300 for batch in batches)
+    # every batch is filled as far as the limit allows
+    assert all(_length((*batch, next_batch[0])) > 300 for batch, next_batch in zip(batches, batches[1:]))
+    assert [value for batch in batches for value in batch] == dois
+
+@pytest.mark.parametrize(("values", "expected"), [
+    ([], []),
+    (["x" * 50], [("x" * 50,)]),
+    (["a", "x" * 50, "b"], [("a",), ("x" * 50,), ("b",)]),
+])
+def test_pack_values_oversized_values_get_own_batch(values, expected):
+    assert list(pack_values(values, max_values=10, max_bytes=20)) == expected
+
+def test_harvester_packs_identifier_lookups(mock_api):
+    harvester = OpenAlexHarvester(Source("openalex", True))
+    harvester.cache = None
+    harvester.max_or_values = 40
+    harvester.search_values = [SearchValue(f"10.5555/packed.{number}", "doi", "work") for number in range(100)]
+    assert len(harvester.get_results()["works"]) == 100
+    assert mock_api.stats()["requests"] == 3
@@ -0,0 +1,76 @@
+import pytest
+from harvesters.record_store import RecordStore
+
+WORK = {
+    "id": "https://openalex.org/W1",
+    "doi": "https://doi.org/10.1/abc",
+    "title": "A work",
+    "publication_year": 2021,
+    "type": "article",
+    "cited_by_count": 12,
+    "is_retracted": False,
+    "authorships": [{"author": {"display_name": "Author 1"}}],
+    "open_access": {"is_oa": True, "oa_status": "gold"},
+}
+
+def test_round_trip():
+    store = RecordStore("works")
+    store[WORK["id"]] = WORK
+    record = store[WORK["id"]]
+    assert record == WORK
+    assert record.to_dict() == WORK
+    assert set(record) == set(WORK)
+    assert len(record) == len(WORK)
+    assert record["publication_year"] == 2021
+    assert record["is_retracted"] is False
+    assert record["authorships"][0]["author"]["display_name"] == "Author 1"
+    assert "language" not in record
+    with pytest.raises(KeyError):
+        record["language"]
+
+def test_values_that_dont_fit_their_column():
+    store = RecordStore("works")
+    # None, a too large number, a string instead of a number, and a boolean instead of a number
+    work = {**WORK, "doi": None, "cited_by_count": 2**40, "publication_year": "2021", "is_retracted": None, "language": True}
+    store["w"] = work
+    assert store["w"].to_dict() == work
+
+def test_replace_delete_and_reuse():
+    store = RecordStore("works")
+    store["a"] = WORK
+    store["b"] = {**WORK, "title": "B"}
+    store["a"] = {"id": "a", "title": "Replaced"}
+    assert store["a"].to_dict() == {"id": "a", "title": "Replaced"}
+    del store["b"]
+    assert "b" not in store and len(store) == 1
+    # the row of the deleted record is reused
+    store["c"] = {"id": "c", "publication_year": 1999}
+    assert len(store._blobs) == 2
+    assert store["c"].to_dict() == {"id": "c", "publication_year": 1999}
+    assert list(store) == ["a", "c"]
+
+def test_merge_and_column():
+    first, second = RecordStore("works"), RecordStore("works")
+    first["a"] = WORK
+    second["a"] = {**WORK, "publication_year": 2022}
+    second["b"] = {"id": "b"}
+    first.merge(second)
+    assert dict(first.column("publication_year")) == {"a": 2022}
+    assert first["b"].to_dict() == {"id": "b"}
+    # stores with other hot fields are merged record by record
+    other = RecordStore("authors")
+    other["c"] = {"id": "c", "display_name": "C", "publication_year": 2000}
+    first.merge(other)
+    assert dict(first.column("publication_year")) == {"a": 2022, "c": 2000}
+    with pytest.raises(KeyError):
+        dict(first.column("authorships"))
+
+def test_stored_records_can_be_stored_again():
+    store, copy = RecordStore("works"), RecordStore("sources")
+    store["a"] = WORK
+    copy["a"] = store["a"]
+    assert copy["a"] == WORK
+
+def test_too_many_hot_fields():
+    with pytest.raises(ValueError):
+        RecordStore(hot_fields={f"field{i}": "i" for i in range(33)})
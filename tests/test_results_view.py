@@ -0,0 +1,83 @@
+import pytest
+from results_view import MISSING, ResultsView
+
+def _work(number: int, year: int | None = 2020, oa_status: str | None = "gold", title: str = "A work") -> dict:
+    return {
+        "id": f"https://openalex.org/W{number}",
+        "title": title,
+        "publication_year": year,
+        "open_access": {"oa_status": oa_status} if oa_status else None,
+        "type": "article",
+    }
+
+@pytest.fixture
+def view() -> ResultsView:
+    view = ResultsView()
+    view.extend([
+        ("openalex", "works", _work(1, 2020, "gold", "Climate models")),
+        ("openalex", "works", _work(2, 2021, "closed")),
+        ("openalex", "works", _work(3, None, "gold", "Climate data")),
+        ("openalex", "works", _work(4, 2020, None)),
+    ])
+    return view
+
+def _ids(rows: list[dict]) -> list[str]:
+    return [row["id"] for row in rows]
+
+def test_summary_and_count(view):
+    assert view.count() == 4
+    assert view.count("works") == 4
+    assert view.count("authors") == 0
+    assert dict(view.summary("works", "year")) == {2020: 2, 2021: 1, MISSING: 1}
+    assert view.summary("works", "oa_status", top=1) == [("gold", 2)]
+
+def test_filters_search_and_paging(view):
+    rows, total = view.page("works", filters={"year": 2020, "oa_status": "gold"})
+    assert (_ids(rows), total) == (["https://openalex.org/W1"], 1)
+    assert view.count("works", filters={"oa_status": "gold"}, search="climate") == 2
+    # None selects all values
+    assert view.count("works", filters={"year": None}) == 4
+    rows, total = view.page("works", page=1, page_size=3)
+    assert (_ids(rows), total) == (["https://openalex.org/W4"], 4)
+    with pytest.raises(ValueError):
+        view.page("works", filters={"language": "en"})
+
+def test_missing_values_can_be_selected_and_excluded(view):
+    assert _ids(view.page("works", filters={"year": MISSING})[0]) == ["https://openalex.org/W3"]
+    assert _ids(view.page("works", filters={"oa_status": MISSING})[0]) == ["https://openalex.org/W4"]
+    assert view.count("works", exclude={"year": MISSING}) == 3
+    assert _ids(view.page("works", exclude={"oa_status": "gold", "year": MISSING})[0]) == ["https://openalex.org/W2", "https://openalex.org/W4"]
+
+def test_updated_record_moves_between_values(view):
+    view.add("openalex", "works", _work(1, 2021, "closed"))
+    view.add("openalex", "works", _work(2, 2020, "closed"))
+    assert view.count("works") == 4
+    assert dict(view.summary("works", "year")) == {2020: 2, 2021: 1, MISSING: 1}
+    assert _ids(view.page("works", filters={"year": 2020})[0]) == ["https://openalex.org/W2", "https://openalex.org/W4"]
+    assert _ids(view.page("works", filters={"year": 2021})[0]) == ["https://openalex.org/W1"]
+    # and back again: the record is listed once, in its original position
+    view.add("openalex", "works", _work(1, 2020, "gold"))
+    assert _ids(view.page("works", filters={"year": 2020})[0]) == ["https://openalex.org/W1", "https://openalex.org/W2", "https://openalex.org/W4"]
+
+def test_remove(view):
+    view.remove("works", "https://openalex.org/W1")
+    view.remove("works", "https://openalex.org/W3")
+    assert view.count("works") == 2
+    assert dict(view.summary("works", "year")) == {2020: 1, 2021: 1}
+    assert view.summary("works", "oa_status") == [("closed", 1), (MISSING, 1)]
+    assert _ids(view.page("works")[0]) == ["https://openalex.org/W2", "https://openalex.org/W4"]
+    assert _ids(view.page("works", filters={"year": 2020})[0]) == ["https://openalex.org/W4"]
+    assert view.page("works", filters={"year": MISSING}) == ([], 0)
+    with pytest.raises(KeyError):
+        view.remove("works", "https://openalex.org/W1")
+    # a removed record can be added again
+    view.add("openalex", "works", _work(1))
+    assert view.count("works", filters={"year": 2020}) == 2
+
+def test_record_and_columns(view):
+    rows, _ = view.page("works", page_size=1)
+    assert rows[0] == {
+        "source": "openalex", "id": "https://openalex.org/W1", "doi": None, "title": "Climate models", "year": 2020,
+        "type": "article", "oa_status": "gold", "publisher": None, "cited_by_count": None,
+    }
+    assert view.record("works", "https://openalex.org/W2")["publication_year"] == 2021
@@ -0,0 +1,87 @@
+import time
+import pytest
+from harvesters.metrics import Metrics
+from harvesters.transport import CircuitBreaker, CircuitOpenError, HostPolicy, HttpTransport, retry_after
+
+HOST = "api.example.org"
+URL = f"https://{HOST}/works"
+
+class _Response:
+    def __init__(self, status_code: int, headers: dict | None = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = b"{}"
+
+def _transport(responses: list[_Response], **policy) -> tuple[HttpTransport, list[float]]:
+    """A transport whose session returns the given responses in order, and the times at which requests were sent"""
+    transport = HttpTransport(HostPolicy(backoff_factor=0.001, **policy))
+    sent = []
+
+    def request(method, url, **kwargs):
+        sent.append(time.monotonic())
+        return responses.pop(0)
+
+    transport._host(HOST).session.request = request
+    return transport, sent
+
+@pytest.mark.parametrize(("headers", "expected"), [
+    ({"Retry-After": "3"}, 3.0),
+    ({"Retry-After": "1.5"}, 1.5),
+    ({"Retry-After": "Thu, 01 Jan 1970 00:01:40 GMT"}, 60.0),
+    ({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "7"}, 7.0),
+    ({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "2000000010"}, 10.0),
+    ({"X-RateLimit-Remaining": "5", "X-RateLimit-Reset": "7"}, None),
+    ({"Retry-After": "soon"}, None),
+    ({}, None),
+])
+def test_retry_after(headers, expected):
+    now = 40.0 if "GMT" in headers.get("Retry-After", "") else 2000000000.0
+    assert retry_after(headers, now=now) == expected
+
+def test_retry_after_pauses_before_retry():
+    transport, sent = _transport([_Response(429, {"Retry-After": "0.2"}), _Response(200)])
+    metrics = Metrics()
+    assert transport.get(URL, metrics=metrics).status_code == 200
+    assert sent[1] - sent[0] >= 0.2
+    assert metrics.counters["rate_limited"] == 1
+    assert metrics.counters["retries"] == 1
+    assert metrics.counters["requests"] == 2
+
+def test_last_response_is_returned_after_max_retries():
+    transport, sent = _transport([_Response(503) for _ in range(3)], max_retries=2, failure_threshold=10)
+    assert transport.get(URL).status_code == 503
+    assert len(sent) == 3
+
+def test_non_retryable_status_is_returned():
+    transport, sent = _transport([_Response(404)])
+    assert transport.get(URL).status_code == 404
+    assert len(sent) == 1
+
+def test_circuit_breaker_opens_and_probes():
+    transport, sent = _transport(
+        [_Response(500), _Response(500), _Response(200)],
+        max_retries=0, failure_threshold=2, reset_timeout=0.2,
+    )
+    assert transport.get(URL).status_code == 500
+    assert transport.get(URL).status_code == 500
+    assert transport._host(HOST).breaker.is_open
+    # no retries left while the circuit is open
+    with pytest.raises(CircuitOpenError):
+        transport.get(URL)
+    assert len(sent) == 2
+
+    time.sleep(0.2)
+    # the probe succeeds and closes the circuit
+    assert transport.get(URL).status_code == 200
+    assert not transport._host(HOST).breaker.is_open
+
+def test_circuit_breaker_reopens_after_failed_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    assert breaker.record_failure()
+    assert breaker.wait_time() > 0
+    time.sleep(0.05)
+    assert breaker.wait_time() == 0
+    # only one request probes the host at a time
+    assert breaker.wait_time() > 0
+    assert breaker.record_failure()
+    assert breaker.is_open